@@ -0,0 +1,14 @@
+import pytest
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    """Миниатюры из пула дописываются до разбора фикстур теста.
+
+    Поток пула пишет в тестовую базу и MEDIA_ROOT, которые фикстуры
+    очищают сразу после теста.
+    """
+    yield
+    from posts import thumbnails
+
+    thumbnails.wait()
@@ -0,0 +1,441 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+_MISSING = object()
+
+
+class LocalLRU:
+    """Небольшой потокобезопасный LRU-кэш в памяти процесса."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return _MISSING
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return _MISSING
+            self._data.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, ttl):
+        if ttl <= 0:
+            self.delete(key)
+            return
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteCache(BaseCache):
+    """Общий для воркеров кэш в файле SQLite.
+
+    add() и incr() атомарны между процессами: add() — одна вставка
+    с ON CONFLICT, incr() читает и пишет в транзакции BEGIN IMMEDIATE.
+    На них держатся блокировки пересчёта и счётчики поколений лент,
+    у файлового кэша Django обе операции — проверка и запись порознь.
+    Переполнение проверяется раз в CULL_EVERY записей процесса, а
+    просроченные записи ищутся по индексу срока, без обхода всех ключей.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = location
+        options = params.get('OPTIONS', {})
+        self.busy_timeout = options.get('BUSY_TIMEOUT', 5)
+        self.cull_every = options.get('CULL_EVERY', 1000)
+        self._writes = 0
+        self._local = threading.local()
+
+    def _connection(self):
+        # Подключение своё у каждого потока и у каждого процесса после fork.
+        pid = os.getpid()
+        if getattr(self._local, 'pid', None) != pid:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(
+                self.path, timeout=self.busy_timeout, isolation_level=None,
+            )
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL)'
+            )
+            connection.execute(
+                'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)'
+            )
+            self._local.connection, self._local.pid = connection, pid
+        return self._local.connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def _dumps(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _select(self, keys):
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._connection().execute(
+                'SELECT key, value FROM cache WHERE key IN (%s) '
+                'AND (expires IS NULL OR expires > ?)'
+                % ', '.join('?' * len(chunk)),
+                [*chunk, time.time()],
+            )
+            found.update(
+                (key, pickle.loads(value)) for key, value in rows
+            )
+        return found
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._select([key]).get(key, default)
+
+    def get_many(self, keys, version=None):
+        keys = {self._key(key, version): key for key in keys}
+        return {
+            keys[key]: value for key, value in self._select(keys).items()
+        }
+
+    def _write(self, rows):
+        self._connection().executemany(
+            'INSERT OR REPLACE INTO cache (key, value, expires) '
+            'VALUES (?, ?, ?)', rows,
+        )
+        self._writes += len(rows)
+        if self._writes >= self.cull_every:
+            self._writes = 0
+            self._cull()
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._write([(self._key(key, version), self._dumps(value),
+                      self.get_backend_timeout(timeout))])
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        self._write([
+            (self._key(key, version), self._dumps(value), expires)
+            for key, value in data.items()
+        ])
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'INSERT INTO cache (key, value, expires) VALUES (?, ?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET '
+            'value = excluded.value, expires = excluded.expires '
+            'WHERE cache.expires IS NOT NULL AND cache.expires <= ?',
+            (self._key(key, version), self._dumps(value),
+             self.get_backend_timeout(timeout), time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute(
+                'SELECT value FROM cache WHERE key = ? '
+                'AND (expires IS NULL OR expires > ?)', (key, time.time()),
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (self._dumps(value), key),
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        cursor = self._connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def has_key(self, key, version=None):
+        return bool(self._select([self._key(key, version)]))
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        self._connection().executemany(
+            'DELETE FROM cache WHERE key = ?',
+            [(self._key(key, version),) for key in keys],
+        )
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache')
+
+    def _cull(self):
+        connection = self._connection()
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),)
+        )
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count > self._max_entries:
+            # Как у кэшей Django: удаляется доля 1/CULL_FREQUENCY,
+            # первыми — записи с ближайшим сроком.
+            connection.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires IS NULL, expires LIMIT ?)',
+                (count // self._cull_frequency,),
+            )
+
+    def close(self, **kwargs):
+        # Подключения живут весь поток: закрывать их после каждого
+        # запроса — платить за открытие файла на каждом запросе.
+        pass
+
+
+class TwoTierCache(BaseCache):
+    """Кэш из двух уровней: LRU процесса перед общим для воркеров кэшем.
+
+    Общий уровень — любой настроенный кэш (OPTIONS['SHARED']), например
+    файловый: его видят все воркеры. Локальный уровень держит значения не
+    дольше LOCAL_TIMEOUT секунд, этим ограничено, насколько другие воркеры
+    могут отставать от сброса. Ключи с префиксами SHARED_ONLY_PREFIXES
+    (счётчики поколений) локально не хранятся вовсе.
+
+    Пересчёт ключа при промахе выполняет один исполнитель (single-flight):
+    get_or_set() и промахи по ключам с префиксами SINGLE_FLIGHT_PREFIXES
+    берут блокировку в общем кэше, остальные ждут готового значения до
+    LOCK_WAIT секунд, а не пересчитывают его одновременно.
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self._shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 5)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self.lock_wait = options.get('LOCK_WAIT', 5)
+        self.poll_interval = options.get('POLL_INTERVAL', 0.05)
+        self.shared_only_prefixes = tuple(
+            options.get('SHARED_ONLY_PREFIXES', ())
+        )
+        self.single_flight_prefixes = tuple(
+            options.get('SINGLE_FLIGHT_PREFIXES', ())
+        )
+        self.local = LocalLRU(options.get('LOCAL_MAX_ENTRIES', 1000))
+        self._stripes = [threading.Lock() for _ in range(64)]
+        self._held_guard = threading.Lock()
+        self._held_locks = set()
+
+    @property
+    def shared(self):
+        return caches[self._shared_alias]
+
+    def _local_key(self, key, version):
+        return self.make_key(key, version=version)
+
+    def _is_local(self, key):
+        return not key.startswith(self.shared_only_prefixes)
+
+    def _local_ttl(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(self.local_timeout, timeout - time.time())
+
+    def _remember(self, key, value, version, timeout=DEFAULT_TIMEOUT):
+        if self._is_local(key):
+            self.local.set(
+                self._local_key(key, version), value, self._local_ttl(timeout)
+            )
+
+    def _forget(self, key, version):
+        self.local.delete(self._local_key(key, version))
+
+    # Блокировки пересчёта.
+
+    def _lock_key(self, key):
+        return f'{key}:single-flight'
+
+    def _acquire(self, key, version):
+        """Берёт блокировку пересчёта ключа в общем кэше."""
+        if self.shared.add(self._lock_key(key), True, self.lock_timeout,
+                           version=version):
+            with self._held_guard:
+                self._held_locks.add((key, version))
+            return True
+        return False
+
+    def _release(self, key, version):
+        with self._held_guard:
+            if (key, version) not in self._held_locks:
+                return
+            self._held_locks.discard((key, version))
+        self.shared.delete(self._lock_key(key), version=version)
+
+    def release(self, key, version=None):
+        """Отпускает блокировку пересчёта ключа, если её взял этот процесс.
+
+        Нужна, когда после промаха значение посчитать не удалось: обычно
+        блокировку снимает set() готового значения.
+        """
+        self._release(key, version)
+
+    def _wait(self, key, version):
+        """Ждёт, пока значение посчитает владелец блокировки."""
+        deadline = time.monotonic() + self.lock_wait
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            value = self.shared.get(key, _MISSING, version=version)
+            if value is not _MISSING:
+                self._remember(key, value, version)
+                return value
+            if not self.shared.has_key(self._lock_key(key), version=version):
+                break
+        return _MISSING
+
+    def _process_lock(self, key, version):
+        """Блокировка потоков процесса, до похода за общей."""
+        local_key = self._local_key(key, version)
+        return self._stripes[hash(local_key) % len(self._stripes)]
+
+    # API кэша Django.
+
+    def _lookup(self, key, version):
+        value = self.local.get(self._local_key(key, version))
+        if value is not _MISSING:
+            return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is not _MISSING:
+            self._remember(key, value, version)
+        return value
+
+    def get(self, key, default=None, version=None):
+        value = self._lookup(key, version)
+        if value is not _MISSING:
+            return value
+        if key.startswith(self.single_flight_prefixes):
+            if not self._acquire(key, version):
+                value = self._wait(key, version)
+                if value is not _MISSING:
+                    return value
+        return default
+
+    def get_or_set(self, key, default, timeout=DEFAULT_TIMEOUT, version=None):
+        value = self._lookup(key, version)
+        if value is not _MISSING:
+            return value
+        with self._process_lock(key, version):
+            value = self._lookup(key, version)
+            if value is not _MISSING:
+                return value
+            if not self._acquire(key, version):
+                value = self._wait(key, version)
+                if value is not _MISSING:
+                    return value
+            try:
+                value = default() if callable(default) else default
+                if value is not None:
+                    self.set(key, value, timeout, version=version)
+            finally:
+                self._release(key, version)
+        return value
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(key, value, version, timeout)
+        return added
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(key, value, version, timeout)
+        self._release(key, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self._forget(key, version)
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        self.shared.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        if self.local.get(self._local_key(key, version)) is not _MISSING:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        value = self.shared.incr(key, delta, version=version)
+        self._remember(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            value = self.local.get(self._local_key(key, version))
+            if value is _MISSING:
+                missing.append(key)
+            else:
+                found[key] = value
+        if missing:
+            shared = self.shared.get_many(missing, version=version)
+            for key, value in shared.items():
+                self._remember(key, value, version)
+            found.update(shared)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            self._remember(key, value, version, timeout)
+            self._release(key, version)
+        return failed
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._forget(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def close(self, **kwargs):
+        self.shared.close(**kwargs)
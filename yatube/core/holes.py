@@ -0,0 +1,9 @@
+"""Дыры страниц сайта, общие для всех приложений (core.page_cache)."""
+from django.template.loader import render_to_string
+
+from core import page_cache
+
+
+@page_cache.hole('header')
+def header(request):
+    return render_to_string('includes/header.html', request=request)
@@ -0,0 +1,172 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+
+def snapshot(connection):
+    """Размеры файла и статистика планировщика из sqlite_stat1."""
+    with connection.cursor() as cursor:
+        state = {}
+        for name in ('page_size', 'page_count', 'freelist_count',
+                     'auto_vacuum', 'journal_mode'):
+            cursor.execute(f'PRAGMA {name}')
+            state[name] = cursor.fetchone()[0]
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+        )
+        stats = {}
+        if cursor.fetchone():
+            cursor.execute('SELECT tbl, idx, stat FROM sqlite_stat1')
+            stats = {(tbl, idx): stat for tbl, idx, stat in cursor}
+        state['stats'] = stats
+    return state
+
+
+def freelist_count(raw):
+    return raw.execute('PRAGMA freelist_count').fetchone()[0]
+
+
+def maintain(connection, vacuum_pages=0, enable_incremental_vacuum=False):
+    """Обновляет статистику, возвращает свободные страницы и WAL.
+
+    PRAGMA optimize на свежем подключении смотрит только таблицы, которые
+    это подключение уже читало, то есть ничего не делает. Поэтому
+    статистика пересобирается ANALYZE с ограничением
+    SQLITE_ANALYSIS_LIMIT, а optimize выполняется после него.
+    Возвращает состояние до и после, число освобождённых страниц и число
+    перенесённых из WAL страниц (None — checkpoint не завершён).
+    """
+    connection.ensure_connection()
+    raw = connection.connection
+    before = snapshot(connection)
+    raw.execute(f'PRAGMA analysis_limit = {settings.SQLITE_ANALYSIS_LIMIT}')
+    raw.execute('ANALYZE')
+    raw.execute('PRAGMA optimize')
+    # ANALYZE сам занимает свободные страницы, поэтому освобождённые
+    # считаются только вокруг vacuum.
+    free = freelist_count(raw)
+    if (enable_incremental_vacuum
+            and before['auto_vacuum'] != AUTO_VACUUM_INCREMENTAL):
+        raw.execute('PRAGMA auto_vacuum = incremental')
+        raw.execute('VACUUM')
+    elif before['auto_vacuum'] == AUTO_VACUUM_INCREMENTAL:
+        # execute() делает один шаг прагмы и освобождает одну страницу,
+        # executescript() доводит её до конца.
+        raw.executescript(f'PRAGMA incremental_vacuum({vacuum_pages});')
+    freed = free - freelist_count(raw)
+    checkpointed = None
+    if before['journal_mode'] == 'wal':
+        # TRUNCATE обнуляет журнал и возвращает нули, поэтому страницы
+        # считает предварительный PASSIVE.
+        _, _, checkpointed = raw.execute(
+            'PRAGMA wal_checkpoint(PASSIVE)'
+        ).fetchone()
+        busy, _, _ = raw.execute(
+            'PRAGMA wal_checkpoint(TRUNCATE)'
+        ).fetchone()
+        if busy:
+            checkpointed = None
+    return {
+        'before': before,
+        'after': snapshot(connection),
+        'freed': freed,
+        'checkpointed': checkpointed,
+    }
+
+
+def size(state):
+    return state['page_count'] * state['page_size'] / 1024 / 1024
+
+
+def describe(result):
+    """Строки отчёта о том, что изменилось."""
+    before, after = result['before'], result['after']
+    changed = sorted({
+        tbl for (tbl, idx), stat in after['stats'].items()
+        if before['stats'].get((tbl, idx)) != stat
+    })
+    lines = [
+        f'ANALYZE: статистика обновлена для {len(changed)} таблиц'
+        + (f' ({", ".join(changed)})' if changed else '')
+    ]
+    if after['auto_vacuum'] == AUTO_VACUUM_INCREMENTAL:
+        lines.append(
+            f'incremental vacuum: освобождено {result["freed"]} страниц, '
+            f'осталось свободных {after["freelist_count"]}'
+        )
+    else:
+        lines.append(
+            f'incremental vacuum недоступен (auto_vacuum='
+            f'{after["auto_vacuum"]}), свободных страниц '
+            f'{after["freelist_count"]}; включить: '
+            f'--enable-incremental-vacuum'
+        )
+    if result['checkpointed'] is not None:
+        lines.append(
+            f'WAL: в базу перенесено {result["checkpointed"]} страниц'
+        )
+    elif after['journal_mode'] == 'wal':
+        lines.append('WAL: checkpoint не завершён, база занята')
+    lines.append(
+        f'размер: {size(before):.1f} МБ → {size(after):.1f} МБ'
+    )
+    return lines
+
+
+class Command(BaseCommand):
+    help = (
+        'Обслуживание баз SQLite: ANALYZE и PRAGMA optimize, '
+        'incremental vacuum и checkpoint WAL. С --interval повторяет '
+        'обслуживание, пока его не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='aliases', default=[],
+            help='Обслуживать эту базу (можно указать несколько раз; '
+                 'по умолчанию default).',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд.',
+        )
+        parser.add_argument(
+            '--vacuum-pages', type=int, default=0,
+            help='Сколько свободных страниц вернуть за проход '
+                 '(0 — все).',
+        )
+        parser.add_argument(
+            '--enable-incremental-vacuum', action='store_true',
+            help='Перевести базу в auto_vacuum=incremental. Выполняет '
+                 'полный VACUUM и блокирует базу на время перезаписи.',
+        )
+
+    def handle(self, *args, aliases, interval, vacuum_pages,
+               enable_incremental_vacuum, **options):
+        aliases = aliases or ['default']
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Неизвестная база: {alias}')
+            if connections[alias].vendor != 'sqlite':
+                raise CommandError(f'База {alias} — не SQLite')
+        while True:
+            for alias in aliases:
+                started = time.monotonic()
+                report = describe(maintain(
+                    connections[alias], vacuum_pages,
+                    enable_incremental_vacuum,
+                ))
+                self.stdout.write(self.style.SUCCESS(
+                    f'{alias}: обслуживание за '
+                    f'{time.monotonic() - started:.2f} с'
+                ))
+                for line in report:
+                    self.stdout.write(f'  {line}')
+            enable_incremental_vacuum = False
+            if not interval:
+                break
+            time.sleep(interval)
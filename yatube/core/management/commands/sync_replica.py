@@ -0,0 +1,61 @@
+import sqlite3
+import time
+from contextlib import closing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core import routers
+
+
+def copy_database(source, target, pages=1024):
+    """Копирует базу SQLite через backup API.
+
+    Копия идёт порциями по pages страниц, между ними основная база
+    доступна на запись. Открытые подключения к реплике после копирования
+    видят новое содержимое — файл не подменяется.
+    """
+    with closing(sqlite3.connect(source)) as src, \
+            closing(sqlite3.connect(target)) as dst:
+        src.backup(dst, pages=pages)
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в реплики из DATABASE_REPLICAS. '
+        'С --interval повторяет копирование, пока её не остановят.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='aliases', default=[],
+            help='Синхронизировать только эту реплику '
+                 '(можно указать несколько раз).',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять каждые N секунд.',
+        )
+
+    def handle(self, *args, aliases, interval, **options):
+        aliases = aliases or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не настроены: DATABASE_REPLICAS пуст')
+        source = connections['default'].settings_dict['NAME']
+        for alias in aliases:
+            if alias not in settings.DATABASES or alias == 'default':
+                raise CommandError(f'Неизвестная реплика: {alias}')
+        while True:
+            started = time.monotonic()
+            for alias in aliases:
+                connections[alias].close()
+                copy_database(source, settings.DATABASES[alias]['NAME'])
+            routers.bump_replica_version()
+            self.stdout.write(self.style.SUCCESS(
+                f'Реплики синхронизированы: {", ".join(aliases)} '
+                f'за {time.monotonic() - started:.2f} с'
+            ))
+            if not interval:
+                break
+            time.sleep(interval)
@@ -0,0 +1,101 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+from core import routers, timing
+
+logger = logging.getLogger('core.timing')
+
+
+class ReplicaPinMiddleware:
+    """Закрепляет запросы пользователя за основной базой после записи.
+
+    Реплика отстаёт, и без закрепления автор мог бы не увидеть только что
+    опубликованный пост. Срок закрепления хранится в cookie.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset(pinned=self._pinned(request))
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                pin_seconds = settings.REPLICA_PIN_SECONDS
+                response.set_cookie(
+                    settings.REPLICA_PIN_COOKIE,
+                    str(time.time() + pin_seconds),
+                    max_age=pin_seconds,
+                    httponly=True,
+                    samesite='Lax',
+                )
+        finally:
+            routers.reset()
+        return response
+
+    def _pinned(self, request):
+        try:
+            until = float(request.COOKIES[settings.REPLICA_PIN_COOKIE])
+        except (KeyError, ValueError):
+            return False
+        return until > time.time()
+
+
+class ServerTimingMiddleware:
+    """Разбивка времени запроса в заголовке Server-Timing и в логе.
+
+    Считает время и число SQL-запросов, время рендера шаблонов, попадания
+    и промахи кэша default и общее время. Выключается SERVER_TIMING =
+    False: тогда Django убирает middleware из цепочки совсем.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        timing.instrument_templates()
+        timing.instrument_cache(type(caches['default']))
+
+    def __call__(self, request):
+        timings = timing.start()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            timing.stop()
+        total = timings.total_time
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings.db_time * 1000:.1f};'
+            f'desc="{timings.db_count} queries"',
+            f'tpl;dur={timings.template_time * 1000:.1f}',
+            f'cache;desc="{timings.cache_hits} hits, '
+            f'{timings.cache_misses} misses"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        logger.info(
+            'path=%s status=%s total_ms=%.1f db_ms=%.1f db_queries=%d '
+            'template_ms=%.1f cache_hits=%d cache_misses=%d',
+            request.path, response.status_code, total * 1000,
+            timings.db_time * 1000, timings.db_count,
+            timings.template_time * 1000, timings.cache_hits,
+            timings.cache_misses,
+            extra={
+                'path': request.path,
+                'status': response.status_code,
+                'total_ms': round(total * 1000, 1),
+                'db_ms': round(timings.db_time * 1000, 1),
+                'db_queries': timings.db_count,
+                'template_ms': round(timings.template_time * 1000, 1),
+                'cache_hits': timings.cache_hits,
+                'cache_misses': timings.cache_misses,
+            },
+        )
+        return response
@@ -0,0 +1,109 @@
+"""Кэш целых страниц с «дырами» под зрителя.
+
+Страница рендерится один раз как заготовка: части, зависящие от того,
+кто смотрит (шапка, кнопка подписки, форма комментария), вместо разметки
+оставляют метку {% hole %}. Заготовка кэшируется по состоянию страницы,
+а метки на каждом запросе заполняются отдельным рендером своей части.
+Анонимным зрителям дыры одинаковы, поэтому для них кэшируется и уже
+заполненная страница.
+"""
+import hashlib
+import re
+from functools import wraps
+from urllib.parse import parse_qsl, urlencode
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.http import HttpResponse
+
+HOLE_RE = re.compile(r'<!--hole:(?P<name>[\w.-]+)\?(?P<params>[^>]*)-->')
+
+_holes = {}
+
+
+def hole(name):
+    """Регистрирует функцию (request, **params) -> HTML для дыры name."""
+    def decorator(render):
+        _holes[name] = render
+        return render
+    return decorator
+
+
+def render_hole(request, name, params):
+    return _holes[name](request, **params)
+
+
+def is_shell(request):
+    """Рендерится ли сейчас заготовка страницы для кэша."""
+    return getattr(request, '_page_shell', False)
+
+
+def marker(name, params):
+    # Значения экранируются urlencode: «>» внутри метки не встретится.
+    return f'<!--hole:{name}?{urlencode(params)}-->'
+
+
+def fill(request, shell):
+    return HOLE_RE.sub(
+        lambda match: render_hole(
+            request, match['name'], dict(parse_qsl(match['params']))
+        ),
+        shell,
+    )
+
+
+def _is_anonymous(request):
+    # Без загрузки пользователя: у анонима без cookie нет и сессии.
+    return SESSION_KEY not in request.session
+
+
+def _render_shell(view, request, args, kwargs):
+    request._page_shell = True
+    try:
+        return view(request, *args, **kwargs)
+    finally:
+        request._page_shell = False
+
+
+def cache_page(state_func):
+    """Кэширует страницу по state_func(request, *args, **kwargs).
+
+    state_func описывает всё, от чего зависит страница, кроме зрителя
+    (поколение ленты, номер страницы, счётчики); None — страницы нет,
+    представление отвечает само. Кэшируются только ответы 200.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if (not settings.PAGE_CACHE
+                    or request.method not in ('GET', 'HEAD')):
+                return view(request, *args, **kwargs)
+            state = state_func(request, *args, **kwargs)
+            if state is None:
+                return view(request, *args, **kwargs)
+            path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'page:{view.__name__}:{path}:{state}'
+            anonymous_key = f'{key}:anonymous'
+            anonymous = _is_anonymous(request)
+            cached = cache.get_many(
+                [key, anonymous_key] if anonymous else [key]
+            )
+            if anonymous and anonymous_key in cached:
+                return HttpResponse(cached[anonymous_key])
+            shell = cached.get(key)
+            if shell is None:
+                response = _render_shell(view, request, args, kwargs)
+                if response.streaming:
+                    return response
+                shell = response.content.decode(response.charset)
+                if response.status_code != 200:
+                    response.content = fill(request, shell)
+                    return response
+                cache.set(key, shell, settings.PAGE_CACHE_TIMEOUT)
+            html = fill(request, shell)
+            if anonymous:
+                cache.set(anonymous_key, html, settings.PAGE_CACHE_TIMEOUT)
+            return HttpResponse(html)
+        return wrapper
+    return decorator
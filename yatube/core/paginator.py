@@ -0,0 +1,153 @@
+import base64
+import binascii
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+
+
+class NumberedPaginator(Paginator):
+    """Номерной пагинатор не дальше MAX_PAGE_NUMBER страниц.
+
+    Дальние страницы всё равно отдают 404, а без ограничения шаблон
+    выводил бы ссылку на каждую из десятков тысяч страниц большой ленты.
+    """
+
+    @property
+    def num_pages(self):
+        return min(super().num_pages, settings.MAX_PAGE_NUMBER)
+
+
+class CursorPaginator(Paginator):
+    """Пагинатор по ключу (keyset) без COUNT(*) и OFFSET.
+
+    Страница задаётся непрозрачным курсором — значениями полей key_fields
+    крайней записи соседней страницы. Пагинатор обслуживает одну
+    страницу: номер у неё условный (1 — первая, 2 — не первая).
+    """
+    OLDER = 'o'
+    NEWER = 'n'
+    SEPARATOR = '|'
+
+    def __init__(self, object_list, per_page,
+                 key_fields=('-pub_date', '-pk')):
+        super().__init__(object_list, per_page)
+        self.key_fields = tuple(key_fields)
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def _check_object_list_is_ordered(self):
+        # Порядок задают key_fields, сортировка выборки не нужна.
+        pass
+
+    @property
+    def model(self):
+        return self.object_list.model
+
+    def get_cursor_page(self, cursor=None):
+        """Возвращает страницу по курсору; битый курсор ведёт на первую."""
+        direction, values = self.decode_cursor(cursor)
+        if values is None:
+            rows = self._fetch(None, backwards=False)
+            has_previous = False
+            has_next = len(rows) > self.per_page
+        elif direction == self.OLDER:
+            rows = self._fetch(values, backwards=False)
+            has_previous = True
+            has_next = len(rows) > self.per_page
+        else:
+            rows = self._fetch(values, backwards=True)
+            has_previous = len(rows) > self.per_page
+            if not has_previous:
+                return self.get_cursor_page()
+            has_next = True
+        rows = rows[:self.per_page]
+        if direction == self.NEWER and values is not None:
+            rows.reverse()
+        return self._build_page(rows, has_previous, has_next)
+
+    def _build_page(self, rows, has_previous, has_next):
+        number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.previous_cursor = (
+            self.encode_cursor(self.NEWER, rows[0])
+            if has_previous and rows else None
+        )
+        page.next_cursor = (
+            self.encode_cursor(self.OLDER, rows[-1])
+            if has_next and rows else None
+        )
+        return page
+
+    def _fetch(self, values, backwards):
+        """Выбирает per_page + 1 записей за курсором одним запросом."""
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(
+                self.keyset_filter(self.key_fields, values, backwards)
+            )
+        ordering = self.ordering(self.key_fields, backwards)
+        return list(queryset.order_by(*ordering)[:self.per_page + 1])
+
+    @staticmethod
+    def ordering(key_fields, backwards=False):
+        if not backwards:
+            return key_fields
+        return tuple(
+            field[1:] if field.startswith('-') else f'-{field}'
+            for field in key_fields
+        )
+
+    @staticmethod
+    def keyset_filter(key_fields, values, backwards=False):
+        """Условие «строго после курсора» для составного ключа."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(key_fields, values):
+            descending = field.startswith('-')
+            name = field.lstrip('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def encode_cursor(self, direction, obj):
+        values = [
+            self._field(name).value_to_string(obj)
+            for name in self._names()
+        ]
+        raw = self.SEPARATOR.join([direction, *values]).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Разбирает курсор; при любой ошибке возвращает (None, None)."""
+        if not cursor:
+            return None, None
+        try:
+            padding = '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(cursor + padding).decode()
+            direction, *values = raw.split(self.SEPARATOR)
+            if (direction not in (self.OLDER, self.NEWER)
+                    or len(values) != len(self.key_fields)):
+                return None, None
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self._names(), values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError,
+                ValidationError):
+            return None, None
+        return direction, values
+
+    def _names(self):
+        return [field.lstrip('-') for field in self.key_fields]
+
+    def _field(self, name):
+        if name == 'pk':
+            return self.model._meta.pk
+        return self.model._meta.get_field(name)
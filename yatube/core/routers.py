@@ -0,0 +1,88 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Модели, чтение которых можно отдать реплике: ленты, группы,
+# комментарии, подписки. Остальное (пользователи, счётчики, ленты
+# подписок, сессии) всегда читается с основной базы.
+REPLICATED_MODELS = {
+    ('posts', 'post'),
+    ('posts', 'group'),
+    ('posts', 'comment'),
+    ('posts', 'follow'),
+}
+
+REPLICA_VERSION_KEY = 'replica-version'
+
+_state = threading.local()
+
+
+def reset(pinned=False):
+    """Начинает запрос: сбрасывает отметку о записи и закрепление."""
+    _state.pinned = pinned
+    _state.wrote = False
+
+
+def is_pinned():
+    return getattr(_state, 'pinned', False)
+
+
+def wrote():
+    """Была ли в текущем запросе запись в модели приложения posts."""
+    return getattr(_state, 'wrote', False)
+
+
+def written():
+    """Отмечает запись, которую за текущий запрос сделал другой поток."""
+    _state.wrote = True
+    _state.pinned = True
+
+
+def reads_from_replica():
+    return bool(settings.DATABASE_REPLICAS) and not is_pinned()
+
+
+def replica_version():
+    """Номер последней синхронизации реплик (команда sync_replica).
+
+    Входит в ключи кэша страниц, собранных по данным реплики: после
+    синхронизации они пересобираются, а не живут со старыми данными.
+    """
+    return cache.get(REPLICA_VERSION_KEY, 0)
+
+
+def bump_replica_version():
+    cache.set(REPLICA_VERSION_KEY, time.time_ns(), None)
+
+
+class ReplicaRouter:
+    """Отправляет чтение постов, групп, комментариев и подписок на реплики.
+
+    Реплики перечислены в DATABASE_REPLICAS и отстают от основной базы.
+    Чтобы пользователь видел свои изменения, после записи его запросы
+    закрепляются за основной базой: до конца текущего запроса и ещё
+    REPLICA_PIN_SECONDS по cookie (core.middleware.ReplicaPinMiddleware).
+    """
+
+    def db_for_read(self, model, **hints):
+        meta = model._meta
+        if ((meta.app_label, meta.model_name) not in REPLICATED_MODELS
+                or not reads_from_replica()):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        if model._meta.app_label == 'posts':
+            _state.wrote = True
+            _state.pinned = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы, связи между ними допустимы.
+        return True
@@ -0,0 +1,15 @@
+"""Настройка подключений SQLite.
+
+Прагмы из SQLITE_PRAGMAS выполняются на каждом новом подключении к базе
+SQLite. Они идут напрямую через драйвер, мимо курсора Django: не попадают
+в connection.queries и не расходуют бюджет запросов страницы.
+"""
+from django.conf import settings
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Обработчик connection_created."""
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in settings.SQLITE_PRAGMAS.items():
+        connection.connection.execute(f'PRAGMA {name} = {value}').fetchall()
@@ -0,0 +1,46 @@
+from django import template
+from django.core.cache import InvalidCacheBackendError, caches
+from django.core.cache.utils import make_template_fragment_key
+from django.templatetags import cache
+
+register = template.Library()
+
+
+class FragmentCacheNode(cache.CacheNode):
+    """{% cache %}, который отпускает блокировку пересчёта при ошибке.
+
+    Промах по фрагменту в core.cache.TwoTierCache берёт блокировку, а
+    снимает её set() готового фрагмента. Если отрисовка упала, set() не
+    будет, и без release() другие воркеры ждали бы по LOCK_WAIT секунд
+    на каждом запросе, пока блокировка не истечёт.
+    """
+
+    def render(self, context):
+        try:
+            return super().render(context)
+        except Exception:
+            self.release(context)
+            raise
+
+    def release(self, context):
+        if self.cache_name:
+            fragment_cache = caches[self.cache_name.resolve(context)]
+        else:
+            try:
+                fragment_cache = caches['template_fragments']
+            except InvalidCacheBackendError:
+                fragment_cache = caches['default']
+        if hasattr(fragment_cache, 'release'):
+            vary_on = [var.resolve(context) for var in self.vary_on]
+            fragment_cache.release(
+                make_template_fragment_key(self.fragment_name, vary_on)
+            )
+
+
+@register.tag('cache')
+def do_cache(parser, token):
+    node = cache.do_cache(parser, token)
+    return FragmentCacheNode(
+        node.nodelist, node.expire_time_var, node.fragment_name,
+        node.vary_on, node.cache_name,
+    )
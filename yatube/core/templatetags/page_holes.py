@@ -0,0 +1,21 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from core import page_cache
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, **params):
+    """Часть страницы, зависящая от зрителя (core.page_cache).
+
+    В заготовке для кэша — метка, иначе — сразу разметка. Параметры
+    приводятся к строкам в обоих случаях: функция дыры получает их
+    одинаково, откуда бы ни пришёл запрос.
+    """
+    request = context['request']
+    params = {key: str(value) for key, value in params.items()}
+    if page_cache.is_shell(request):
+        return mark_safe(page_cache.marker(name, params))
+    return mark_safe(page_cache.render_hole(request, name, params))
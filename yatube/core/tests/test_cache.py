@@ -0,0 +1,228 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.template import Context, Template
+from django.test import SimpleTestCase, override_settings
+from django.utils.module_loading import import_string
+
+from core.cache import TwoTierCache
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-tests',
+    },
+}
+
+
+def make_worker(**options):
+    """Отдельный экземпляр кэша — как в отдельном воркере."""
+    return TwoTierCache('', {'OPTIONS': {
+        'SHARED': 'shared',
+        'LOCAL_TIMEOUT': 0.2,
+        'LOCK_WAIT': 2,
+        'POLL_INTERVAL': 0.01,
+        'SHARED_ONLY_PREFIXES': ('generation:',),
+        'SINGLE_FLIGHT_PREFIXES': ('fragment:',),
+        **options,
+    }})
+
+
+@override_settings(CACHES=CACHES)
+class TwoTierCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.worker = make_worker()
+        self.other_worker = make_worker()
+        self.worker.clear()
+
+    def test_local_tier_serves_hits(self):
+        """Повторное чтение обслуживает память процесса."""
+        self.worker.set('key', 'value')
+        self.worker.shared.clear()
+        self.assertEqual(self.worker.get('key'), 'value')
+        time.sleep(0.25)
+        self.assertIsNone(self.worker.get('key'))
+
+    def test_invalidation_reaches_other_workers(self):
+        """Сброс в одном воркере виден другим не позже LOCAL_TIMEOUT."""
+        self.worker.set('key', 'old')
+        self.worker.set('generation:index', 1)
+        self.assertEqual(self.other_worker.get('key'), 'old')
+        self.assertEqual(self.other_worker.get('generation:index'), 1)
+
+        self.worker.set('key', 'new')
+        self.worker.incr('generation:index')
+        self.assertEqual(self.other_worker.get('generation:index'), 2)
+        time.sleep(0.25)
+        self.assertEqual(self.other_worker.get('key'), 'new')
+
+    def test_get_or_set_single_flight(self):
+        """Одновременные промахи пересчитывают значение один раз."""
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return 'value'
+
+        results = []
+        workers = [make_worker() for _ in range(4)]
+        threads = [
+            threading.Thread(
+                target=lambda cache: results.append(
+                    cache.get_or_set('hot', compute)
+                ),
+                args=(workers[i % len(workers)],),
+            )
+            for i in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['value'] * 8)
+
+    def test_fragment_miss_waits_for_owner(self):
+        """Промах по фрагменту ждёт воркер, который его уже считает."""
+        self.assertIsNone(self.worker.get('fragment:index'))
+
+        def render():
+            time.sleep(0.1)
+            self.worker.set('fragment:index', '<html>')
+
+        thread = threading.Thread(target=render)
+        thread.start()
+        self.assertEqual(self.other_worker.get('fragment:index'), '<html>')
+        thread.join()
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCK_WAIT': 2,
+            'SINGLE_FLIGHT_PREFIXES': ('template.cache.',),
+        },
+    },
+    'shared': CACHES['shared'],
+})
+class FragmentTagTests(SimpleTestCase):
+    template = Template(
+        '{% load fragment_cache %}'
+        '{% cache 60 feed page %}{{ render }}{% endcache %}'
+    )
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_failed_render_releases_lock(self):
+        """Упавшая отрисовка фрагмента не держит блокировку пересчёта."""
+        def fail():
+            raise RuntimeError('шаблон упал')
+
+        with self.assertRaises(RuntimeError):
+            self.template.render(Context({'render': fail, 'page': 1}))
+        lock = make_template_fragment_key('feed', [1]) + ':single-flight'
+        self.assertFalse(caches['shared'].has_key(lock))
+
+        started = time.monotonic()
+        self.assertEqual(
+            self.template.render(Context({'render': 'лента', 'page': 1})),
+            'лента',
+        )
+        self.assertLess(time.monotonic() - started, 1)
+
+
+def make_shared(location, **options):
+    """Общий уровень того же бэкенда, что в настройках проекта."""
+    config = settings.CACHES['shared']
+    return import_string(config['BACKEND'])(location, {
+        'OPTIONS': {**config.get('OPTIONS', {}), **options},
+    })
+
+
+def take_lock(location, barrier, results):
+    cache = make_shared(location)
+    barrier.wait()
+    results.put(cache.add('hot:single-flight', os.getpid(), 30))
+
+
+def bump(location, barrier, times):
+    cache = make_shared(location)
+    barrier.wait()
+    for _ in range(times):
+        cache.incr('feed-generation:index')
+
+
+class SharedBackendTests(SimpleTestCase):
+    """Общий уровень атомарен между процессами, а не только потоками."""
+
+    processes = 8
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = make_shared(self.location)
+
+    def run_processes(self, target, *args):
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(self.processes)
+        processes = [
+            context.Process(target=target,
+                            args=(self.location, barrier, *args))
+            for _ in range(self.processes)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+
+    def test_add_is_atomic(self):
+        """Блокировку пересчёта получает ровно один воркер."""
+        results = multiprocessing.get_context('fork').Queue()
+        self.run_processes(take_lock, results)
+        taken = [results.get(timeout=5) for _ in range(self.processes)]
+        self.assertEqual(taken.count(True), 1)
+
+    def test_incr_loses_no_bumps(self):
+        """Одновременные сдвиги поколения не теряются."""
+        self.cache.set('feed-generation:index', 0, None)
+        self.run_processes(bump, 50)
+        self.assertEqual(self.cache.get('feed-generation:index'),
+                         self.processes * 50)
+
+    def test_add_replaces_expired(self):
+        """Просроченная блокировка не мешает взять новую."""
+        self.cache.set('lock', 'old', 0.05)
+        self.assertFalse(self.cache.add('lock', 'new'))
+        time.sleep(0.1)
+        self.assertTrue(self.cache.add('lock', 'new'))
+        self.assertEqual(self.cache.get('lock'), 'new')
+
+    def test_cull_keeps_size_bounded(self):
+        """Переполнение убирает записи с ближайшим сроком."""
+        cache = make_shared(self.location, MAX_ENTRIES=10, CULL_EVERY=5,
+                            CULL_FREQUENCY=2)
+        cache.set('forever', 1, None)
+        for i in range(20):
+            cache.set(f'key{i}', i, 60 + i)
+        self.assertLessEqual(
+            len(cache.get_many(['forever'] + [f'key{i}' for i in range(20)])),
+            11,
+        )
+        self.assertEqual(cache.get('forever'), 1)
+        self.assertEqual(cache.get('key19'), 19)
@@ -0,0 +1,69 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import ServerTimingMiddleware
+from posts.models import Post
+
+User = get_user_model()
+
+METRIC_RE = re.compile(
+    r'db;dur=[\d.]+;desc="(?P<queries>\d+) queries", '
+    r'tpl;dur=(?P<template>[\d.]+), '
+    r'cache;desc="(?P<hits>\d+) hits, (?P<misses>\d+) misses", '
+    r'total;dur=[\d.]+'
+)
+
+
+class ServerTimingMiddlewareTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        Post.objects.create(text='Тестовый пост', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def metrics(self, response):
+        match = METRIC_RE.fullmatch(response['Server-Timing'])
+        self.assertIsNotNone(match, response['Server-Timing'])
+        return {
+            name: float(value) for name, value in match.groupdict().items()
+        }
+
+    def test_header_reports_breakdown(self):
+        """Заголовок содержит запросы, шаблоны и кэш страницы."""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': Post.objects.get().pk})
+        metrics = self.metrics(self.guest_client.get(url))
+        self.assertGreater(metrics['queries'], 0)
+        self.assertGreater(metrics['template'], 0)
+
+    def test_cache_hits_counted(self):
+        """Повторная лента берётся из кэша, это видно в заголовке."""
+        first = self.metrics(self.guest_client.get(reverse('posts:index')))
+        second = self.metrics(self.guest_client.get(reverse('posts:index')))
+        self.assertGreater(first['misses'], 0)
+        self.assertGreater(second['hits'], first['hits'])
+
+    def test_log_line(self):
+        """Каждый запрос пишет строку лога с теми же числами."""
+        with self.assertLogs('core.timing', 'INFO') as logs:
+            self.guest_client.get(reverse('posts:index'))
+        record = logs.records[0]
+        self.assertEqual(record.path, reverse('posts:index'))
+        self.assertEqual(record.status, 200)
+        self.assertIn('db_queries=', record.getMessage())
+
+    @override_settings(SERVER_TIMING=False)
+    def test_disabled(self):
+        """Выключенный замер убирает middleware из цепочки."""
+        with self.assertRaises(MiddlewareNotUsed):
+            ServerTimingMiddleware(lambda request: HttpResponse())
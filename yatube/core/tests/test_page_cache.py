@@ -0,0 +1,111 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from core import page_cache
+from posts.models import Follow, Post
+
+User = get_user_model()
+
+
+@override_settings(PAGE_CACHE=True)
+class PageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Текст поста')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.reader = Client()
+        self.reader.force_login(PageCacheTest.reader)
+        self.author = Client()
+        self.author.force_login(PageCacheTest.author)
+
+    def test_anonymous_hit_skips_view_and_database(self):
+        """Повторный анонимный запрос отдаётся из кэша без запросов."""
+        url = reverse('posts:index')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertTemplateNotUsed(second, 'posts/index.html')
+        self.assertEqual(first.content, second.content)
+
+    def test_viewers_share_page_but_not_holes(self):
+        """Вошедший получает ту же страницу со своей шапкой."""
+        url = reverse('posts:index')
+        anonymous = self.client.get(url).content.decode()
+        reader = self.reader.get(url)
+        self.assertTemplateNotUsed(reader, 'posts/index.html')
+        html = reader.content.decode()
+        self.assertIn('Пользователь: reader', html)
+        self.assertNotIn('Войти', html)
+        self.assertIn('Войти', anonymous)
+        self.assertIn('Текст поста', html)
+
+    def test_follow_button_is_per_viewer(self):
+        """Кнопка подписки в кэшированном профиле — по зрителю."""
+        url = reverse('posts:profile', args=['author'])
+        self.client.get(url)
+        self.assertContains(
+            self.reader.get(url),
+            reverse('posts:profile_unfollow', args=['author']),
+        )
+        other = User.objects.create_user(username='other')
+        self.client.force_login(other)
+        self.assertContains(
+            self.client.get(url),
+            reverse('posts:profile_follow', args=['author']),
+        )
+        self.assertNotContains(
+            self.author.get(url),
+            reverse('posts:profile_follow', args=['author']),
+        )
+
+    def test_post_holes(self):
+        """Форма комментария и кнопка правки — только своим зрителям."""
+        url = reverse('posts:post_detail', args=[PageCacheTest.post.pk])
+        edit_url = reverse('posts:post_edit', args=[PageCacheTest.post.pk])
+        anonymous = self.client.get(url)
+        self.assertNotContains(anonymous, 'csrfmiddlewaretoken')
+        self.assertNotContains(anonymous, edit_url)
+        reader = self.reader.get(url)
+        self.assertContains(reader, 'csrfmiddlewaretoken')
+        self.assertNotContains(reader, edit_url)
+        self.assertContains(self.author.get(url), edit_url)
+
+    def test_new_post_changes_page(self):
+        """Новый пост сдвигает поколение ленты и ключ страницы."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=PageCacheTest.author, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_missing_page_is_not_cached(self):
+        """Несуществующая группа — обычный 404."""
+        url = reverse('posts:group_list', args=['missing'])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+class HoleMarkerTest(TestCase):
+    def test_fill_round_trip(self):
+        """Параметры метки переживают экранирование."""
+        seen = {}
+        self.addCleanup(page_cache._holes.pop, 'test')
+
+        @page_cache.hole('test')
+        def render(request, **params):
+            seen.update(params)
+            return '<b>hole</b>'
+
+        params = {'username': 'a-->b&c'}
+        shell = f'<p>{page_cache.marker("test", params)}</p>'
+        self.assertEqual(
+            page_cache.fill(RequestFactory().get('/'), shell),
+            '<p><b>hole</b></p>',
+        )
+        self.assertEqual(seen, params)
@@ -0,0 +1,127 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import closing
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from core import routers
+from core.management.commands.sync_replica import copy_database
+from posts.models import Comment, Post, Timeline, UserStats
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(SimpleTestCase):
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        routers.reset()
+
+    def tearDown(self):
+        routers.reset()
+
+    def test_reads_of_feed_models_go_to_replica(self):
+        """Посты и комментарии читаются с реплики, остальное — нет."""
+        self.assertEqual(self.router.db_for_read(Post), 'replica')
+        self.assertEqual(self.router.db_for_read(Comment), 'replica')
+        for model in (User, UserStats, Timeline):
+            with self.subTest(model=model):
+                self.assertIsNone(self.router.db_for_read(model))
+
+    def test_write_pins_reads_to_primary(self):
+        """После записи чтение до конца запроса идёт с основной базы."""
+        self.assertEqual(self.router.db_for_write(Post), 'default')
+        self.assertTrue(routers.wrote())
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    def test_pinned_request_reads_primary(self):
+        """Закреплённый по cookie запрос читает основную базу."""
+        routers.reset(pinned=True)
+        self.assertIsNone(self.router.db_for_read(Post))
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_replicas(self):
+        """Без реплик всё читается с основной базы."""
+        self.assertIsNone(self.router.db_for_read(Post))
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReadYourWritesTest(TestCase):
+    """Реплика в тестах — пустая база, то есть отстаёт на всё."""
+
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(ReadYourWritesTest.user)
+
+    def test_author_sees_own_post_despite_lag(self):
+        """Автор видит свой пост сразу, хотя реплика его ещё не получила."""
+        response = self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Свежий пост'},
+        )
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        self.assertFalse(Post.objects.using('replica').exists())
+
+        profile = reverse('posts:profile',
+                          kwargs={'username': ReadYourWritesTest.user})
+        for url in (reverse('posts:index'), profile):
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.authorized_client.get(url), 'Свежий пост'
+                )
+                self.assertNotContains(
+                    self.guest_client.get(url), 'Свежий пост'
+                )
+
+    def test_pin_expires(self):
+        """Без свежей записи запросы снова читают реплику."""
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Свежий пост'},
+        )
+        self.authorized_client.cookies[settings.REPLICA_PIN_COOKIE] = '0'
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Свежий пост')
+
+
+class CopyDatabaseTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, 'primary.sqlite3')
+        self.target = os.path.join(self.directory, 'replica.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_replica_sees_new_data_after_sync(self):
+        """Открытое подключение к реплике видит данные после копирования."""
+        with closing(sqlite3.connect(self.source)) as primary:
+            primary.execute('CREATE TABLE post (text TEXT)')
+            primary.execute("INSERT INTO post VALUES ('первый')")
+            primary.commit()
+            copy_database(self.source, self.target)
+            with closing(sqlite3.connect(self.target)) as replica:
+                self.assertEqual(
+                    replica.execute('SELECT count(*) FROM post').fetchone(),
+                    (1,),
+                )
+                primary.execute("INSERT INTO post VALUES ('второй')")
+                primary.commit()
+                copy_database(self.source, self.target)
+                self.assertEqual(
+                    replica.execute('SELECT count(*) FROM post').fetchone(),
+                    (2,),
+                )
@@ -0,0 +1,110 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.management.commands.sqlite_maintenance import (
+    AUTO_VACUUM_INCREMENTAL, maintain,
+)
+
+
+class SqliteFileTestCase(SimpleTestCase):
+    """Отдельная файловая база: в памяти WAL и mmap не включаются."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        settings_dict = dict(connection.settings_dict,
+                             NAME=os.path.join(self.directory, 'db.sqlite3'))
+        self.db = DatabaseWrapper(settings_dict, alias='scratch')
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def pragma(self, name):
+        with self.db.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+
+class PragmaTest(SqliteFileTestCase):
+    @override_settings(SQLITE_PRAGMAS={
+        'busy_timeout': 1234,
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'mmap_size': 1024 * 1024,
+        'cache_size': -2048,
+    })
+    def test_new_connection_gets_pragmas(self):
+        """Новое подключение получает прагмы из настроек."""
+        self.assertEqual(self.pragma('busy_timeout'), 1234)
+        self.assertEqual(self.pragma('journal_mode'), 'wal')
+        self.assertEqual(self.pragma('synchronous'), 1)
+        self.assertEqual(self.pragma('mmap_size'), 1024 * 1024)
+        self.assertEqual(self.pragma('cache_size'), -2048)
+
+    def test_pragmas_are_not_logged_as_queries(self):
+        """Прагмы не попадают в connection.queries."""
+        self.db.force_debug_cursor = True
+        self.db.ensure_connection()
+        self.assertEqual(self.db.queries, [])
+
+
+class MaintenanceTest(SqliteFileTestCase):
+    def fill(self, rows=500):
+        with self.db.cursor() as cursor:
+            cursor.execute('CREATE TABLE item (name TEXT)')
+            cursor.execute('CREATE INDEX item_name ON item (name)')
+            cursor.executemany('INSERT INTO item VALUES (%s)',
+                               [(f'{i:04}' * 250,) for i in range(rows)])
+
+    def test_analyze_reports_new_stats(self):
+        """ANALYZE заполняет sqlite_stat1, отчёт видит изменение."""
+        self.fill()
+        result = maintain(self.db)
+        self.assertEqual(result['before']['stats'], {})
+        self.assertIn(('item', 'item_name'), result['after']['stats'])
+
+    def test_incremental_vacuum_returns_free_pages(self):
+        """Свободные страницы возвращаются, файл уменьшается."""
+        self.assertEqual(self.pragma('auto_vacuum'), AUTO_VACUUM_INCREMENTAL)
+        self.fill()
+        with self.db.cursor() as cursor:
+            cursor.execute('DELETE FROM item')
+        first = maintain(self.db, vacuum_pages=10)
+        self.assertEqual(first['freed'], 10)
+        second = maintain(self.db)
+        self.assertEqual(second['after']['freelist_count'], 0)
+        self.assertLess(second['after']['page_count'],
+                        first['before']['page_count'])
+
+    @override_settings(SQLITE_PRAGMAS={})
+    def test_enable_incremental_vacuum(self):
+        """Флаг переводит старую базу в auto_vacuum=incremental."""
+        self.fill()
+        self.assertEqual(self.pragma('auto_vacuum'), 0)
+        result = maintain(self.db, enable_incremental_vacuum=True)
+        self.assertEqual(result['after']['auto_vacuum'],
+                         AUTO_VACUUM_INCREMENTAL)
+
+    def test_checkpoint_truncates_wal(self):
+        """Checkpoint переносит страницы из WAL в базу."""
+        self.fill()
+        self.assertGreater(maintain(self.db)['checkpointed'], 0)
+        self.assertEqual(
+            os.path.getsize(self.db.settings_dict['NAME'] + '-wal'), 0
+        )
+
+
+class MaintenanceCommandTest(TestCase):
+    def test_report(self):
+        """Команда печатает отчёт по базе."""
+        out = StringIO()
+        call_command('sqlite_maintenance', stdout=out)
+        self.assertIn('default: обслуживание', out.getvalue())
+        self.assertIn('ANALYZE', out.getvalue())
@@ -0,0 +1,203 @@
+import threading
+from concurrent import futures
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import routers, writer
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+def create_group(slug):
+    return Group.objects.create(title=slug, slug=slug)
+
+
+class WriterTest(TransactionTestCase):
+    """Поток записи пишет своим подключением, нужны настоящие коммиты."""
+
+    def setUp(self):
+        self.writer = writer.Writer()
+
+    def tearDown(self):
+        self.writer.stop()
+
+    def test_result_after_commit(self):
+        """Вызывающий получает результат записи, строка уже в базе."""
+        group = self.writer.submit(create_group, 'first').result(5)
+        self.assertTrue(Group.objects.filter(pk=group.pk).exists())
+
+    def test_pending_writes_share_transaction(self):
+        """Записи, накопившиеся за время коммита, идут одной пачкой."""
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return create_group('slow')
+
+        first = self.writer.submit(slow)
+        started.wait(5)
+        pending = [self.writer.submit(create_group, f'g{i}')
+                   for i in range(5)]
+        release.set()
+        first.result(5)
+        for future in pending:
+            future.result(5)
+        self.assertEqual(self.writer.batches, 2)
+        self.assertEqual(Group.objects.count(), 6)
+
+    def test_failure_rolls_back_only_its_write(self):
+        """Ошибка записи не откатывает соседей по пачке."""
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        self.writer.submit(slow)
+        started.wait(5)
+        ok = self.writer.submit(create_group, 'ok')
+        duplicate = self.writer.submit(create_group, 'ok')
+        after = self.writer.submit(create_group, 'after')
+        release.set()
+        ok.result(5)
+        with self.assertRaises(IntegrityError):
+            duplicate.result(5)
+        after.result(5)
+        self.assertEqual(
+            set(Group.objects.values_list('slug', flat=True)),
+            {'ok', 'after'},
+        )
+
+    @override_settings(WRITE_QUEUE=True)
+    def test_run_pins_reads_to_primary(self):
+        """После записи через очередь запрос читает основную базу."""
+        routers.reset()
+        try:
+            writer.run(create_group, 'queued')
+            self.assertTrue(routers.wrote())
+            self.assertTrue(routers.is_pinned())
+        finally:
+            routers.reset()
+            writer.get_writer().stop()
+
+    @override_settings(WRITE_QUEUE=True, WRITE_QUEUE_TIMEOUT=0.1)
+    def test_timeout_cancels_queued_write(self):
+        """Запись, до которой поток не дошёл, отменяется и не выполняется."""
+        started, release = threading.Event(), threading.Event()
+
+        def blocked():
+            started.set()
+            release.wait(5)
+
+        queue = writer.get_writer()
+        try:
+            first = queue.submit(blocked)
+            started.wait(5)
+            with self.assertRaises(futures.TimeoutError):
+                writer.run(create_group, 'late')
+            release.set()
+            first.result(5)
+            queue.submit(create_group, 'next').result(5)
+        finally:
+            release.set()
+            queue.stop()
+        self.assertEqual(
+            list(Group.objects.values_list('slug', flat=True)), ['next']
+        )
+
+    @override_settings(WRITE_QUEUE=True, WRITE_QUEUE_TIMEOUT=0.1)
+    def test_timeout_waits_for_started_write(self):
+        """Начатую запись вызывающий дожидается и после таймаута."""
+        started = threading.Event()
+
+        def slow():
+            started.set()
+            threading.Event().wait(0.5)
+            return create_group('slow')
+
+        try:
+            group = writer.run(slow)
+        finally:
+            writer.get_writer().stop()
+        self.assertTrue(started.is_set())
+        self.assertTrue(Group.objects.filter(pk=group.pk).exists())
+
+    def test_benchmark_command(self):
+        """Команда замера пишет отчёт и убирает созданные строки."""
+        out = StringIO()
+        call_command('benchmark_writes', threads=1, writes=3, stdout=out)
+        self.assertIn('queue', out.getvalue())
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Post.objects.exists())
+
+
+@override_settings(WRITE_QUEUE=True)
+class QueuedViewsTest(TransactionTestCase):
+    """Представления пишут через очередь, если она включена."""
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(author=self.author, text='Текст')
+        self.client.force_login(self.reader)
+
+    def tearDown(self):
+        writer.get_writer().stop()
+
+    def test_writes_go_through_writer(self):
+        """Пост, комментарий, подписка и отписка записывает поток записи."""
+        submitted = []
+        submit = writer.Writer.submit
+
+        def spy(self, fn, *args, **kwargs):
+            submitted.append(fn)
+            return submit(self, fn, *args, **kwargs)
+
+        with mock.patch.object(writer.Writer, 'submit', spy):
+            response = self.client.post(reverse('posts:post_create'),
+                                        {'text': 'Через очередь'})
+            self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+            self.client.post(reverse('posts:add_comment',
+                                     args=[self.post.pk]),
+                             {'text': 'Комментарий'})
+            self.client.get(reverse('posts:profile_follow',
+                                    args=['author']))
+            self.assertTrue(Follow.objects.filter(
+                user=self.reader, author=self.author
+            ).exists())
+            self.client.get(reverse('posts:profile_unfollow',
+                                    args=['author']))
+        self.assertEqual(len(submitted), 4)
+        self.assertTrue(Post.objects.filter(text='Через очередь').exists())
+        self.assertTrue(Comment.objects.filter(post=self.post).exists())
+        self.assertFalse(Follow.objects.exists())
+
+
+class RunInlineTest(TestCase):
+    @override_settings(WRITE_QUEUE=True)
+    def test_inside_transaction_runs_inline(self):
+        """В открытой транзакции запись выполняется на месте."""
+        with mock.patch.object(writer, 'get_writer') as get_writer, \
+                transaction.atomic():
+            group = writer.run(create_group, 'inline')
+        self.assertTrue(Group.objects.filter(pk=group.pk).exists())
+        get_writer.assert_not_called()
+
+    def test_disabled_queue_runs_inline(self):
+        """Без WRITE_QUEUE запись идёт в потоке запроса."""
+        user = User.objects.create_user(username='reader')
+        post = Post.objects.create(author=user, text='Текст')
+        client = self.client
+        client.force_login(user)
+        client.post(reverse('posts:add_comment', args=[post.pk]),
+                    {'text': 'Комментарий'})
+        self.assertTrue(Comment.objects.filter(post=post).exists())
@@ -0,0 +1,113 @@
+"""Замеры времени запроса для ServerTimingMiddleware.
+
+Замеры копятся в объекте текущего потока; вне замеряемого запроса
+обёртки шаблонов и кэша сводятся к одной проверке.
+"""
+import threading
+from functools import wraps
+from time import perf_counter
+
+_local = threading.local()
+_MISSING = object()
+
+
+class RequestTimings:
+    """Сводка по одному запросу; время — в секундах."""
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.db_time = 0.0
+        self.db_count = 0
+        self.template_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.rendering = False
+
+    @property
+    def total_time(self):
+        return perf_counter() - self.started
+
+    def __call__(self, execute, sql, params, many, context):
+        """execute_wrapper: время и число SQL-запросов."""
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += perf_counter() - started
+            self.db_count += 1
+
+
+def current():
+    return getattr(_local, 'timings', None)
+
+
+def start():
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def stop():
+    _local.timings = None
+
+
+def instrument_templates():
+    """Оборачивает рендер шаблонов Django один раз на процесс.
+
+    Вложенные рендеры (render_to_string внутри тега) не считаются
+    повторно: время идёт только у внешнего.
+    """
+    from django.template.backends.django import Template
+
+    original = Template.render
+    if getattr(original, 'timed', False):
+        return
+
+    @wraps(original)
+    def render(self, *args, **kwargs):
+        timings = current()
+        if timings is None or timings.rendering:
+            return original(self, *args, **kwargs)
+        timings.rendering = True
+        started = perf_counter()
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            timings.template_time += perf_counter() - started
+            timings.rendering = False
+
+    render.timed = True
+    Template.render = render
+
+
+def instrument_cache(cache_class):
+    """Считает попадания и промахи get()/get_many() класса кэша."""
+    original_get = cache_class.get
+    if getattr(original_get, 'timed', False):
+        return
+    original_get_many = cache_class.get_many
+
+    @wraps(original_get)
+    def get(self, key, default=None, version=None):
+        timings = current()
+        if timings is None:
+            return original_get(self, key, default, version=version)
+        value = original_get(self, key, _MISSING, version=version)
+        if value is _MISSING:
+            timings.cache_misses += 1
+            return default
+        timings.cache_hits += 1
+        return value
+
+    @wraps(original_get_many)
+    def get_many(self, keys, version=None):
+        keys = list(keys)
+        found = original_get_many(self, keys, version=version)
+        timings = current()
+        if timings is not None:
+            timings.cache_hits += len(found)
+            timings.cache_misses += len(keys) - len(found)
+        return found
+
+    get.timed = True
+    cache_class.get = get
+    cache_class.get_many = get_many
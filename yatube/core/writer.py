@@ -0,0 +1,160 @@
+"""Единственный поток записи в базу.
+
+SQLite пускает писать только одно подключение за раз: при всплеске
+комментариев и подписок потоки запросов по очереди ждут блокировку, и
+каждый платит за собственный коммит. Здесь запись отдаётся одному
+потоку: он забирает из очереди всё, что накопилось, и выполняет пачку
+одной транзакцией, каждую запись — в своей точке сохранения. Ошибка
+одной записи откатывает только её точку сохранения.
+
+Вызывающий поток ждёт коммита пачки и получает результат или
+исключение своей записи, как если бы выполнил её сам.
+"""
+import logging
+import queue
+import threading
+from concurrent import futures
+
+from django.conf import settings
+from django.db import connections, transaction
+
+from core import routers
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class Job:
+    def __init__(self, fn, args, kwargs):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = futures.Future()
+
+
+class Writer:
+    """Поток, выполняющий записи пачками по batch_size."""
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or settings.WRITE_QUEUE_BATCH_SIZE
+        self.batches = 0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        """Ставит запись в очередь и возвращает Future с её результатом."""
+        job = Job(fn, args, kwargs)
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._loop, name='db-writer', daemon=True,
+                )
+                self._thread.start()
+            self._queue.put(job)
+        return job.future
+
+    def stop(self):
+        """Дописывает очередь и останавливает поток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+            if thread is not None:
+                self._queue.put(_STOP)
+        if thread is not None:
+            thread.join()
+
+    def _loop(self):
+        # Всё, что поток читает, читается с основной базы.
+        routers.reset(pinned=True)
+        try:
+            stopping = False
+            while not stopping:
+                jobs, stopping = self._take()
+                if jobs:
+                    self._run(jobs)
+        finally:
+            connections.close_all()
+
+    def _take(self):
+        """Ждёт первую запись и добирает накопившиеся без ожидания."""
+        jobs = []
+        job = self._queue.get()
+        while job is not _STOP:
+            jobs.append(job)
+            if len(jobs) >= self.batch_size:
+                return jobs, False
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                return jobs, False
+        return jobs, True
+
+    def _run(self, jobs):
+        started = []
+        outcomes = []
+        try:
+            with transaction.atomic():
+                for job in jobs:
+                    # Запрос, не дождавшийся очереди, отменил запись и уже
+                    # ответил ошибкой — выполнять её нельзя.
+                    if not job.future.set_running_or_notify_cancel():
+                        continue
+                    started.append(job)
+                    try:
+                        with transaction.atomic():
+                            outcomes.append(
+                                (job, job.fn(*job.args, **job.kwargs), None)
+                            )
+                    except Exception as error:
+                        outcomes.append((job, None, error))
+        except Exception as error:
+            # Не удался сам коммит: не записалось ничего из пачки.
+            logger.exception('Пачка из %s записей не записана',
+                             len(started))
+            for job in started:
+                job.future.set_exception(error)
+            return
+        self.batches += 1
+        for job, result, error in outcomes:
+            if error is None:
+                job.future.set_result(result)
+            else:
+                job.future.set_exception(error)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = Writer()
+        return _writer
+
+
+def run(fn, *args, **kwargs):
+    """Выполняет fn(*args, **kwargs) в транзакции и возвращает результат.
+
+    С WRITE_QUEUE запись уходит потоку записи, вызывающий ждёт её коммита.
+    Если за WRITE_QUEUE_TIMEOUT секунд поток до неё не дошёл, запись
+    отменяется и поднимается TimeoutError; начатую запись вызывающий
+    дожидается, иначе ошибка в ответе разошлась бы с записанным в базу.
+    Внутри уже открытой транзакции запись выполняется на месте: поток
+    записи ждал бы снятия блокировки, которую держит сам вызывающий.
+    """
+    if (not settings.WRITE_QUEUE
+            or connections['default'].in_atomic_block):
+        with transaction.atomic():
+            return fn(*args, **kwargs)
+    future = get_writer().submit(fn, *args, **kwargs)
+    try:
+        result = future.result(settings.WRITE_QUEUE_TIMEOUT)
+    except futures.TimeoutError:
+        if future.cancel():
+            raise
+        result = future.result()
+    routers.written()
+    return result
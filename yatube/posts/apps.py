@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     name = 'posts'
     verbose_name = 'Управление записями пользователем'
+
+    def ready(self):
+        import posts.holes  # noqa: F401
+        import posts.signals  # noqa: F401
@@ -0,0 +1,148 @@
+"""Валидаторы условных запросов (ETag, Last-Modified) для страниц постов.
+
+Считаются до рендера шаблона: лентам хватает поколения из кэша
+(posts.feed_cache), странице поста — одного запроса по первичному ключу.
+Функции *_state описывают содержимое страницы без зрителя и служат
+ключом её заготовки в core.page_cache; ETag добавляет к ним зрителя.
+Запросы к базе запоминаются на request: валидаторы и кэш страницы
+спрашивают одно и то же.
+"""
+import hashlib
+
+from django.contrib.auth import SESSION_KEY, get_user_model
+from django.db.models import Exists, OuterRef, Subquery
+
+from posts import feed_cache, object_cache
+from posts.models import Comment, Follow, Post
+from posts.utils import page_key
+
+User = get_user_model()
+
+
+def _etag(*parts):
+    return hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def _viewer(request):
+    """Id вошедшего пользователя без загрузки его самого из базы.
+
+    Шапка и кнопки страниц зависят от того, кто смотрит, поэтому зритель
+    входит в ETag.
+    """
+    if hasattr(request, '_cached_user'):
+        return request.user.pk
+    return request.session.get(SESSION_KEY)
+
+
+def _feed_state(request, feed):
+    return _etag(feed, feed_cache.version(feed), page_key(request))
+
+
+def index_state(request):
+    return _feed_state(request, feed_cache.INDEX)
+
+
+def index_etag(request):
+    return _etag(index_state(request), _viewer(request))
+
+
+def group_state(request, slug):
+    # Число постов не входит: его меняют те же записи, что и поколение.
+    group = object_cache.get_group(slug)
+    if group is None:
+        return None
+    return _etag(_feed_state(request, feed_cache.group_feed(group.pk)),
+                 group.pk, group.title, group.description)
+
+
+def group_etag(request, slug):
+    state = group_state(request, slug)
+    if state is None:
+        return None
+    return _etag(state, _viewer(request))
+
+
+def _profile(request, username):
+    """Автор, его счётчики и подписка зрителя на него одним запросом.
+
+    Несуществующий автор отсекается кэшем (posts.object_cache) без базы.
+    """
+    cache = request.__dict__.setdefault('_profile_state', {})
+    if username not in cache:
+        author = object_cache.get_user(username)
+        if author is None:
+            cache[username] = None
+            return None
+        cache[username] = User.objects.filter(pk=author.pk).annotate(
+            viewer_follows=Exists(Follow.objects.filter(
+                user=_viewer(request), author=OuterRef('pk')
+            ))
+        ).values_list(
+            'pk', 'first_name', 'last_name', 'stats__posts_count',
+            'stats__followers_count', 'stats__following_count',
+            'viewer_follows',
+        ).first()
+    return cache[username]
+
+
+def profile_state(request, username):
+    author = _profile(request, username)
+    if author is None:
+        return None
+    *author, _ = author
+    return _etag(_feed_state(request, feed_cache.profile_feed(author[0])),
+                 *author)
+
+
+def profile_etag(request, username):
+    author = _profile(request, username)
+    if author is None:
+        return None
+    viewer_follows = author[-1]
+    return _etag(profile_state(request, username), viewer_follows,
+                 _viewer(request))
+
+
+def _post_state(request, post_id):
+    """Всё, от чего зависит страница поста, одним запросом.
+
+    Запоминается на запросе: ETag, Last-Modified и ключ кэша страницы
+    считаются отдельно.
+    """
+    cache = request.__dict__.setdefault('_post_state', {})
+    if post_id not in cache:
+        cache[post_id] = Post.objects.filter(pk=post_id).annotate(
+            last_comment=Subquery(
+                Comment.objects.filter(post=OuterRef('pk'))
+                .order_by('-created').values('created')[:1]
+            )
+        ).values(
+            'updated', 'last_comment', 'comment_count', 'group__title',
+            'author__username', 'author__first_name', 'author__last_name',
+            'author__stats__posts_count',
+        ).first()
+    return cache[post_id]
+
+
+def post_state(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    return _etag(*sorted(state.items()), request.GET.get('comments', ''))
+
+
+def post_etag(request, post_id):
+    state = post_state(request, post_id)
+    if state is None:
+        return None
+    return _etag(state, _viewer(request))
+
+
+def post_last_modified(request, post_id):
+    state = _post_state(request, post_id)
+    if state is None:
+        return None
+    stamps = [state['updated'], state['last_comment']]
+    return max(stamp for stamp in stamps if stamp is not None)
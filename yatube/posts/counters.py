@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from posts import object_cache
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+def _bump(queryset, **deltas):
+    """Атомарно сдвигает счётчики UPDATE ... SET x = MAX(x + d, 0).
+
+    Счётчики могут разойтись с данными (bulk_create и импорт обходят
+    сигналы), и удаление не должно падать на CHECK (x >= 0): счётчик
+    останавливается на нуле, точное значение вернёт recount_counters.
+    """
+    return queryset.update(**{
+        field: Greatest(F(field) + delta, 0)
+        for field, delta in deltas.items()
+    })
+
+
+def bump_user(user_id, **deltas):
+    """Сдвигает счётчики пользователя.
+
+    Если строки ещё нет, ничего не делает: её посчитает user_stats()
+    при первом чтении или команда recount_counters.
+    """
+    return _bump(UserStats.objects.filter(user_id=user_id), **deltas)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), post_count=delta)
+
+
+def bump_post(post_id, delta):
+    _bump(Post.objects.filter(pk=post_id), comment_count=delta)
+
+
+def user_stats(user):
+    """Возвращает счётчики пользователя, досчитывая отсутствующие."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_users(User.objects.filter(pk=user.pk)).get()
+
+
+def _count(queryset, field, outer='pk'):
+    """Подзапрос COUNT(*) по field = внешнему outer, 0 при отсутствии строк."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef(outer)})
+            .order_by()
+            .values(field)
+            .annotate(total=Count('pk'))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+@transaction.atomic
+def recount_users(users=None):
+    """Пересчитывает счётчики пользователей одним UPDATE на таблицу."""
+    users = User.objects.all() if users is None else users
+    UserStats.objects.bulk_create(
+        (UserStats(user_id=pk) for pk in users.filter(
+            stats__isnull=True).values_list('pk', flat=True).iterator()),
+        batch_size=500,
+        ignore_conflicts=True,
+    )
+    stats = UserStats.objects.filter(user__in=users)
+    stats.update(
+        posts_count=_count(Post.objects.all(), 'author', 'user'),
+        followers_count=_count(Follow.objects.all(), 'author', 'user'),
+        following_count=_count(Follow.objects.all(), 'user', 'user'),
+    )
+    return stats
+
+
+@transaction.atomic
+def recount_all():
+    """Пересчитывает все денормализованные счётчики."""
+    recount_users()
+    Group.objects.update(post_count=_count(Post.objects.all(), 'group'))
+    object_cache.forget_group(*Group.objects.values_list('slug', flat=True))
+    Post.objects.update(comment_count=_count(Comment.objects.all(), 'post'))
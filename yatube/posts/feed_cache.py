@@ -0,0 +1,85 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core import routers
+from posts.utils import page_key
+
+INDEX = 'index'
+
+
+def group_feed(group_id):
+    if group_id is None:
+        return None
+    return f'group:{group_id}'
+
+
+def profile_feed(user_id):
+    return f'profile:{user_id}'
+
+
+def _generation_key(feed):
+    return f'feed-generation:{feed}'
+
+
+def _fresh_generation():
+    # Отметка времени, а не 1: если счётчик вытеснен из кэша, новый
+    # номер не совпадёт ни с одним из уже закэшированных фрагментов.
+    return time.time_ns()
+
+
+def generation(feed):
+    """Текущее поколение ленты; входит в ключ её закэшированных страниц."""
+    key = _generation_key(feed)
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, _fresh_generation(), None)
+        value = cache.get(key)
+    return value
+
+
+def version(feed):
+    """Версия закэшированных страниц ленты.
+
+    Страницы, собранные по данным реплики, дополнительно привязаны к
+    номеру её синхронизации: иначе отставшая реплика закэшировала бы
+    старую ленту под новым поколением до следующей записи.
+    """
+    if routers.reads_from_replica():
+        return f'{generation(feed)}.r{routers.replica_version()}'
+    return generation(feed)
+
+
+def _bump(feeds):
+    for feed in feeds:
+        try:
+            cache.incr(_generation_key(feed))
+        except ValueError:
+            cache.set(_generation_key(feed), _fresh_generation(), None)
+
+
+def bump(*feeds):
+    """Сбрасывает закэшированные страницы лент.
+
+    Поколение сдвигается сразу и ещё раз после коммита: иначе читатель,
+    успевший между ними закэшировать страницу по старым данным, оставил
+    бы её жить под новым поколением.
+    """
+    feeds = [feed for feed in feeds if feed is not None]
+    _bump(feeds)
+    transaction.on_commit(lambda: _bump(feeds))
+
+
+def post_feeds(author_id, group_id):
+    """Ленты, в которых показывается пост."""
+    return INDEX, profile_feed(author_id), group_feed(group_id)
+
+
+def feed_context(request, feed):
+    """Контекст для {% cache %} ленты: ключ страницы и время жизни."""
+    return {
+        'feed_cache_key': f'{feed}:{version(feed)}:{page_key(request)}',
+        'feed_cache_timeout': settings.FEED_CACHE_TIMEOUT,
+    }
@@ -1,4 +1,7 @@
 from django import forms
+from django.core.files.uploadedfile import UploadedFile
+
+from posts import images
 from posts.models import Post, Comment
 
 
@@ -7,6 +10,28 @@ class PostForm(forms.ModelForm):
         model = Post
         fields = ('text', 'group', 'image')
 
+    def clean_image(self):
+        """Уменьшает и перекодирует новую картинку (posts.images)."""
+        image = self.cleaned_data.get('image')
+        if not isinstance(image, UploadedFile):
+            return image
+        image, self.image_size = images.ingest(image)
+        return image
+
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            self.instance.image_width, self.instance.image_height = (
+                getattr(self, 'image_size', (None, None))
+            )
+        return super().save(commit)
+
+
+class PostAdminForm(PostForm):
+    """Форма админки: все поля поста, картинка — через тот же приём."""
+
+    class Meta(PostForm.Meta):
+        fields = '__all__'
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
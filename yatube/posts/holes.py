@@ -0,0 +1,43 @@
+"""Части страниц постов, зависящие от зрителя (core.page_cache)."""
+from django.template.loader import render_to_string
+
+from core import page_cache
+from posts.forms import CommentForm
+from posts.models import Follow
+
+
+@page_cache.hole('switcher')
+def switcher(request):
+    return render_to_string('posts/includes/switcher.html', request=request)
+
+
+@page_cache.hole('follow_button')
+def follow_button(request, username):
+    if request.user.username == username:
+        return ''
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=username
+    ).exists()
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'username': username, 'following': following}, request,
+    )
+
+
+@page_cache.hole('edit_button')
+def edit_button(request, post_id, author_id):
+    if str(request.user.pk) != author_id:
+        return ''
+    return render_to_string(
+        'posts/includes/edit_button.html', {'post_id': post_id}, request,
+    )
+
+
+@page_cache.hole('comment_form')
+def comment_form(request, post_id):
+    if not request.user.is_authenticated:
+        return ''
+    return render_to_string(
+        'posts/includes/comment_form.html',
+        {'post_id': post_id, 'form': CommentForm()}, request,
+    )
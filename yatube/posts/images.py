@@ -0,0 +1,71 @@
+"""Приём картинок постов перед сохранением.
+
+Оригиналы с телефонов весят мегабайты, и каждая миниатюра открывала бы
+их целиком. Поэтому при загрузке картинка поворачивается по EXIF,
+уменьшается до IMAGE_MAX_SIZE и перекодируется без метаданных. Размеры
+проверяются по заголовку до распаковки пикселей, так что «бомба»
+отклоняется, не заняв память.
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+
+def has_alpha(image):
+    return image.mode in ('RGBA', 'LA') or (
+        image.mode == 'P' and 'transparency' in image.info
+    )
+
+
+def ingest(upload):
+    """Возвращает файл для хранения и его размеры (ширина, высота).
+
+    Форматы из IMAGE_PASSTHROUGH_FORMATS (GIF — ради анимации) в пределах
+    IMAGE_MAX_SIZE сохраняются как есть. Остальное уходит в JPEG, а
+    картинки с прозрачностью — в PNG.
+    """
+    upload.seek(0)
+    try:
+        image = Image.open(upload)
+    except (OSError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку.',
+                              code='invalid_image')
+    with image:
+        width, height = image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValidationError(
+                'Картинка слишком большая: %(width)s×%(height)s.',
+                code='image_too_large',
+                params={'width': width, 'height': height},
+            )
+        limit = settings.IMAGE_MAX_SIZE
+        if (image.format in settings.IMAGE_PASSTHROUGH_FORMATS
+                and max(width, height) <= limit):
+            upload.seek(0)
+            return upload, (width, height)
+        try:
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((limit, limit), Image.LANCZOS)
+        except (OSError, SyntaxError):
+            raise ValidationError('Картинка повреждена.',
+                                  code='invalid_image')
+
+    icc_profile = image.info.get('icc_profile')
+    output = io.BytesIO()
+    if has_alpha(image):
+        extension = 'png'
+        image.save(output, 'PNG', optimize=True, icc_profile=icc_profile)
+    else:
+        extension = 'jpg'
+        image.convert('RGB').save(
+            output, 'JPEG', quality=settings.IMAGE_JPEG_QUALITY,
+            optimize=True, progressive=True, icc_profile=icc_profile,
+        )
+    stem = os.path.splitext(os.path.basename(upload.name))[0]
+    return ContentFile(output.getvalue(), name=f'{stem}.{extension}'), (
+        image.size
+    )
@@ -0,0 +1,75 @@
+"""Хранилище метаданных миниатюр sorl с пакетной выборкой.
+
+Обычный cached_db_kvstore делает по запросу в кэш (и в базу при
+промахе) на каждую миниатюру: для ленты с четырьмя размерами картинок
+это десятки обращений на страницу. Здесь страница подгружает метаданные
+всех своих миниатюр заранее (posts.thumbnails.prefetched).
+"""
+import threading
+from contextlib import contextmanager
+
+from sorl.thumbnail.conf import settings
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as BaseKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+_local = threading.local()
+
+
+class KVStore(BaseKVStore):
+    """cached_db_kvstore, который умеет подгружать ключи пачкой.
+
+    Внутри batch() значения, полученные prefetch(), берутся из памяти
+    потока: одним get_many кэша и одним запросом к базе для промахов.
+    Вне batch() хранилище ведёт себя как исходное.
+    """
+
+    @contextmanager
+    def batch(self):
+        outer = getattr(_local, 'values', None)
+        if outer is None:
+            _local.values = {}
+        try:
+            yield
+        finally:
+            _local.values = outer
+
+    def prefetch(self, keys):
+        values = getattr(_local, 'values', None)
+        if values is None:
+            return
+        keys = [key for key in keys if key not in values]
+        if not keys:
+            return
+        found = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in found]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing)
+                .values_list('key', 'value')
+            )
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(fetched, settings.THUMBNAIL_CACHE_TIMEOUT)
+            found.update(fetched)
+        values.update(found)
+
+    def _get_raw(self, key):
+        values = getattr(_local, 'values', None)
+        if values is not None and key in values:
+            value = values[key]
+            return None if value == EMPTY_VALUE else value
+        return super()._get_raw(key)
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self._forget(key)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        for key in keys:
+            self._forget(key)
+
+    def _forget(self, key):
+        values = getattr(_local, 'values', None)
+        if values is not None:
+            values.pop(key, None)
@@ -0,0 +1,250 @@
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, UserStats
+
+# Записывающие представления идут последними, чтобы их сброс кэша лент
+# не влиял на замеры чтения.
+VIEWS = (
+    'index', 'group_posts', 'profile', 'post_detail', 'follow_index',
+    'post_create', 'add_comment',
+)
+
+
+def _percentile(ordered, percent):
+    """Перцентиль отсортированного списка с линейной интерполяцией.
+
+    Совпадает с statistics.quantiles(method='inclusive'), которого нет
+    в Python 3.7.
+    """
+    position = (len(ordered) - 1) * percent / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    fraction = position - lower
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * fraction
+
+
+def summarize(samples):
+    """p50/p95/p99, среднее и максимум по списку секунд — в миллисекундах."""
+    ms = sorted(sample * 1000 for sample in samples)
+    return {
+        'p50_ms': round(_percentile(ms, 50), 2),
+        'p95_ms': round(_percentile(ms, 95), 2),
+        'p99_ms': round(_percentile(ms, 99), 2),
+        'mean_ms': round(statistics.mean(ms), 2),
+        'max_ms': round(ms[-1], 2),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет представления постов тестовым клиентом на текущей базе: '
+        'задержки p50/p95/p99, число SQL-запросов и выделенную память. '
+        'Базу стоит заранее заполнить командой seed_data. Результат '
+        'пишется в JSON; с --compare сравнивается с прошлым прогоном.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Замеров на представление.',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Запросов до замеров: прогрев кэшей и подключений.',
+        )
+        parser.add_argument(
+            '--view', action='append', dest='views', choices=VIEWS,
+            help='Замерить только это представление '
+                 '(можно указать несколько раз).',
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кэш перед каждым запросом.',
+        )
+        parser.add_argument(
+            '--output', default='benchmark.json',
+            help='Куда сохранить результаты.',
+        )
+        parser.add_argument(
+            '--compare', metavar='JSON',
+            help='Прошлый результат: вывести разницу и завершиться '
+                 'с ошибкой при регрессии.',
+        )
+        parser.add_argument(
+            '--threshold', type=float, default=20,
+            help='Допустимый рост p50 при --compare, в процентах: '
+                 'p95 на десятках замеров слишком шумный.',
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations должно быть не меньше 1')
+        targets = self.targets()
+        selected = set(options['views'] or VIEWS)
+        self.cold = options['cold']
+        self.created_from = {
+            model: model.objects.order_by('-pk')
+            .values_list('pk', flat=True).first() or 0
+            for model in (Post, Comment)
+        }
+        results = {}
+        try:
+            for name in VIEWS:
+                if name not in selected:
+                    continue
+                client, method, url, data = targets[name]
+                results[name] = self.measure(
+                    client, method, url, data,
+                    options['iterations'], options['warmup'],
+                )
+                self.report(name, results[name])
+        finally:
+            self.cleanup()
+
+        report = {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'iterations': options['iterations'],
+            'cold': self.cold,
+            'dataset': {
+                model.__name__: model.objects.count()
+                for model in (Post, Comment, UserStats, Group)
+            },
+            'views': results,
+        }
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты сохранены в {options["output"]}'
+        ))
+        if options['compare']:
+            self.compare(results, options['compare'], options['threshold'])
+
+    def targets(self):
+        """Самые тяжёлые страницы набора: крупнейшие группа, автор, пост."""
+        post = Post.objects.order_by('-comment_count', '-pk').first()
+        if post is None:
+            raise CommandError('База пуста: сначала запустите seed_data')
+        group = Group.objects.order_by('-post_count').first()
+        author = (UserStats.objects.select_related('user')
+                  .order_by('-posts_count').first().user)
+        reader = (UserStats.objects.select_related('user')
+                  .order_by('-following_count').first().user)
+        guest = Client(HTTP_HOST='localhost')
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(reader)
+        targets = {
+            'index': (guest, 'get', reverse('posts:index'), None),
+            'profile': (guest, 'get', reverse(
+                'posts:profile', kwargs={'username': author.username}
+            ), None),
+            'post_detail': (guest, 'get', reverse(
+                'posts:post_detail', kwargs={'post_id': post.pk}
+            ), None),
+            'follow_index': (
+                client, 'get', reverse('posts:follow_index'), None
+            ),
+            'post_create': (client, 'post', reverse('posts:post_create'), {
+                'text': 'Замер скорости публикации',
+                'group': group.pk if group else '',
+            }),
+            'add_comment': (client, 'post', reverse(
+                'posts:add_comment', kwargs={'post_id': post.pk}
+            ), {'text': 'Замер скорости комментария'}),
+        }
+        if group is not None:
+            targets['group_posts'] = (guest, 'get', reverse(
+                'posts:group_list', kwargs={'slug': group.slug}
+            ), None)
+        else:
+            targets['group_posts'] = targets['index']
+        return targets
+
+    def request(self, client, method, url, data):
+        if self.cold:
+            cache.clear()
+        response = getattr(client, method)(url, data)
+        if response.status_code >= 400:
+            raise CommandError(f'{url}: ответ {response.status_code}')
+        return response
+
+    def measure(self, client, method, url, data, iterations, warmup):
+        for _ in range(warmup):
+            self.request(client, method, url, data)
+
+        gc.collect()
+        timings = []
+        queries = []
+        for _ in range(iterations):
+            with ExitStack() as stack:
+                captured = [
+                    stack.enter_context(CaptureQueriesContext(connection))
+                    for connection in connections.all()
+                ]
+                started = time.perf_counter()
+                self.request(client, method, url, data)
+                timings.append(time.perf_counter() - started)
+            queries.append(sum(len(capture) for capture in captured))
+
+        # tracemalloc замедляет код в разы, поэтому память меряется
+        # отдельным коротким проходом и на задержки не влияет. Пик
+        # сбрасывается перезапуском: reset_peak() появился в Python 3.9.
+        peaks = []
+        for _ in range(min(iterations, 5)):
+            tracemalloc.start()
+            try:
+                self.request(client, method, url, data)
+                peaks.append(tracemalloc.get_traced_memory()[1])
+            finally:
+                tracemalloc.stop()
+
+        return {
+            **summarize(timings),
+            'queries': max(queries),
+            'peak_kb': round(statistics.median(peaks) / 1024, 1),
+        }
+
+    def cleanup(self):
+        """Удаляет посты и комментарии, созданные замерами."""
+        for model, last in self.created_from.items():
+            model.objects.filter(pk__gt=last).delete()
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<14} p50 {result["p50_ms"]:>8.2f} мс  '
+            f'p95 {result["p95_ms"]:>8.2f} мс  '
+            f'p99 {result["p99_ms"]:>8.2f} мс  '
+            f'запросов {result["queries"]:>3}  '
+            f'память {result["peak_kb"]:>8.1f} КБ'
+        )
+
+    def compare(self, results, path, threshold):
+        with open(path) as baseline_file:
+            baseline = json.load(baseline_file)['views']
+        regressions = []
+        for name, result in results.items():
+            if name not in baseline:
+                continue
+            before = baseline[name]
+            change = (result['p50_ms'] / before['p50_ms'] - 1) * 100
+            tail = (result['p95_ms'] / before['p95_ms'] - 1) * 100
+            queries = result['queries'] - before['queries']
+            self.stdout.write(
+                f'{name:<14} p50 {change:+6.1f}%  p95 {tail:+6.1f}%  '
+                f'запросов {queries:+d}'
+            )
+            if change > threshold or queries > 0:
+                regressions.append(name)
+        if regressions:
+            raise CommandError(f'Регрессия: {", ".join(regressions)}')
@@ -0,0 +1,115 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+
+from core.writer import Writer
+from posts.management.commands.benchmark import summarize
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+SCRATCH_USERNAME = 'benchmark-writes'
+
+
+def hammer(write, threads, writes):
+    """threads потоков по writes записей; задержки, ошибки и время."""
+    samples = []
+    errors = []
+    start = threading.Barrier(threads)
+
+    def worker():
+        try:
+            start.wait()
+            for _ in range(writes):
+                began = time.perf_counter()
+                try:
+                    write()
+                except OperationalError as error:
+                    errors.append(error)
+                else:
+                    samples.append(time.perf_counter() - began)
+        finally:
+            connections.close_all()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    began = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return samples, errors, time.perf_counter() - began
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает запись комментариев из многих потоков напрямую и через '
+        'поток записи (core.writer) на текущей базе: записей в секунду, '
+        'задержки и ошибки блокировки. Созданные строки удаляются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=16,
+            help='Сколько потоков пишут одновременно.',
+        )
+        parser.add_argument(
+            '--writes', type=int, default=100,
+            help='Сколько комментариев пишет каждый поток.',
+        )
+
+    def handle(self, *args, threads, writes, **options):
+        if threads < 1 or writes < 1:
+            raise CommandError('--threads и --writes должны быть больше 0')
+        if User.objects.filter(username=SCRATCH_USERNAME).exists():
+            raise CommandError(
+                f'Пользователь {SCRATCH_USERNAME} уже есть: прошлый прогон '
+                f'не убрал за собой, удалите его вручную.'
+            )
+        author = User.objects.create(username=SCRATCH_USERNAME)
+        post = Post.objects.create(author=author, text='benchmark_writes')
+        connections.close_all()
+
+        def comment():
+            Comment.objects.create(post=post, author=author, text='x')
+
+        def direct():
+            with transaction.atomic():
+                comment()
+
+        writer = Writer()
+        results = {}
+        try:
+            results['direct'] = hammer(direct, threads, writes)
+            results['queue'] = hammer(
+                lambda: writer.submit(comment).result(), threads, writes,
+            )
+        finally:
+            writer.stop()
+            author.delete()
+
+        self.stdout.write(
+            f'{"режим":<8} {"записей/с":>10} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"ошибок":>7}'
+        )
+        rates = {}
+        for mode, (samples, errors, elapsed) in results.items():
+            rates[mode] = len(samples) / elapsed
+            stats = summarize(samples) if samples else {
+                'p50_ms': 0, 'p95_ms': 0,
+            }
+            self.stdout.write(
+                f'{mode:<8} {rates[mode]:>10.0f} {stats["p50_ms"]:>9} '
+                f'{stats["p95_ms"]:>9} {len(errors):>7}'
+            )
+        self.stdout.write(
+            f'Транзакций в режиме queue: {writer.batches} '
+            f'на {threads * writes} записей'
+        )
+        if rates['direct']:
+            self.stdout.write(self.style.SUCCESS(
+                f'Очередь: {rates["queue"] / rates["direct"]:.1f}× '
+                f'от прямой записи'
+            ))
@@ -0,0 +1,55 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts import thumbnails
+from posts.models import Post
+
+
+def _generate(image_name):
+    """Выполняется в дочернем процессе; ошибки возвращает, а не бросает."""
+    try:
+        thumbnails.generate(image_name)
+    except Exception as error:
+        return image_name, str(error)
+    return image_name, None
+
+
+class Command(BaseCommand):
+    help = (
+        'Создаёт миниатюры картинок всех постов по THUMBNAIL_PRESETS. '
+        'Нужна после массового импорта и смены размеров в шаблонах; '
+        'уже созданные миниатюры берутся из хранилища sorl-thumbnail.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Число процессов (по умолчанию — по числу ядер). '
+                 'При 1 миниатюры создаются в текущем процессе.',
+        )
+
+    def handle(self, *args, workers, **options):
+        names = list(
+            Post.objects.exclude(image='')
+            .order_by('image')
+            .values_list('image', flat=True)
+            .distinct()
+        )
+        if workers > 1:
+            # Дочерние процессы не должны унаследовать открытое
+            # подключение к базе: каждый откроет своё.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(_generate, names, chunksize=8))
+        else:
+            results = [_generate(name) for name in names]
+        failed = [(name, error) for name, error in results if error]
+        for name, error in failed:
+            self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок обработано: {len(names) - len(failed)}, '
+            f'ошибок: {len(failed)}'
+        ))
@@ -0,0 +1,378 @@
+import io
+import json
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from multiprocessing import get_context
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+import requests
+from django.conf import settings
+from django.contrib.auth import (BACKEND_SESSION_KEY, HASH_SESSION_KEY,
+                                 SESSION_KEY)
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connections
+from django.urls import reverse
+from PIL import Image
+
+from posts.management.commands.benchmark import summarize
+from posts.models import Comment, Group, Post, UserStats
+
+# Верхние границы корзин гистограммы задержек, мс; последняя — всё,
+# что дольше.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+DEFAULT_MIX = 'browse=70,feed=15,comment=10,upload=5'
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, *args):
+        pass
+
+
+def serve(port, lock_errors, ready):
+    """Запускается в дочернем процессе: WSGI-сервер с потоком на запрос.
+
+    Ошибки «database is locked» считаются в общий счётчик: клиент видит
+    только ответ 500 и не отличит их от прочих.
+    """
+    def count_lock_error(sender, **kwargs):
+        error = sys.exc_info()[1]
+        if isinstance(error, OperationalError) and 'locked' in str(error):
+            with lock_errors.get_lock():
+                lock_errors.value += 1
+
+    got_request_exception.connect(count_lock_error, weak=False)
+    server = make_server(
+        '127.0.0.1', 0, get_wsgi_application(),
+        server_class=ThreadingWSGIServer, handler_class=QuietHandler,
+    )
+    port.value = server.server_port
+    ready.set()
+    server.serve_forever()
+
+
+def parse_mix(value):
+    """'browse=70,feed=15' -> {'browse': 70.0, 'feed': 15.0}."""
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name not in Worker.SCENARIOS:
+            raise CommandError(f'Неизвестный сценарий: {name}')
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise CommandError(f'Вес сценария {name} — не число')
+    if not any(mix.values()):
+        raise CommandError('Все веса сценариев нулевые')
+    return mix
+
+
+def histogram(samples):
+    """Число замеров в каждой корзине BUCKETS_MS."""
+    counts = Counter()
+    for sample in samples:
+        ms = sample * 1000
+        bucket = next((f'<={edge}' for edge in BUCKETS_MS if ms <= edge),
+                      f'>{BUCKETS_MS[-1]}')
+        counts[bucket] += 1
+    labels = [f'<={edge}' for edge in BUCKETS_MS] + [f'>{BUCKETS_MS[-1]}']
+    return {label: counts[label] for label in labels}
+
+
+def make_png(rng):
+    image = Image.new('RGB', (640, 480), tuple(
+        rng.randrange(256) for _ in range(3)
+    ))
+    output = io.BytesIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+
+class Worker:
+    """Клиент одного потока: гость и вошедший пользователь."""
+
+    SCENARIOS = ('browse', 'feed', 'comment', 'upload')
+
+    def __init__(self, base_url, targets, session_key, seed):
+        self.base_url = base_url
+        self.targets = targets
+        self.rng = random.Random(seed)
+        self.guest = requests.Session()
+        self.member = requests.Session()
+        self.member.cookies.set(settings.SESSION_COOKIE_NAME, session_key)
+        self.image = make_png(self.rng)
+
+    def url(self, path):
+        return self.base_url + path
+
+    def prepare(self):
+        """Получает CSRF-cookie: без неё POST-запросы вернут 403."""
+        self.member.get(self.url(reverse('posts:post_create')))
+        self.member.headers['X-CSRFToken'] = (
+            self.member.cookies[settings.CSRF_COOKIE_NAME]
+        )
+
+    def browse(self):
+        rng = self.rng
+        targets = self.targets
+        path = rng.choice((
+            lambda: reverse('posts:index') + f'?page={rng.randint(1, 5)}',
+            lambda: reverse('posts:group_list', kwargs={
+                'slug': rng.choice(targets['groups']),
+            }),
+            lambda: reverse('posts:profile', kwargs={
+                'username': rng.choice(targets['authors']),
+            }),
+            lambda: reverse('posts:post_detail', kwargs={
+                'post_id': rng.choice(targets['posts']),
+            }),
+        ))()
+        return self.guest.get(self.url(path))
+
+    def feed(self):
+        return self.member.get(self.url(reverse('posts:follow_index')))
+
+    def comment(self):
+        path = reverse('posts:add_comment', kwargs={
+            'post_id': self.rng.choice(self.targets['posts']),
+        })
+        return self.member.post(
+            self.url(path), data={'text': 'Комментарий нагрузки'},
+            allow_redirects=False,
+        )
+
+    def upload(self):
+        return self.member.post(
+            self.url(reverse('posts:post_create')),
+            data={'text': 'Пост нагрузки'},
+            files={'image': ('load.png', self.image, 'image/png')},
+            allow_redirects=False,
+        )
+
+    def run(self, mix, deadline):
+        names = list(mix)
+        weights = list(mix.values())
+        records = []
+        while time.monotonic() < deadline:
+            name = self.rng.choices(names, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = getattr(self, name)().status_code
+            except requests.RequestException as error:
+                status = type(error).__name__
+            records.append((name, time.perf_counter() - started, status))
+        return records
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон: смесь сценариев (гость листает страницы, '
+        'читатель открывает ленту подписок, комментарии, загрузка картинок) '
+        'из многих потоков против локального WSGI-сервера. Выводит '
+        'пропускную способность, гистограммы задержек и число ошибок '
+        'блокировки SQLite для каждого уровня параллельности.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', default='1,4,16',
+            help='Уровни параллельности через запятую, по шагу на каждый.',
+        )
+        parser.add_argument(
+            '--duration', type=float, default=20,
+            help='Секунд на шаг.',
+        )
+        parser.add_argument(
+            '--mix', default=DEFAULT_MIX,
+            help=f'Веса сценариев, по умолчанию {DEFAULT_MIX}.',
+        )
+        parser.add_argument(
+            '--url',
+            help='Адрес уже запущенного сервера; без него сервер '
+                 'поднимается в отдельном процессе. Ошибки блокировки '
+                 'внешнего сервера не считаются.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Сохранить результаты в JSON.')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['threads'].split(',')]
+        except ValueError:
+            raise CommandError('--threads: числа через запятую')
+        if not levels or min(levels) < 1:
+            raise CommandError('--threads: нужен хотя бы один поток')
+        mix = parse_mix(options['mix'])
+        rng = random.Random(options['seed'])
+        targets = self.targets()
+        members = targets.pop('members')
+        session_keys = [self.login(user) for user in members]
+        created_from = {
+            model: model.objects.order_by('-pk')
+            .values_list('pk', flat=True).first() or 0
+            for model in (Post, Comment)
+        }
+
+        server = None
+        lock_errors = None
+        base_url = options['url']
+        if base_url is None:
+            server, base_url, lock_errors = self.start_server()
+        base_url = base_url.rstrip('/')
+        try:
+            workers = [
+                Worker(base_url, targets,
+                       session_keys[index % len(session_keys)],
+                       rng.random())
+                for index in range(max(levels))
+            ]
+            for worker in workers:
+                worker.prepare()
+            steps = [
+                self.step(workers[:threads], mix, options['duration'],
+                          lock_errors)
+                for threads in levels
+            ]
+        finally:
+            if server is not None:
+                server.terminate()
+                server.join()
+            self.cleanup(created_from, session_keys)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'mix': mix, 'steps': steps}, output,
+                          ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(
+                f'Результаты сохранены в {options["output"]}'
+            ))
+
+    def targets(self):
+        posts = list(
+            Post.objects.order_by('?').values_list('pk', flat=True)[:1000]
+        )
+        if not posts:
+            raise CommandError('База пуста: сначала запустите seed_data')
+        stats = UserStats.objects.select_related('user').order_by('?')
+        members = [
+            stats.user for stats in stats.filter(following_count__gt=0)[:50]
+        ] or [stats.user for stats in stats[:50]]
+        return {
+            'posts': posts,
+            'groups': list(Group.objects.values_list('slug', flat=True))
+            or ['missing'],
+            'authors': list(
+                stats.filter(posts_count__gt=0)
+                .values_list('user__username', flat=True)[:1000]
+            ),
+            'members': members,
+        }
+
+    def login(self, user):
+        """Сессия вошедшего пользователя, как у Client.force_login."""
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        return session.session_key
+
+    def start_server(self):
+        context = get_context('fork')
+        port = context.Value('i', 0)
+        lock_errors = context.Value('i', 0)
+        ready = context.Event()
+        # Подключения к SQLite нельзя переносить через fork.
+        connections.close_all()
+        server = context.Process(
+            target=serve, args=(port, lock_errors, ready), daemon=True
+        )
+        server.start()
+        if not ready.wait(30):
+            server.terminate()
+            raise CommandError('Сервер не запустился')
+        return server, f'http://127.0.0.1:{port.value}', lock_errors
+
+    def step(self, workers, mix, duration, lock_errors):
+        locks_before = lock_errors.value if lock_errors else 0
+        deadline = time.monotonic() + duration
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(workers)) as executor:
+            batches = list(executor.map(
+                lambda worker: worker.run(mix, deadline), workers
+            ))
+        elapsed = time.monotonic() - started
+        records = [record for batch in batches for record in batch]
+
+        scenarios = {}
+        for name in mix:
+            samples = [took for scenario, took, _ in records
+                       if scenario == name]
+            if not samples:
+                continue
+            statuses = Counter(str(status) for scenario, _, status
+                               in records if scenario == name)
+            scenarios[name] = {
+                'requests': len(samples),
+                **summarize(samples),
+                'statuses': dict(statuses),
+                'histogram': histogram(samples),
+            }
+        errors = sum(
+            1 for _, _, status in records
+            if not isinstance(status, int) or status >= 500
+        )
+        result = {
+            'threads': len(workers),
+            'requests': len(records),
+            'throughput_rps': round(len(records) / elapsed, 1),
+            'errors': errors,
+            'sqlite_lock_errors': (
+                lock_errors.value - locks_before if lock_errors else None
+            ),
+            'histogram': histogram([took for _, took, _ in records]),
+            'scenarios': scenarios,
+        }
+        self.report(result)
+        return result
+
+    def report(self, result):
+        locks = result['sqlite_lock_errors']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'Потоков: {result["threads"]}  '
+            f'{result["throughput_rps"]} запр/с  '
+            f'ошибок: {result["errors"]}  '
+            f'блокировок SQLite: {"—" if locks is None else locks}'
+        ))
+        for name, scenario in result['scenarios'].items():
+            self.stdout.write(
+                f'  {name:<8} {scenario["requests"]:>6} запр  '
+                f'p50 {scenario["p50_ms"]:>8.1f}  '
+                f'p95 {scenario["p95_ms"]:>8.1f}  '
+                f'p99 {scenario["p99_ms"]:>8.1f} мс  '
+                f'{scenario["statuses"]}'
+            )
+        widest = max(result['histogram'].values()) or 1
+        for bucket, count in result['histogram'].items():
+            bar = '#' * round(40 * count / widest)
+            self.stdout.write(f'  {bucket:>7} мс {count:>6} {bar}')
+
+    def cleanup(self, created_from, session_keys):
+        """Удаляет созданные прогоном посты, комментарии и сессии."""
+        # Картинки и миниатюры удаляет сигнал удаления поста.
+        Post.objects.filter(pk__gt=created_from[Post]).delete()
+        Comment.objects.filter(pk__gt=created_from[Comment]).delete()
+        store = import_module(settings.SESSION_ENGINE).SessionStore
+        for key in session_keys:
+            store(key).delete()
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает полнотекстовый индекс постов. Нужна после массового '
+        'импорта в обход сигналов (bulk_create, update).'
+    )
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            self.stdout.write('Индекс поддерживается только на SQLite')
+            return
+        indexed = search.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Индекс пересобран, постов: {indexed}'
+        ))
@@ -0,0 +1,35 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересобирает ленты подписок (таблицу Timeline) по текущим '
+        'подпискам. Нужна после первой установки, массового импорта и '
+        'смены порога TIMELINE_FANOUT_LIMIT.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', action='append', dest='usernames', default=[],
+            help='Пересобрать ленту только этого пользователя '
+                 '(можно указать несколько раз).',
+        )
+
+    def handle(self, *args, usernames, **options):
+        users = None
+        if usernames:
+            users = list(User.objects.filter(username__in=usernames))
+            missing = set(usernames) - {user.username for user in users}
+            if missing:
+                raise CommandError(
+                    f'Пользователи не найдены: {", ".join(sorted(missing))}'
+                )
+        inserted = timeline.rebuild(users)
+        self.stdout.write(self.style.SUCCESS(
+            f'Лента пересобрана, записей: {inserted}'
+        ))
@@ -0,0 +1,265 @@
+import bisect
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from faker import Faker
+
+from posts import counters, feed_cache, search, timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Пароль, под которым нельзя войти (как у set_unusable_password), но
+# без случайной части: данные должны повторяться при том же --seed.
+UNUSABLE_PASSWORD = '!seed_data'
+
+
+def zipf_cum_weights(n, exponent):
+    """Накопленные веса степенного закона: ранг r весит 1 / r^exponent."""
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, n + 1)
+    ))
+
+
+def pick(rng, cum_weights):
+    """Индекс по накопленным весам, как random.choices, но без списка."""
+    return bisect.bisect(cum_weights, rng.random() * cum_weights[-1])
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def manual_dates():
+    """Отключает auto_now/auto_now_add, чтобы задать даты самим."""
+    fields = [
+        (Post._meta.get_field('pub_date'), 'auto_now_add'),
+        (Post._meta.get_field('updated'), 'auto_now'),
+        (Comment._meta.get_field('created'), 'auto_now_add'),
+    ]
+    for field, attribute in fields:
+        setattr(field, attribute, False)
+    try:
+        yield
+    finally:
+        for field, attribute in fields:
+            setattr(field, attribute, True)
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими данными для нагрузочных проверок: '
+        'степенной граф подписок, несколько огромных групп, всплески '
+        'публикаций. При одинаковых --seed и --end данные совпадают.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20000)
+        parser.add_argument('--groups', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=500000)
+        parser.add_argument('--comments', type=int, default=1000000)
+        parser.add_argument('--follows', type=int, default=200000)
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней до --end распределены публикации.',
+        )
+        parser.add_argument(
+            '--end', type=datetime.fromisoformat, default=None,
+            help='Дата последней публикации (ISO), по умолчанию — '
+                 'сегодняшняя полночь UTC.',
+        )
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['posts'] < 1:
+            raise CommandError('Нужно хотя бы 2 пользователя и 1 пост')
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.batch_size = options['batch_size']
+        end = options['end'] or datetime.combine(timezone.now(), time())
+        if timezone.is_naive(end):
+            end = timezone.make_aware(end, timezone.utc)
+        self.end = end
+        self.span = timedelta(days=options['days']).total_seconds()
+
+        with manual_dates():
+            users = self.create_users(options['users'])
+            groups = self.create_groups(options['groups'])
+            # Популярность — ранг пользователя в перемешанном списке.
+            # Активность авторов ранжируется отдельно: иначе самые
+            # читаемые писали бы больше всех и раскладка лент росла
+            # квадратично, а так она около follows * posts / users.
+            popularity = zipf_cum_weights(len(users), 1.1)
+            posts, post_times = self.create_posts(
+                options['posts'], users, groups, popularity
+            )
+            self.create_comments(
+                options['comments'], users, posts, post_times
+            )
+        self.create_follows(options['follows'], users, popularity)
+
+        self.stdout.write('Пересчёт счётчиков, лент и поиска…')
+        counters.recount_all()
+        entries = timeline.rebuild()
+        indexed = search.rebuild()
+        feed_cache.bump(feed_cache.INDEX)
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: лент {entries} записей, в поиске {indexed} постов'
+        ))
+
+    def insert(self, model, objects, count):
+        """Вставляет объекты пачками, возвращает их id по порядку.
+
+        SQLite не возвращает id из bulk_create; внутри одной транзакции
+        они идут подряд, это проверяется по итогам вставки.
+        """
+        with transaction.atomic():
+            start = model.objects.aggregate(last=Max('pk'))['last'] or 0
+            for batch in batched(objects, self.batch_size):
+                model.objects.bulk_create(batch)
+            added = model.objects.filter(pk__gt=start).aggregate(
+                first=Min('pk'), last=Max('pk'), total=Count('pk')
+            )
+        if added['total'] != count or (
+                count and added['last'] - added['first'] + 1 != count):
+            raise CommandError(
+                f'{model.__name__}: id вставленных строк идут не подряд'
+            )
+        self.stdout.write(f'{model.__name__}: {count}')
+        if not count:
+            return range(0)
+        return range(added['first'], added['last'] + 1)
+
+    def create_users(self, count):
+        names = [self.fake.first_name() for _ in range(500)]
+        surnames = [self.fake.last_name() for _ in range(500)]
+        rng = self.rng
+        users = (
+            User(
+                username=f'{self.fake.user_name()}{i}',
+                first_name=rng.choice(names),
+                last_name=rng.choice(surnames),
+                password=UNUSABLE_PASSWORD,
+            )
+            for i in range(count)
+        )
+        ids = list(self.insert(User, users, count))
+        rng.shuffle(ids)
+        return ids
+
+    def create_groups(self, count):
+        groups = (
+            Group(
+                title=self.fake.catch_phrase()[:200],
+                slug=f'group-{i}',
+                description=self.fake.paragraph(),
+            )
+            for i in range(count)
+        )
+        return list(self.insert(Group, groups, count))
+
+    def post_times(self, count):
+        """Секунды от начала периода: фон плюс короткие всплески."""
+        rng = self.rng
+        bursts = [
+            (rng.uniform(0, self.span), rng.expovariate(1 / 7200))
+            for _ in range(max(1, int(self.span // 43200)))
+        ]
+        times = []
+        for _ in range(count):
+            if rng.random() < 0.4:
+                moment = rng.uniform(0, self.span)
+            else:
+                center, width = rng.choice(bursts)
+                moment = center + rng.gauss(0, width)
+            times.append(min(max(moment, 0), self.span))
+        times.sort()
+        return times
+
+    def moment(self, seconds):
+        return self.end - timedelta(seconds=self.span - seconds)
+
+    def create_posts(self, count, users, groups, popularity):
+        rng = self.rng
+        sentences = [self.fake.sentence() for _ in range(5000)]
+        group_weights = zipf_cum_weights(len(groups), 1.5) if groups else []
+        times = self.post_times(count)
+        posters = users[:]
+        rng.shuffle(posters)
+        authors = [posters[pick(rng, popularity)] for _ in range(count)]
+
+        def posts():
+            for seconds, author in zip(times, authors):
+                group = None
+                if group_weights and rng.random() < 0.6:
+                    group = groups[pick(rng, group_weights)]
+                date = self.moment(seconds)
+                yield Post(
+                    text=' '.join(rng.choices(sentences,
+                                              k=rng.randint(1, 6))),
+                    author_id=author,
+                    group_id=group,
+                    pub_date=date,
+                    updated=date,
+                )
+
+        ids = self.insert(Post, posts(), count)
+        # Комментарии чаще под постами популярных авторов.
+        weights = dict(zip(users, (
+            b - a for a, b in zip([0.0] + popularity, popularity)
+        )))
+        post_weights = list(itertools.accumulate(
+            weights[author] for author in authors
+        ))
+        return (ids, post_weights), times
+
+    def create_comments(self, count, users, posts, post_times):
+        rng = self.rng
+        ids, post_weights = posts
+        sentences = [self.fake.sentence() for _ in range(2000)]
+
+        def comments():
+            for _ in range(count):
+                index = pick(rng, post_weights)
+                seconds = min(
+                    post_times[index] + rng.expovariate(1 / 21600), self.span
+                )
+                yield Comment(
+                    post_id=ids[index],
+                    author_id=rng.choice(users),
+                    text=rng.choice(sentences),
+                    created=self.moment(seconds),
+                )
+
+        self.insert(Comment, comments(), count)
+
+    def create_follows(self, count, users, popularity):
+        """Подписки на авторов по степенному закону, без повторов."""
+        rng = self.rng
+        limit = len(users) * (len(users) - 1)
+        count = min(count, limit)
+        seen = set()
+        follows = []
+        while len(follows) < count:
+            user = rng.choice(users)
+            author = users[pick(rng, popularity)]
+            if user == author or (user, author) in seen:
+                continue
+            seen.add((user, author))
+            follows.append(Follow(user_id=user, author_id=author))
+        self.insert(Follow, follows, count)
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.db import migrations
+
+TABLE = 'posts_post_search'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Post = apps.get_model('posts', 'Post')
+    Group = apps.get_model('posts', 'Group')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    schema_editor.execute(
+        f'CREATE VIRTUAL TABLE {TABLE} USING fts5('
+        'text, group_title, author, '
+        "tokenize = 'unicode61 remove_diacritics 2', "
+        "prefix = '2 3')"
+    )
+    schema_editor.execute(
+        f'INSERT INTO {TABLE} (rowid, text, group_title, author) '
+        "SELECT p.id, replace(replace(p.text, 'ё', 'е'), 'Ё', 'Е'), "
+        "replace(replace(coalesce(g.title, ''), 'ё', 'е'), 'Ё', 'Е'), "
+        "replace(replace(u.username || ' ' || u.first_name || ' ' "
+        "|| u.last_name, 'ё', 'е'), 'Ё', 'Е') "
+        f'FROM {Post._meta.db_table} p '
+        f'INNER JOIN {User._meta.db_table} u ON u.id = p.author_id '
+        f'LEFT OUTER JOIN {Group._meta.db_table} g ON g.id = p.group_id'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0005_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
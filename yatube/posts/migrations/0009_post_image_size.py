@@ -0,0 +1,46 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:58
+
+from django.db import migrations, models
+from PIL import Image
+
+
+def read_size(field_file):
+    # Копия posts.images.read_size: историческая миграция не должна
+    # меняться вместе с кодом приложения.
+    try:
+        with field_file.open('rb') as file, Image.open(file) as image:
+            return image.size
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+
+def fill_image_size(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    posts = Post.objects.exclude(image='').only('image').iterator()
+    for post in posts:
+        size = read_size(post.image)
+        if size is not None:
+            Post.objects.filter(pk=post.pk).update(
+                image_width=size[0], image_height=size[1]
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Высота картинки в пикселях', null=True, verbose_name='Высота картинки'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, help_text='Ширина картинки в пикселях', null=True, verbose_name='Ширина картинки'),
+        ),
+        migrations.RunPython(fill_image_size, migrations.RunPython.noop),
+    ]
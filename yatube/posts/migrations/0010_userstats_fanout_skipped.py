@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_celebrities(apps, schema_editor):
+    # Нынешним «знаменитостям» раскладку уже пропускали.
+    UserStats = apps.get_model('posts', 'UserStats')
+    UserStats.objects.filter(
+        followers_count__gte=settings.TIMELINE_FANOUT_LIMIT
+    ).update(fanout_skipped=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_image_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userstats',
+            name='fanout_skipped',
+            field=models.BooleanField(default=False, help_text='Посты автора читаются в ленту подписок напрямую, пока rebuild_timeline не разложит их', verbose_name='Посты не раскладывались'),
+        ),
+        migrations.RunPython(mark_celebrities, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth import get_user_model
 
 from core.models import CreatedModel, PubDateModel
@@ -6,6 +6,27 @@ from core.models import CreatedModel, PubDateModel
 User = get_user_model()
 
 
+class AtomicSaveModel(models.Model):
+    """Абстрактная модель. Сохраняет строку вместе с post_save.
+
+    Обработчики сигналов (posts.signals) сдвигают счётчики и ленты: без
+    общей транзакции строка из shell или скрипта записалась бы, а
+    счётчик — нет. Удаление Django и так выполняет в одной транзакции
+    с post_delete. Внутри уже открытой транзакции точка сохранения не
+    нужна: ошибка откатит её целиком.
+    """
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(
         max_length=200,
@@ -22,12 +43,63 @@ class Group(models.Model):
         verbose_name='URL',
         help_text='URL',
     )
+    post_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число постов',
+        help_text='Поддерживается сигналами, пересчёт: recount_counters',
+    )
 
     def __str__(self):
         return self.title
 
 
-class Follow(models.Model):
+class UserStats(models.Model):
+    """Счётчики пользователя, чтобы страницы не считали COUNT(*)."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+        help_text='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число постов',
+        help_text='Число постов пользователя',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписчиков',
+        help_text='Число подписчиков пользователя',
+    )
+    following_count = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Число подписок',
+        help_text='На скольких авторов подписан пользователь',
+    )
+    fanout_skipped = models.BooleanField(
+        default=False,
+        verbose_name='Посты не раскладывались',
+        help_text='Посты автора читаются в ленту подписок напрямую, '
+                  'пока rebuild_timeline не разложит их',
+    )
+
+    class Meta:
+        # Лента подписок ищет «знаменитостей» (posts.timeline) по порогу
+        # числа подписчиков.
+        indexes = (
+            models.Index(fields=('followers_count',),
+                         name='userstats_followers_idx'),
+        )
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class Follow(AtomicSaveModel):
 
     user = models.ForeignKey(
         User,
@@ -57,7 +129,34 @@ class Follow(models.Model):
         )
 
 
-class Post(PubDateModel):
+class PostQuerySet(models.QuerySet):
+    """Выборки постов для лент и страниц поста.
+
+    Все методы подтягивают автора и группу одним JOIN: карточка поста
+    обращается к обоим, и без select_related каждая карточка стоила бы
+    двух дополнительных запросов.
+    """
+
+    def with_relations(self):
+        return self.select_related('author', 'group')
+
+    def detail(self):
+        return self.select_related('author__stats', 'group')
+
+    def feed(self):
+        return self.with_relations()
+
+    def by_group(self, group):
+        return self.feed().filter(group=group)
+
+    def by_author(self, author):
+        return self.feed().filter(author=author)
+
+    def followed_by(self, user):
+        return self.feed().filter(author__following__user=user)
+
+
+class Post(AtomicSaveModel, PubDateModel):
     text = models.TextField(verbose_name='Текст поста',
                             help_text='Текст нового поста')
     author = models.ForeignKey(
@@ -82,15 +181,55 @@ class Post(PubDateModel):
         upload_to='posts/',
         blank=True
     )
+    # Размеры заполняет форма при загрузке (posts.images), чтобы шаблонам
+    # не открывать файл. Не width_field: тот читает файл при каждой
+    # загрузке поста, у которого размеры ещё не известны.
+    image_width = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Ширина картинки',
+        help_text='Ширина картинки в пикселях',
+    )
+    image_height = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Высота картинки',
+        help_text='Высота картинки в пикселях',
+    )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+        help_text='Поддерживается сигналами, пересчёт: recount_counters',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата изменения',
+        help_text='Дата последнего изменения поста',
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
+        # Ленты листаются по ключу (-pub_date, -id): общая, автора и
+        # группы читают нужный диапазон индекса без сортировки.
+        indexes = (
+            models.Index(fields=('-pub_date', '-id'),
+                         name='post_pub_date_idx'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_pub_date_idx'),
+        )
 
     def __str__(self):
         return self.text[:15]
 
 
-class Comment(CreatedModel):
+class Comment(AtomicSaveModel, CreatedModel):
 
     post = models.ForeignKey(
         Post,
@@ -112,5 +251,47 @@ class Comment(CreatedModel):
     text = models.TextField(verbose_name='Текст комментария',
                             help_text='Текст комментария')
 
+    class Meta:
+        indexes = (
+            models.Index(fields=('post', 'created', 'id'),
+                         name='comment_post_created_idx'),
+        )
+
     def __str__(self):
         return self.text[:15]
+
+
+class Timeline(models.Model):
+    """Лента подписок пользователя, заполняемая при записи (fan-out)."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель',
+        help_text='Пользователь, в ленту которого попал пост',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Пост',
+        help_text='Пост из ленты подписок',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата создания поста',
+        help_text='Копия даты создания поста для сортировки ленты',
+    )
+
+    class Meta:
+        constraints = (
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_timeline_post'),
+        )
+        indexes = (
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='timeline_user_pub_date_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.user_id}: {self.post_id}'
@@ -0,0 +1,93 @@
+"""Кэш групп по slug и пользователей по username.
+
+Эти строки почти не меняются, а ищутся на каждом запросе к ленте группы
+и профилю. Отсутствие тоже кэшируется (на OBJECT_CACHE_MISS_TIMEOUT):
+перебор несуществующих адресов не доходит до базы. Сбрасывают записи
+сигналы сохранения и удаления (posts.signals).
+
+Группа хранится вместе со счётчиком постов, который показывает её
+страница, поэтому запись сбрасывает и сдвиг счётчика. У пользователя
+кэшируются только имена: пароль и прочие поля в кэш не попадают, при
+обращении они догружаются из базы.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+
+from posts.models import Group
+
+User = get_user_model()
+
+GROUP_FIELDS = ('id', 'title', 'slug', 'description', 'post_count')
+USER_FIELDS = ('id', 'username', 'first_name', 'last_name')
+
+_MISSING = object()
+
+
+def _key(kind, value):
+    # Адрес может прийти любым: хэш делает из него допустимый ключ.
+    return f'object:{kind}:{hashlib.md5(value.encode()).hexdigest()}'
+
+
+def _lookup(key, load):
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = load()
+        timeout = (settings.OBJECT_CACHE_TIMEOUT if value is not None
+                   else settings.OBJECT_CACHE_MISS_TIMEOUT)
+        cache.set(key, value, timeout)
+    return value
+
+
+def get_group(slug):
+    """Группа по slug или None."""
+    return _lookup(
+        _key('group', slug),
+        lambda: Group.objects.only(*GROUP_FIELDS).filter(slug=slug).first(),
+    )
+
+
+def get_user(username):
+    """Пользователь по username или None."""
+    return _lookup(
+        _key('user', username),
+        lambda: User.objects.only(*USER_FIELDS).filter(
+            username=username
+        ).first(),
+    )
+
+
+def get_group_or_404(slug):
+    group = get_group(slug)
+    if group is None:
+        raise Http404('Группа не найдена.')
+    return group
+
+
+def get_user_or_404(username):
+    user = get_user(username)
+    if user is None:
+        raise Http404('Пользователь не найден.')
+    return user
+
+
+def _forget(keys):
+    """Сбрасывает записи сразу и ещё раз после коммита.
+
+    Как и с поколениями лент (posts.feed_cache): читатель, успевший
+    между ними закэшировать старую строку, не оставит её жить.
+    """
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def forget_group(*slugs):
+    _forget([_key('group', slug) for slug in slugs if slug])
+
+
+def forget_user(*usernames):
+    _forget([_key('user', username) for username in usernames if username])
@@ -0,0 +1,184 @@
+import re
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+# Виртуальная таблица FTS5, rowid совпадает с id поста. Создаётся
+# миграцией 0006_post_search только на SQLite.
+TABLE = 'posts_post_search'
+
+# Веса столбцов для bm25(): совпадение в названии группы или имени автора
+# значит больше, чем слово где-то в длинном тексте.
+WEIGHTS = (1.0, 2.0, 2.0)
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile(r'[а-я]+')
+
+# Частые окончания русских слов. Поиск идёт по префиксу, поэтому
+# отрезанного окончания хватает вместо полноценного стеммера:
+# «котами» ищется как кот* и находит «кот», «кота», «котов».
+ENDINGS = sorted((
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ах', 'ях',
+    'ам', 'ям', 'ов', 'ев', 'ей', 'ой', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ом', 'ем', 'ую', 'юю', 'а', 'я', 'о', 'е', 'ы', 'и', 'у',
+    'ю', 'ь',
+), key=len, reverse=True)
+MIN_STEM = 3
+
+
+def enabled():
+    """Индекс есть только на SQLite, на других базах поиск идёт LIKE."""
+    return connection.vendor == 'sqlite'
+
+
+def normalize(text):
+    # unicode61 приводит кириллицу к нижнему регистру, но «ё» и «е»
+    # считает разными буквами; их склеиваем сами и в индексе, и в запросе.
+    return text.lower().replace('ё', 'е')
+
+
+def stem(word):
+    if not CYRILLIC_RE.fullmatch(word):
+        return word
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM:
+            return word[:-len(ending)]
+    return word
+
+
+def build_query(text):
+    """Строка запроса FTS5: все слова обязательны, каждое — префикс.
+
+    Слова берутся в кавычки, поэтому операторы FTS5 из пользовательского
+    ввода (NOT, NEAR, двоеточия) не ломают запрос.
+    """
+    return ' '.join(
+        f'"{stem(word)}"*' for word in WORD_RE.findall(normalize(text))
+    )
+
+
+def _indexed(column):
+    return f"replace(replace({column}, 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _reindex(where, params):
+    """Переписывает строки индекса для постов, отобранных условием where."""
+    if not enabled():
+        return
+    sql = (
+        f'INSERT OR REPLACE INTO {TABLE} '
+        '(rowid, text, group_title, author) '
+        f'SELECT p.id, {_indexed("p.text")}, '
+        f'{_indexed("coalesce(g.title, %s)")}, '
+        f'{_indexed("u.username || %s || u.first_name || %s || u.last_name")}'
+        f' FROM {Post._meta.db_table} p '
+        f'INNER JOIN {User._meta.db_table} u ON u.id = p.author_id '
+        f'LEFT OUTER JOIN {Group._meta.db_table} g ON g.id = p.group_id '
+        f'WHERE {where}'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, ['', ' ', ' ', *params])
+
+
+def index_post(post_id):
+    _reindex('p.id = %s', [post_id])
+
+
+def index_group(group_id):
+    _reindex('p.group_id = %s', [group_id])
+
+
+def index_author(user_id):
+    _reindex('p.author_id = %s', [user_id])
+
+
+def remove_post(post_id):
+    if enabled():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [post_id])
+
+
+def rebuild():
+    """Строит индекс заново по всем постам, возвращает число записей."""
+    if not enabled():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE}')
+    _reindex('1 = 1', [])
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT count(*) FROM {TABLE}')
+        return cursor.fetchone()[0]
+
+
+def match(query):
+    """Подзапрос id постов, подходящих под запрос, для pk__in=."""
+    return RawSQL(
+        f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s',
+        [build_query(query)],
+    )
+
+
+class SearchResults:
+    """Посты по запросу в порядке релевантности (bm25).
+
+    Ведёт себя как последовательность для Paginator: count() и срезы,
+    каждый срез — один запрос к индексу и один за самими постами.
+    """
+
+    def __init__(self, query):
+        self.query = build_query(query)
+
+    def count(self):
+        if not self.query:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s',
+                [self.query],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if not self.query or index.stop is not None and index.stop <= start:
+            return []
+        limit = -1 if index.stop is None else index.stop - start
+        weights = ', '.join(str(weight) for weight in WEIGHTS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s '
+                f'ORDER BY bm25({TABLE}, {weights}), rowid DESC '
+                'LIMIT %s OFFSET %s',
+                [self.query, limit, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        posts = Post.objects.with_relations().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+
+def search_posts(query):
+    """Результаты поиска: индекс FTS5 или, без него, LIKE по ленте."""
+    if enabled():
+        return SearchResults(query)
+    words = query.split()
+    if not words:
+        return Post.objects.none()
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(text__icontains=word)
+            | Q(group__title__icontains=word)
+            | Q(author__username__icontains=word)
+        )
+    return Post.objects.feed().filter(condition)
@@ -0,0 +1,248 @@
+import threading
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from posts import (
+    counters, feed_cache, object_cache, search, thumbnails, timeline,
+)
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw=False, **kwargs):
+    """У нового пользователя сразу появляются нулевые счётчики."""
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+NAME_FIELDS = ('username', 'first_name', 'last_name')
+
+
+@receiver(pre_save, sender=User)
+def remember_names(sender, instance, raw=False, update_fields=None,
+                   **kwargs):
+    """Запоминает прежние имена: изменились ли они, видно после записи.
+
+    Вход на сайт сохраняет только last_login — такие сохранения не
+    требуют даже запроса.
+    """
+    instance._previous_names = None
+    if update_fields is not None and not set(NAME_FIELDS) & set(update_fields):
+        return
+    if instance.pk and not instance._state.adding and not raw:
+        instance._previous_names = (
+            User.objects.filter(pk=instance.pk).values(*NAME_FIELDS).first()
+        )
+
+
+def _renamed(instance):
+    previous = getattr(instance, '_previous_names', None)
+    return previous is not None and any(
+        previous[field] != getattr(instance, field) for field in NAME_FIELDS
+    )
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance, created, raw=False, **kwargs):
+    """Имя автора есть в карточках и поисковом индексе его постов.
+
+    Карточки лежат в лентах главной, профиля и всех групп, где он писал.
+
+    Сдвиг Post.updated меняет ключи карточек и ETag страниц постов,
+    поэтому он делается, только если имя действительно изменилось:
+    прочие сохранения пользователя ленты не сбрасывают.
+    """
+    if created or raw or not _renamed(instance):
+        return
+    Post.objects.filter(author=instance).update(updated=timezone.now())
+    search.index_author(instance.pk)
+    groups = (
+        Post.objects.filter(author=instance).order_by()
+        .values_list('group_id', flat=True).distinct()
+    )
+    feed_cache.bump(
+        feed_cache.INDEX, feed_cache.profile_feed(instance.pk),
+        *map(feed_cache.group_feed, groups),
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    """Новый пользователь сбрасывает закэшированное отсутствие username."""
+    if created or raw or _renamed(instance):
+        previous = instance._previous_names or {}
+        object_cache.forget_user(instance.username, previous.get('username'))
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    object_cache.forget_user(instance.username)
+
+
+@receiver(pre_save, sender=Group)
+def remember_slug(sender, instance, raw=False, **kwargs):
+    instance._previous_slug = None
+    if instance.pk and not instance._state.adding and not raw:
+        instance._previous_slug = (
+            Group.objects.filter(pk=instance.pk)
+            .values_list('slug', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Новая группа сбрасывает закэшированное отсутствие своего slug."""
+    object_cache.forget_group(
+        instance.slug, getattr(instance, '_previous_slug', None)
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    """Название группы входит в поисковый индекс её постов."""
+    if not created and not raw:
+        search.index_group(instance.pk)
+
+
+@receiver(pre_save, sender=Post)
+def remember_previous(sender, instance, raw=False, **kwargs):
+    """Запоминает прежние группу и картинку редактируемого поста."""
+    instance._previous_group_id = None
+    instance._previous_group_slug = None
+    instance._previous_image = ''
+    if instance.pk and not instance._state.adding and not raw:
+        (instance._previous_group_id, instance._previous_group_slug,
+         instance._previous_image) = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'group__slug', 'image').first()
+            or (None, None, '')
+        )
+
+
+def _group_slug(post):
+    """slug группы поста: группу обычно уже загрузила форма или выборка."""
+    if post.group_id is None:
+        return None
+    if Post.group.is_cached(post):
+        return post.group.slug
+    return (
+        Group.objects.filter(pk=post.group_id)
+        .values_list('slug', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    """Новый пост попадает в ленты подписчиков и в счётчики.
+
+    Закэшированная группа хранит post_count (posts.object_cache), её
+    запись сбрасывается вместе со сдвигом счётчика.
+    """
+    if raw:
+        return
+    if created:
+        counters.bump_user(instance.author_id, posts_count=1)
+        counters.bump_group(instance.group_id, 1)
+        object_cache.forget_group(_group_slug(instance))
+        timeline.fan_out_post(instance)
+    elif instance._previous_group_id != instance.group_id:
+        counters.bump_group(instance._previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+        object_cache.forget_group(_group_slug(instance),
+                                  instance._previous_group_slug)
+    search.index_post(instance.pk)
+    feed_cache.bump(
+        *feed_cache.post_feeds(instance.author_id, instance.group_id),
+        feed_cache.group_feed(instance._previous_group_id),
+    )
+    previous_image = instance._previous_image
+    if previous_image and previous_image != instance.image.name:
+        transaction.on_commit(partial(thumbnails.discard, previous_image))
+
+
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = set()
+    return _deleting.posts
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    """Отмечает удаляемый пост: его комментарии уходят каскадом.
+
+    Их post_delete приходит раньше post_delete поста, и сдвигать счётчик
+    и ленты по каждому комментарию незачем — пост исчезает целиком.
+    """
+    _deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    _deleting_posts().discard(instance.pk)
+    counters.bump_user(instance.author_id, posts_count=-1)
+    counters.bump_group(instance.group_id, -1)
+    object_cache.forget_group(_group_slug(instance))
+    search.remove_post(instance.pk)
+    feed_cache.bump(
+        *feed_cache.post_feeds(instance.author_id, instance.group_id)
+    )
+    if instance.image:
+        transaction.on_commit(partial(thumbnails.discard, instance.image.name))
+
+
+def _bump_comment_feeds(comment):
+    """Карточки показывают число комментариев — сбрасываем их ленты."""
+    if Comment.post.is_cached(comment):
+        post = (comment.post.author_id, comment.post.group_id)
+    else:
+        post = (
+            Post.objects.filter(pk=comment.post_id)
+            .values_list('author_id', 'group_id').first()
+        )
+    if post is not None:
+        feed_cache.bump(*feed_cache.post_feeds(*post))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1)
+        _bump_comment_feeds(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.post_id in _deleting_posts():
+        return
+    counters.bump_post(instance.post_id, -1)
+    _bump_comment_feeds(instance)
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw=False, **kwargs):
+    """Подписка добавляет посты автора в ленту и меняет счётчики."""
+    if created and not raw:
+        counters.bump_user(instance.user_id, following_count=1)
+        counters.bump_user(instance.author_id, followers_count=1)
+        timeline.add_author(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    """Отписка убирает посты автора из ленты и меняет счётчики."""
+    counters.bump_user(instance.user_id, following_count=-1)
+    counters.bump_user(instance.author_id, followers_count=-1)
+    timeline.remove_author(instance.user_id, instance.author_id)
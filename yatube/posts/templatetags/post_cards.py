@@ -0,0 +1,43 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+
+register = template.Library()
+
+CARD_TEMPLATE = 'posts/includes/post_list.html'
+
+
+def card_key(post):
+    """Ключ карточки: меняется при правке поста и новом комментарии."""
+    return (
+        f'post-card:{post.pk}:{post.updated.timestamp()}:'
+        f'{post.comment_count}'
+    )
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Пары (пост, HTML карточки) для страницы ленты.
+
+    Готовые карточки страницы берутся из кэша одним get_many, шаблон
+    рендерится только для промахов; миниатюры их картинок подгружаются
+    одной выборкой.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    stale = [(key, post) for key, post in zip(keys, posts)
+             if key not in cards]
+    with thumbnails.prefetched(post for _, post in stale):
+        missing = {
+            key: render_to_string(CARD_TEMPLATE, {'post': post})
+            for key, post in stale
+        }
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(missing)
+    return [(post, mark_safe(cards[key])) for key, post in zip(keys, posts)]
@@ -0,0 +1,49 @@
+import logging
+
+from django import template
+from django.utils.html import format_html
+
+from posts import thumbnails
+
+logger = logging.getLogger(__name__)
+
+register = template.Library()
+
+# Ширина src для браузеров, которые не понимают srcset.
+FALLBACK_WIDTH = 960
+
+
+@register.simple_tag
+def post_image(post, sizes='(max-width: 960px) 100vw, 960px', lazy=True):
+    """<img> картинки поста с srcset из THUMBNAIL_PRESETS.
+
+    Браузер сам выбирает размер под экран, а width и height миниатюры
+    резервируют место до загрузки, и страница не прыгает. Картинки
+    ниже первого экрана с lazy=True грузятся только при прокрутке.
+    """
+    if not post.image:
+        return ''
+    try:
+        with thumbnails.prefetched([post]):
+            images = thumbnails.responsive(post.image, post.image_width)
+        fitting = [
+            image for image in images if image.width <= FALLBACK_WIDTH
+        ]
+        src = fitting[-1] if fitting else images[0]
+        srcset = ', '.join(f'{image.url} {image.width}w' for image in images)
+    except Exception:
+        # Как и {% thumbnail %} sorl: битая или пропавшая картинка не
+        # роняет страницу.
+        logger.exception('Не удалось получить миниатюры для %s',
+                         post.image.name)
+        return ''
+    return format_html(
+        '<img class="card-img my-2 h-auto" src="{}" srcset="{}" sizes="{}" '
+        'width="{}" height="{}" loading="{}" decoding="async" alt="">',
+        src.url,
+        srcset,
+        sizes,
+        src.width,
+        src.height,
+        'lazy' if lazy else 'eager',
+    )
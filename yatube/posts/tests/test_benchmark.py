@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts.management.commands.benchmark import summarize
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class BenchmarkCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        post = Post.objects.create(text='Пост', author=cls.author,
+                                   group=cls.group)
+        Comment.objects.create(post=post, author=cls.reader, text='Ответ')
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'benchmark.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def benchmark(self, **options):
+        call_command('benchmark', iterations=3, warmup=1,
+                     output=self.output, stdout=StringIO(), **options)
+        with open(self.output) as output:
+            return json.load(output)
+
+    def test_reports_every_view(self):
+        """Для каждого представления есть перцентили, запросы и память."""
+        report = self.benchmark()
+        self.assertEqual(set(report['views']), {
+            'index', 'group_posts', 'profile', 'post_detail',
+            'follow_index', 'post_create', 'add_comment',
+        })
+        for name, result in report['views'].items():
+            with self.subTest(view=name):
+                self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+                self.assertGreater(result['peak_kb'], 0)
+        self.assertGreater(report['views']['post_create']['queries'], 0)
+
+    def test_writes_are_cleaned_up(self):
+        """Созданные замером посты и комментарии удаляются."""
+        self.benchmark(views=['post_create', 'add_comment'])
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    def test_compare_flags_regression(self):
+        """Сравнение с более быстрым прогоном завершается ошибкой."""
+        report = self.benchmark(views=['index'])
+        report['views']['index']['p50_ms'] /= 100
+        baseline = os.path.join(self.directory, 'baseline.json')
+        with open(baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file)
+        with self.assertRaisesMessage(CommandError, 'index'):
+            self.benchmark(views=['index'], compare=baseline)
+
+    def test_summarize_interpolates(self):
+        """Перцентили интерполируются между замерами, один замер — сам."""
+        self.assertEqual(summarize([0.001, 0.002, 0.003, 0.004, 0.005]), {
+            'p50_ms': 3.0, 'p95_ms': 4.8, 'p99_ms': 4.96,
+            'mean_ms': 3.0, 'max_ms': 5.0,
+        })
+        self.assertEqual(summarize([0.002])['p99_ms'], 2.0)
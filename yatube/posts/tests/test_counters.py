@@ -0,0 +1,173 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа 1',
+            slug='test-group_1',
+            description='Тестовое описание',
+        )
+        cls.group_2 = Group.objects.create(
+            title='Тестовая группа 2',
+            slug='test-group_2',
+            description='Тестовое описание',
+        )
+
+    def _stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Создание, перенос и удаление поста меняют счётчики."""
+        post = Post.objects.create(text='Пост', author=CountersTest.user,
+                                   group=CountersTest.group)
+        self.assertEqual(self._stats(CountersTest.user).posts_count, 1)
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group.pk).post_count, 1
+        )
+
+        post.group = CountersTest.group_2
+        post.save()
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group.pk).post_count, 0
+        )
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group_2.pk).post_count, 1
+        )
+
+        post.delete()
+        self.assertEqual(self._stats(CountersTest.user).posts_count, 0)
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group_2.pk).post_count, 0
+        )
+
+    def test_drifted_counters_stop_at_zero(self):
+        """Удаление поста, созданного в обход сигналов, не падает."""
+        Post.objects.bulk_create([
+            Post(text='Импорт', author=CountersTest.user,
+                 group=CountersTest.group),
+        ])
+        post = Post.objects.get(text='Импорт')
+        Comment.objects.bulk_create([
+            Comment(post=post, author=CountersTest.reader, text='Ок'),
+        ])
+        Comment.objects.get(post=post).delete()
+        post.delete()
+        self.assertEqual(self._stats(CountersTest.user).posts_count, 0)
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group.pk).post_count, 0
+        )
+
+    def test_cascade_skips_comment_work(self):
+        """Удаление поста не тратит запросов на каждый его комментарий."""
+        queries = []
+        for count in (1, 20):
+            post = Post.objects.create(text='Пост', author=CountersTest.user)
+            for _ in range(count):
+                Comment.objects.create(post=post, author=CountersTest.reader,
+                                       text='Ок')
+            post = Post.objects.get(pk=post.pk)
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            queries.append(len(context))
+        self.assertEqual(queries[0], queries[1])
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(self._stats(CountersTest.user).posts_count, 0)
+
+    def test_comment_counter(self):
+        """Комментарии считаются в посте."""
+        post = Post.objects.create(text='Пост', author=CountersTest.user)
+        comment = Comment.objects.create(post=post, author=CountersTest.user,
+                                         text='Комментарий')
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+        comment.delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 0)
+
+    def test_follow_counters(self):
+        """Подписка меняет счётчики подписчиков и подписок."""
+        follow = Follow.objects.create(user=CountersTest.reader,
+                                       author=CountersTest.user)
+        self.assertEqual(self._stats(CountersTest.user).followers_count, 1)
+        self.assertEqual(self._stats(CountersTest.reader).following_count, 1)
+        follow.delete()
+        self.assertEqual(self._stats(CountersTest.user).followers_count, 0)
+        self.assertEqual(self._stats(CountersTest.reader).following_count, 0)
+
+    def test_recount_command(self):
+        """Команда восстанавливает испорченные и потерянные счётчики."""
+        post = Post.objects.create(text='Пост', author=CountersTest.user,
+                                   group=CountersTest.group)
+        Comment.objects.create(post=post, author=CountersTest.reader,
+                               text='Комментарий')
+        Follow.objects.create(user=CountersTest.reader,
+                              author=CountersTest.user)
+        UserStats.objects.filter(user=CountersTest.user).delete()
+        UserStats.objects.update(following_count=42)
+        Group.objects.update(post_count=42)
+        Post.objects.update(comment_count=42)
+
+        call_command('recount_counters', stdout=StringIO())
+
+        stats = self._stats(CountersTest.user)
+        self.assertEqual((stats.posts_count, stats.followers_count), (1, 1))
+        self.assertEqual(self._stats(CountersTest.reader).following_count, 1)
+        self.assertEqual(
+            Group.objects.get(pk=CountersTest.group.pk).post_count, 1
+        )
+        self.assertEqual(Post.objects.get(pk=post.pk).comment_count, 1)
+
+    def test_pages_read_counters(self):
+        """Профиль и пост не считают посты автора запросом COUNT."""
+        post = Post.objects.create(text='Пост', author=CountersTest.user)
+        urls = [
+            reverse('posts:profile',
+                    kwargs={'username': CountersTest.user}),
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = Client().get(url)
+                self.assertEqual(response.context['post_quantity'], 1)
+                self.assertFalse(
+                    [q for q in queries if 'COUNT(' in q['sql'].upper()]
+                )
+
+
+class CountersTransactionTest(TransactionTestCase):
+    """Строка и её счётчики записываются одной транзакцией."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='HasNoName')
+        self.post = Post.objects.create(text='Пост', author=self.user)
+
+    def test_failed_counter_rolls_back_write(self):
+        """Если счётчик не сдвинулся, строка тоже не записана."""
+        with mock.patch('posts.counters._bump',
+                        side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                Comment.objects.create(post=self.post, author=self.user,
+                                       text='Ок')
+            with self.assertRaises(RuntimeError):
+                Post.objects.create(text='Второй', author=self.user)
+            with self.assertRaises(RuntimeError):
+                Follow.objects.create(user=self.user, author=self.user)
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(Follow.objects.exists())
@@ -1,4 +1,5 @@
 from http import HTTPStatus
+import io
 import shutil
 import tempfile
 
@@ -8,12 +9,18 @@ from django.urls import reverse
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 
+from PIL import Image
+
 from posts.models import Post, Group, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 User = get_user_model()
 
+# Теги EXIF: ориентация и производитель камеры.
+ORIENTATION = 0x0112
+MAKE = 0x010F
+
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostCreateFormTests(TestCase):
@@ -240,3 +247,119 @@ class CommentFormTests(TestCase):
                 author=CommentFormTests.user,
             ).exists()
         )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ImageIngestTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def upload(self, image, name, **params):
+        output = io.BytesIO()
+        image.save(output, **params)
+        return SimpleUploadedFile(name, output.getvalue())
+
+    def create(self, uploaded):
+        return ImageIngestTests.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+
+    def test_photo_downscaled_rotated_and_stripped(self):
+        """Фото уменьшается, поворачивается по EXIF и теряет метаданные."""
+        exif = Image.Exif()
+        exif[ORIENTATION] = 6
+        exif[MAKE] = 'Телефон'
+        uploaded = self.upload(Image.new('RGB', (3000, 2000)), 'photo.jpeg',
+                               format='JPEG', exif=exif.tobytes())
+        self.create(uploaded)
+        post = Post.objects.get()
+        self.assertEqual(post.image.name, 'posts/photo.jpg')
+        self.assertEqual((post.image_width, post.image_height), (1280, 1920))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (1280, 1920))
+            self.assertFalse(stored.getexif())
+
+    def test_transparent_png_stays_png(self):
+        """Картинка с прозрачностью сохраняется в PNG."""
+        uploaded = self.upload(Image.new('RGBA', (50, 40)), 'logo.png',
+                               format='PNG')
+        self.create(uploaded)
+        post = Post.objects.get()
+        self.assertEqual(post.image.name, 'posts/logo.png')
+        self.assertEqual((post.image_width, post.image_height), (50, 40))
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_oversized_image_rejected(self):
+        """Картинка больше IMAGE_MAX_PIXELS отклоняется по заголовку."""
+        uploaded = self.upload(Image.new('RGB', (20, 20)), 'big.png',
+                               format='PNG')
+        response = self.create(uploaded)
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(response, 'form', 'image',
+                             'Картинка слишком большая: 20×20.')
+
+    def test_edit_without_new_image_keeps_size(self):
+        """Правка текста не сбрасывает размеры картинки."""
+        self.create(self.upload(Image.new('RGB', (30, 20)), 'pic.jpg',
+                                format='JPEG'))
+        post = Post.objects.get()
+        ImageIngestTests.authorized_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+            data={'text': 'Новый текст'},
+        )
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual((post.image_width, post.image_height), (30, 20))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostAdminFormTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        cls.author = User.objects.create_user(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.client.force_login(PostAdminFormTests.admin)
+
+    def test_admin_creates_post(self):
+        """Админка создаёт пост с автором и уменьшенной картинкой."""
+        exif = Image.Exif()
+        exif[MAKE] = 'Телефон'
+        output = io.BytesIO()
+        Image.new('RGB', (3000, 2000)).save(output, format='JPEG',
+                                            exif=exif.tobytes())
+        response = self.client.post(
+            reverse('admin:posts_post_add'),
+            data={
+                'text': 'Пост из админки',
+                'author': PostAdminFormTests.author.pk,
+                'image': SimpleUploadedFile('photo.jpeg', output.getvalue()),
+            },
+        )
+        self.assertRedirects(response,
+                             reverse('admin:posts_post_changelist'))
+        post = Post.objects.get()
+        self.assertEqual(post.author, PostAdminFormTests.author)
+        self.assertEqual((post.image_width, post.image_height), (1920, 1280))
+        with Image.open(post.image.path) as stored:
+            self.assertEqual(stored.size, (1920, 1280))
+            self.assertFalse(stored.getexif())
@@ -0,0 +1,69 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import LiveServerTestCase, SimpleTestCase, override_settings
+
+from posts.management.commands.loadtest import histogram, parse_mix
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class LoadHelpersTest(SimpleTestCase):
+    def test_parse_mix(self):
+        """Смесь сценариев разбирается, опечатки отвергаются."""
+        self.assertEqual(parse_mix('browse=3,upload=1'),
+                         {'browse': 3.0, 'upload': 1.0})
+        for mix in ('browse=3,feeds=1', 'browse=x', 'browse=0'):
+            with self.subTest(mix=mix):
+                with self.assertRaises(CommandError):
+                    parse_mix(mix)
+
+    def test_histogram(self):
+        """Замеры раскладываются по корзинам, долгие — в последнюю."""
+        buckets = histogram([0.001, 0.004, 0.02, 9])
+        self.assertEqual(buckets['<=5'], 2)
+        self.assertEqual(buckets['<=25'], 1)
+        self.assertEqual(buckets['>5000'], 1)
+        self.assertEqual(sum(buckets.values()), 4)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class LoadTestCommandTest(LiveServerTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=author)
+        group = Group.objects.create(title='Группа', slug='group')
+        Post.objects.create(text='Пост', author=author, group=group)
+        self.output = os.path.join(TEMP_MEDIA_ROOT, 'load.json')
+
+    def test_replays_mix_and_cleans_up(self):
+        """Прогон проходит все сценарии без ошибок и убирает за собой."""
+        call_command(
+            'loadtest', url=self.live_server_url, threads='1',
+            duration=1, output=self.output, stdout=StringIO(),
+        )
+        with open(self.output) as output:
+            step, = json.load(output)['steps']
+        self.assertEqual(step['threads'], 1)
+        self.assertGreater(step['requests'], 0)
+        self.assertEqual(step['errors'], 0)
+        self.assertIsNone(step['sqlite_lock_errors'])
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(Session.objects.exists())
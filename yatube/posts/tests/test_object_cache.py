@@ -0,0 +1,108 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import Http404
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import object_cache
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class ObjectCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-group',
+            description='Тестовое описание',
+        )
+        cls.user = User.objects.create_user(username='author')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_hit_skips_database(self):
+        """Повторный поиск группы и пользователя обходится без запросов."""
+        object_cache.get_group('test-group')
+        object_cache.get_user('author')
+        with self.assertNumQueries(0):
+            group = object_cache.get_group('test-group')
+            user = object_cache.get_user('author')
+        self.assertEqual(group, ObjectCacheTest.group)
+        self.assertEqual(user, ObjectCacheTest.user)
+
+    def test_password_not_cached(self):
+        """В кэш попадают только публичные поля пользователя."""
+        user = object_cache.get_user('author')
+        self.assertIn('password', user.get_deferred_fields())
+
+    def test_missing_is_cached(self):
+        """Несуществующий slug второй раз не доходит до базы."""
+        with self.assertRaises(Http404):
+            object_cache.get_group_or_404('missing')
+        with self.assertNumQueries(0), self.assertRaises(Http404):
+            object_cache.get_group_or_404('missing')
+
+    def test_create_drops_missing(self):
+        """Созданные группа и пользователь находятся сразу."""
+        self.assertIsNone(object_cache.get_group('new'))
+        self.assertIsNone(object_cache.get_user('newcomer'))
+        Group.objects.create(title='Новая', slug='new')
+        User.objects.create_user(username='newcomer')
+        self.assertIsNotNone(object_cache.get_group('new'))
+        self.assertIsNotNone(object_cache.get_user('newcomer'))
+
+    def test_rename_drops_both_keys(self):
+        """Переименование сбрасывает и старый, и новый адрес."""
+        object_cache.get_group('test-group')
+        object_cache.get_user('author')
+        self.assertIsNone(object_cache.get_user('writer'))
+        group = Group.objects.get(pk=ObjectCacheTest.group.pk)
+        group.slug = 'renamed'
+        group.title = 'Новое название'
+        group.save()
+        user = User.objects.get(pk=ObjectCacheTest.user.pk)
+        user.username = 'writer'
+        user.save()
+        self.assertIsNone(object_cache.get_group('test-group'))
+        self.assertEqual(object_cache.get_group('renamed').title,
+                         'Новое название')
+        self.assertIsNone(object_cache.get_user('author'))
+        self.assertEqual(object_cache.get_user('writer').pk, user.pk)
+
+    def test_delete_drops_entry(self):
+        """Удалённая группа отвечает 404."""
+        url = reverse('posts:group_list', args=['test-group'])
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+        Group.objects.filter(pk=ObjectCacheTest.group.pk).get().delete()
+        self.assertEqual(self.client.get(url).status_code,
+                         HTTPStatus.NOT_FOUND)
+
+    def test_post_count_cached_and_reset(self):
+        """Счётчик постов берётся из кэша и сбрасывается с новым постом."""
+        object_cache.get_group('test-group')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                object_cache.get_group('test-group').post_count, 0
+            )
+        post = Post.objects.create(text='Пост', author=ObjectCacheTest.user,
+                                   group=ObjectCacheTest.group)
+        self.assertEqual(object_cache.get_group('test-group').post_count, 1)
+        post.group = None
+        post.save()
+        self.assertEqual(object_cache.get_group('test-group').post_count, 0)
+        post.group = ObjectCacheTest.group
+        post.save()
+        object_cache.get_group('test-group')
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(object_cache.get_group('test-group').post_count, 0)
+
+    def test_login_keeps_entry(self):
+        """Вход на сайт не сбрасывает запись пользователя."""
+        object_cache.get_user('author')
+        self.client.force_login(ObjectCacheTest.user)
+        with self.assertNumQueries(0):
+            object_cache.get_user('author')
@@ -0,0 +1,114 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.http import urlencode
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Полный проход по таблице без индекса и сортировка во временном B-дереве.
+# Обход индекса («SCAN t USING INDEX») и виртуальные таблицы FTS5 —
+# допустимы: первый читает строки уже в нужном порядке.
+BAD_PLAN_RE = re.compile(
+    r'^SCAN (TABLE )?\w+( AS \w+)?$|USE TEMP B-TREE'
+)
+# Список групп в форме поста выбирается целиком намеренно.
+FULL_SCANS_ALLOWED = {'SCAN posts_group'}
+
+
+@skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN — SQLite')
+class QueryPlanTest(TestCase):
+    """Запросы представлений posts идут по индексам, без сортировок.
+
+    Каждая страница открывается на заполненной базе, все её SELECT
+    прогоняются через EXPLAIN QUERY PLAN.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.users = [
+            User.objects.create_user(username=f'user{i}') for i in range(5)
+        ]
+        cls.user = cls.users[0]
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        # Статистика ANALYZE на базе с одной группой толкает планировщик
+        # начинать с неё, как никогда не будет на настоящих данных.
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'group-{i}', description='')
+            for i in range(10)
+        )
+        for i in range(30):
+            post = Post.objects.create(
+                text=f'Текст поста №{i}',
+                author=cls.users[i % len(cls.users)],
+                group=cls.group if i % 2 else None,
+            )
+            Comment.objects.create(post=post, author=cls.user, text='Ок')
+            if post.author == cls.user:
+                cls.post = post
+        for author in cls.users[1:]:
+            Follow.objects.create(user=cls.user, author=author)
+            Follow.objects.create(user=author, author=cls.user)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(QueryPlanTest.user)
+
+    def explain(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assert_plans_use_indexes(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query['sql']
+            # Поиск упорядочен по релевантности: FTS5 находит совпадения по
+            # индексу, а сортирует их всегда, иначе bm25 не посчитать.
+            if not sql.startswith('SELECT') or ' MATCH ' in sql:
+                continue
+            for step in self.explain(sql):
+                if step in FULL_SCANS_ALLOWED:
+                    continue
+                with self.subTest(url=url, sql=sql, step=step):
+                    self.assertIsNone(BAD_PLAN_RE.search(step))
+
+    def test_view_query_plans(self):
+        """Ленты, пост, комментарии и поиск не сканируют таблицы."""
+        post_id = QueryPlanTest.post.pk
+        first = self.client.get(reverse('posts:index'))
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:index') + '?' + urlencode(
+                {'cursor': first.context['page_obj'].next_cursor}
+            ),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list',
+                    kwargs={'slug': QueryPlanTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': QueryPlanTest.users[1]}),
+            reverse('posts:post_detail', kwargs={'post_id': post_id}),
+            reverse('posts:comments', kwargs={'post_id': post_id}),
+            reverse('posts:post_edit', kwargs={'post_id': post_id}),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?' + urlencode({'q': 'текст'}),
+        ]
+        for url in urls:
+            self.assert_plans_use_indexes(url)
@@ -0,0 +1,136 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class SearchQueryTest(TestCase):
+    def test_build_query(self):
+        """Запрос: слова в нижнем регистре, без окончаний, префиксами."""
+        cases = {
+            'Котами': '"кот"*',
+            'ЁЖИК в тумане': '"ежик"* "в"* "туман"*',
+            'NEAR("a" b) OR': '"near"* "a"* "b"* "or"*',
+            'кот': '"кот"*',
+            '  ': '',
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(search.build_query(text), expected)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(
+            username='HasNoName', first_name='Фёдор'
+        )
+        cls.other = User.objects.create_user(username='Other')
+        cls.group = Group.objects.create(
+            title='Котики',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.hedgehog = Post.objects.create(
+            text='Ёжик в тумане искал лошадку', author=cls.other,
+        )
+        cls.cats = Post.objects.create(
+            text='Про котов и кошек', author=cls.other,
+        )
+        cls.in_group = Post.objects.create(
+            text='Просто запись', author=cls.user, group=cls.group,
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def found(self, query):
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': query}
+        )
+        return list(response.context['page_obj'])
+
+    def test_search_russian_text(self):
+        """Поиск не различает регистр, «ё» и «е», окончания слов."""
+        for query in ('ежик', 'ТУМАН', 'лошадки', 'котами'):
+            with self.subTest(query=query):
+                self.assertTrue(self.found(query))
+        self.assertEqual(self.found('ёжики туманом'), [self.hedgehog])
+
+    def test_search_group_and_author(self):
+        """Находятся посты по названию группы и имени автора."""
+        self.assertEqual(self.found('котик'), [self.in_group])
+        self.assertEqual(self.found('федор'), [self.in_group])
+        self.assertEqual(self.found('hasnoname'), [self.in_group])
+
+    def test_ranking(self):
+        """Совпадение в названии группы весомее, чем в тексте."""
+        found = self.found('кот')
+        self.assertEqual(found, [self.in_group, self.cats])
+
+    def test_empty_query(self):
+        """Пустой запрос ничего не ищет."""
+        self.assertEqual(self.found(''), [])
+
+    def test_index_follows_writes(self):
+        """Правки постов, групп и авторов сразу попадают в индекс."""
+        post = Post.objects.get(pk=self.cats.pk)
+        post.text = 'Про собак'
+        post.save()
+        self.assertEqual(self.found('кошек'), [])
+        self.assertEqual(self.found('собака'), [self.cats])
+
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Пёсики'
+        group.save()
+        self.assertEqual(self.found('песик'), [self.in_group])
+
+        user = User.objects.get(pk=self.user.pk)
+        user.first_name = 'Алексей'
+        user.save()
+        self.assertEqual(self.found('федор'), [])
+        self.assertEqual(self.found('алексей'), [self.in_group])
+
+        Post.objects.filter(pk=self.hedgehog.pk).delete()
+        self.assertEqual(self.found('ежик'), [])
+
+    def test_pagination_keeps_query(self):
+        """Ссылки на страницы результатов сохраняют запрос."""
+        Post.objects.bulk_create(
+            Post(text=f'Тестовый пост {i}', author=self.user)
+            for i in range(12)
+        )
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'тестовый'}
+        )
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertEqual(response.context['page_obj'].paginator.count, 12)
+        self.assertContains(response, '?q=%D1%82%D0%B5%D1%81%D1%82%D0%BE'
+                                      '%D0%B2%D1%8B%D0%B9&amp;page=2')
+        response = self.guest_client.get(
+            reverse('posts:search'), {'q': 'тестовый', 'page': 2}
+        )
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке идёт по индексу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'ежики'}
+        )
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.hedgehog]
+        )
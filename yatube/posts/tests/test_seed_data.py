@@ -0,0 +1,89 @@
+from datetime import datetime
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+OPTIONS = {
+    'users': 30, 'groups': 4, 'posts': 200, 'comments': 300,
+    'follows': 150, 'days': 10, 'end': datetime(2024, 1, 1),
+    'batch_size': 50,
+}
+
+
+class SeedDataCommandTest(TestCase):
+    def seed(self, **options):
+        call_command('seed_data', stdout=StringIO(), **{**OPTIONS, **options})
+
+    def snapshot(self):
+        posts = Post.objects.order_by('pk')
+        return (
+            list(posts.values_list('text', 'pub_date', 'group__slug',
+                                   'author__username')),
+            list(Comment.objects.order_by('pk').values_list(
+                'text', 'created', 'author__username'
+            )),
+            sorted(Follow.objects.values_list('user__username',
+                                              'author__username')),
+        )
+
+    def clear(self):
+        for model in (Comment, Follow, Post, Group, User):
+            model.objects.all().delete()
+
+    def test_creates_requested_rows(self):
+        """Команда создаёт ровно столько строк, сколько запрошено."""
+        self.seed()
+        self.assertEqual(User.objects.count(), OPTIONS['users'])
+        self.assertEqual(Group.objects.count(), OPTIONS['groups'])
+        self.assertEqual(Post.objects.count(), OPTIONS['posts'])
+        self.assertEqual(Comment.objects.count(), OPTIONS['comments'])
+        self.assertEqual(Follow.objects.count(), OPTIONS['follows'])
+        self.assertFalse(
+            Follow.objects.filter(user_id=F('author_id')).exists()
+        )
+
+    def test_dates_and_counters(self):
+        """Порядок id совпадает с порядком дат, счётчики пересчитаны."""
+        self.seed()
+        dates = list(Post.objects.order_by('pk')
+                     .values_list('pub_date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+        for comment in Comment.objects.select_related('post')[:50]:
+            self.assertGreaterEqual(comment.created, comment.post.pub_date)
+        stats = UserStats.objects.get(user=Post.objects.first().author)
+        self.assertEqual(
+            stats.posts_count,
+            Post.objects.filter(author=stats.user).count(),
+        )
+
+    def test_same_seed_same_data(self):
+        """Одинаковый --seed даёт одинаковые данные, другой — иные."""
+        self.seed(seed=7)
+        first = self.snapshot()
+        self.clear()
+        self.seed(seed=7)
+        self.assertEqual(self.snapshot(), first)
+        self.clear()
+        self.seed(seed=8)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_skewed_distributions(self):
+        """Самая большая группа и самый читаемый автор заметно выделяются."""
+        self.seed(users=200, posts=1000, follows=1000)
+        biggest = max(
+            Post.objects.filter(group=group).count()
+            for group in Group.objects.all()
+        )
+        self.assertGreater(biggest, 1000 * 0.6 / OPTIONS['groups'] * 1.5)
+        followers = max(
+            Follow.objects.filter(author=user).count()
+            for user in User.objects.all()
+        )
+        self.assertGreater(followers, 1000 / 200 * 3)
@@ -0,0 +1,255 @@
+import os
+import re
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+from posts import thumbnails
+from posts.models import Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+User = get_user_model()
+
+
+def run_on_commit(func):
+    func()
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   THUMBNAIL_PREGENERATE_ASYNC=False)
+class ThumbnailsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Хранилище sorl-thumbnail помнит миниатюры в кэше.
+        cache.clear()
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'cache'),
+                      ignore_errors=True)
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def thumbnail_files(self):
+        files = []
+        for _, _, names in os.walk(os.path.join(TEMP_MEDIA_ROOT, 'cache')):
+            files.extend(names)
+        return files
+
+    def upload(self, name='small.gif'):
+        return SimpleUploadedFile(
+            name=name, content=SMALL_GIF, content_type='image/gif'
+        )
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_on_commit)
+    def test_create_post_generates_thumbnails(self):
+        """Миниатюры создаются при сохранении поста с картинкой."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Тестовый текст', 'image': self.upload()},
+            follow=True,
+        )
+        self.assertEqual(
+            len(self.thumbnail_files()), len(settings.THUMBNAIL_PRESETS)
+        )
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_on_commit)
+    def test_create_post_without_image(self):
+        """Пост без картинки миниатюр не создаёт."""
+        self.authorized_client.post(
+            reverse('posts:post_create'), data={'text': 'Тестовый текст'},
+        )
+        self.assertEqual(self.thumbnail_files(), [])
+
+    @mock.patch('posts.thumbnails.transaction.on_commit', run_on_commit)
+    def test_edit_without_new_image_skips_generation(self):
+        """Правка текста не пересоздаёт миниатюры."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=self.upload('edit.gif'),
+        )
+        with mock.patch('posts.thumbnails.generate') as generate:
+            self.authorized_client.post(
+                reverse('posts:post_edit', kwargs={'post_id': post.pk}),
+                data={'text': 'Новый текст'},
+            )
+        generate.assert_not_called()
+
+    def test_generate_thumbnails_command(self):
+        """Команда создаёт миниатюры для уже загруженных картинок."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=self.upload('old.gif'),
+        )
+        Post.objects.create(author=self.user, text='Копия',
+                            image=post.image.name)
+        out = StringIO()
+        with mock.patch('posts.thumbnails.generate',
+                        wraps=thumbnails.generate) as generate:
+            call_command('generate_thumbnails', workers=1, stdout=out)
+        generate.assert_called_once_with(post.image.name)
+        self.assertIn('Картинок обработано: 1', out.getvalue())
+        self.assertEqual(
+            len(self.thumbnail_files()), len(settings.THUMBNAIL_PRESETS)
+        )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class PostImageTagTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def render(self, post, arguments=''):
+        return Template(
+            '{% load post_images %}{% post_image post ' + arguments + ' %}'
+        ).render(Context({'post': post}))
+
+    def post(self, width=None):
+        return Post.objects.create(
+            author=self.user, text='Текст', image_width=width,
+            image=SimpleUploadedFile('pic.gif', SMALL_GIF, 'image/gif'),
+        )
+
+    def test_srcset_lists_every_preset(self):
+        """srcset содержит все размеры, размеры и lazy заданы явно."""
+        html = self.render(self.post())
+        widths = re.findall(r' (\d+)w', html)
+        self.assertEqual(
+            widths,
+            sorted((geometry.split('x')[0]
+                    for geometry, _ in settings.THUMBNAIL_PRESETS), key=int),
+        )
+        self.assertIn('width="960" height="339"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_presets_wider_than_source_skipped(self):
+        """Размеры шире оригинала не попадают в srcset."""
+        html = self.render(self.post(width=700), 'lazy=False')
+        self.assertEqual(re.findall(r' (\d+)w', html), ['320', '640'])
+        self.assertIn('width="640" height="226"', html)
+        self.assertIn('loading="eager"', html)
+
+    def test_post_without_image(self):
+        """Пост без картинки выводит пустую строку."""
+        post = Post.objects.create(author=self.user, text='Текст')
+        self.assertEqual(self.render(post), '')
+
+    def test_missing_file(self):
+        """Пропавший файл картинки не роняет страницу."""
+        post = Post.objects.create(author=self.user, text='Текст',
+                                   image='posts/missing.gif')
+        with self.assertLogs('posts.templatetags.post_images', 'ERROR'):
+            self.assertEqual(self.render(post), '')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   THUMBNAIL_PREGENERATE_ASYNC=False)
+@mock.patch('posts.signals.transaction.on_commit', run_on_commit)
+class ThumbnailStoreTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def post(self, name):
+        post = Post.objects.create(
+            author=self.user, text='Текст',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+        thumbnails.generate(post.image.name)
+        return post
+
+    def thumbnail_names(self, image_name):
+        return [
+            thumbnails.thumbnail_file(image_name, geometry, options).name
+            for geometry, options in settings.THUMBNAIL_PRESETS
+        ]
+
+    def test_page_thumbnails_fetched_in_one_query(self):
+        """Метаданные миниатюр страницы берутся одним запросом к базе."""
+        posts = [self.post(f'page{i}.gif') for i in range(3)]
+        # Из кэша метаданные вытеснены, остались только в базе.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            html = Template(
+                '{% load post_cards %}{% post_cards posts as cards %}'
+                '{% for post, card in cards %}{{ card }}{% endfor %}'
+            ).render(Context({'posts': posts}))
+        kvstore_queries = [
+            query for query in queries
+            if KVStoreModel._meta.db_table in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertEqual(html.count('srcset='), 3)
+
+    def test_new_image_discards_old_thumbnails(self):
+        """Замена картинки удаляет старый файл и его миниатюры."""
+        post = self.post('old.gif')
+        old_name = post.image.name
+        old_thumbnails = self.thumbnail_names(old_name)
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        storage = default_storage
+        self.assertFalse(storage.exists(old_name))
+        for name in old_thumbnails:
+            self.assertFalse(storage.exists(name))
+        self.assertFalse(
+            KVStoreModel.objects.filter(key__contains=old_name).exists()
+        )
+        self.assertTrue(storage.exists(post.image.name))
+
+    def test_delete_keeps_shared_image(self):
+        """Удаление поста не трогает картинку, нужную другому посту."""
+        post = self.post('shared.gif')
+        twin = Post.objects.create(author=self.user, text='Копия',
+                                   image=post.image.name)
+        post.delete()
+        self.assertTrue(default_storage.exists(twin.image.name))
+        Post.objects.filter(pk=twin.pk).delete()
+        self.assertFalse(default_storage.exists(twin.image.name))
@@ -0,0 +1,112 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, Timeline, UserStats
+
+User = get_user_model()
+
+
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def _feed(self):
+        response = TimelineTests.reader_client.get(
+            reverse('posts:follow_index')
+        )
+        return list(response.context['page_obj'])
+
+    def test_new_post_fans_out(self):
+        """Новый пост автора попадает в ленту подписчика."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        post = Post.objects.create(text='Пост', author=TimelineTests.author)
+        self.assertTrue(
+            Timeline.objects.filter(user=TimelineTests.reader,
+                                    post=post).exists()
+        )
+        self.assertEqual(self._feed(), [post])
+
+    def test_follow_and_unfollow(self):
+        """Подписка добавляет старые посты автора, отписка убирает их."""
+        post = Post.objects.create(text='Пост', author=TimelineTests.author)
+        follow = Follow.objects.create(user=TimelineTests.reader,
+                                       author=TimelineTests.author)
+        self.assertEqual(self._feed(), [post])
+        follow.delete()
+        self.assertFalse(
+            Timeline.objects.filter(user=TimelineTests.reader).exists()
+        )
+        self.assertEqual(self._feed(), [])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=1)
+    def test_celebrity_posts_are_pulled(self):
+        """Посты «знаменитости» не раскладываются, но видны в ленте."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        celebrity_post = Post.objects.create(text='Пост',
+                                             author=TimelineTests.author)
+        self.assertFalse(Timeline.objects.exists())
+        self.assertEqual(self._feed(), [celebrity_post])
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_pulled_posts_survive_dropping_below_limit(self):
+        """Отписка ниже порога не прячет посты, которые не раскладывали."""
+        other = User.objects.create_user(username='Other')
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        follow = Follow.objects.create(user=other,
+                                       author=TimelineTests.author)
+        post = Post.objects.create(text='Пост', author=TimelineTests.author)
+        self.assertFalse(Timeline.objects.exists())
+
+        follow.delete()
+        self.assertEqual(self._feed(), [post])
+
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertTrue(
+            Timeline.objects.filter(user=TimelineTests.reader,
+                                    post=post).exists()
+        )
+        self.assertFalse(
+            UserStats.objects.get(user=TimelineTests.author).fanout_skipped
+        )
+        self.assertEqual(self._feed(), [post])
+
+    @override_settings(TIMELINE_BACKFILL_LIMIT=2)
+    def test_posts_beyond_backfill_are_pulled(self):
+        """Посты старше раскладки при подписке остаются в ленте."""
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=TimelineTests.author)
+            for i in range(3)
+        ]
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        self.assertEqual(
+            Timeline.objects.filter(user=TimelineTests.reader).count(), 2
+        )
+        self.assertEqual(self._feed(), posts[::-1])
+
+    def test_rebuild_command(self):
+        """Команда пересобирает ленты по текущим подпискам."""
+        Follow.objects.create(user=TimelineTests.reader,
+                              author=TimelineTests.author)
+        posts = [
+            Post.objects.create(text=f'Пост {i}', author=TimelineTests.author)
+            for i in range(3)
+        ]
+        Timeline.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertEqual(
+            set(Timeline.objects.values_list('post', flat=True)),
+            {post.pk for post in posts},
+        )
@@ -1,13 +1,15 @@
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 
 from posts.models import Post, Group
 
 User = get_user_model()
 
 
+# Ответ из кэша страниц не несёт шаблонов, которые здесь проверяются.
+@override_settings(PAGE_CACHE=False)
 class PostURLTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -1,22 +1,31 @@
+from http import HTTPStatus
 import shutil
 import tempfile
+from unittest import mock
 
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase, override_settings
+from django.test import Client, RequestFactory, TestCase, override_settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils.http import urlencode
 from django import forms
 from django.conf import settings
 
-from posts.models import Post, Group, Follow
+from core.query_budget import QueryBudgetExceeded, query_budget
+from posts import feed_cache
+from posts.models import Post, Group, Follow, Comment
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
 User = get_user_model()
 
 
-@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+# Ответ из кэша страниц не несёт шаблонов и контекста, которые здесь
+# проверяются.
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, PAGE_CACHE=False)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -368,6 +377,351 @@ class PaginatorViewsTest(TestCase):
                                  number_of_post_second_page)
 
 
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        Post.objects.bulk_create(
+            Post(text=f'Текст поста №{i}', author=cls.user, group=cls.group)
+            for i in range(13)
+        )
+        cls.reverse_names = [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': CursorPaginatorViewsTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': CursorPaginatorViewsTest.user}),
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_cursor_pages(self):
+        """Курсоры листают ленту вперёд и назад без пропусков."""
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        for reverse_name in CursorPaginatorViewsTest.reverse_names:
+            with self.subTest(reverse_name=reverse_name):
+                client = CursorPaginatorViewsTest.authorized_client
+                first = client.get(reverse_name).context['page_obj']
+                self.assertEqual(list(first), expected[:10])
+                self.assertFalse(first.has_previous())
+                self.assertIsNotNone(first.next_cursor)
+
+                second = client.get(
+                    reverse_name, {'cursor': first.next_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(second), expected[10:])
+                self.assertFalse(second.has_next())
+
+                back = client.get(
+                    reverse_name, {'cursor': second.previous_cursor}
+                ).context['page_obj']
+                self.assertEqual(list(back), expected[:10])
+
+    def test_cursor_page_skips_count(self):
+        """Страница по курсору не считает записи COUNT(*)."""
+        with CaptureQueriesContext(connection) as queries:
+            CursorPaginatorViewsTest.authorized_client.get(
+                reverse('posts:index')
+            )
+        self.assertFalse(
+            [q for q in queries if 'COUNT(' in q['sql'].upper()]
+        )
+
+    def test_broken_cursor_shows_first_page(self):
+        """Битый курсор ведёт на первую страницу."""
+        response = CursorPaginatorViewsTest.authorized_client.get(
+            reverse('posts:index'), {'cursor': 'не-курсор'}
+        )
+        self.assertEqual(len(response.context['page_obj']),
+                         settings.NUMBER_OF_POSTS)
+
+    def test_deep_page_number_not_found(self):
+        """Слишком далёкая номерная страница отдаёт 404."""
+        response = CursorPaginatorViewsTest.authorized_client.get(
+            reverse('posts:index'),
+            {'page': settings.MAX_PAGE_NUMBER + 1}
+        )
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(MAX_PAGE_NUMBER=2)
+    def test_page_links_stop_at_max_page_number(self):
+        """Номерные ссылки не ведут дальше MAX_PAGE_NUMBER."""
+        Group.objects.filter(pk=CursorPaginatorViewsTest.group.pk).update(
+            post_count=1000
+        )
+        response = CursorPaginatorViewsTest.authorized_client.get(
+            reverse('posts:group_list',
+                    kwargs={'slug': CursorPaginatorViewsTest.group.slug}),
+            {'page': 1},
+        )
+        self.assertEqual(response.context['page_obj'].paginator.num_pages, 2)
+        self.assertNotContains(response, 'page=3')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, QUERY_BUDGET_RAISE=True)
+class QueryBudgetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.authorized_client = Client()
+        cls.authorized_client.force_login(cls.user)
+        cls.author = User.objects.create_user(username='Author')
+
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        for i in range(settings.NUMBER_OF_POSTS + 1):
+            author = cls.author if i % 2 else cls.user
+            cls.post = Post.objects.create(
+                text=f'Текст поста №{i}', author=author, group=cls.group,
+            )
+            Comment.objects.create(post=cls.post, author=author, text='Ок')
+        Follow.objects.create(user=cls.user, author=cls.author)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_within_query_budget(self):
+        """Страницы укладываются в бюджет запросов при полной ленте."""
+        post_id = QueryBudgetTest.post.id
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': QueryBudgetTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': QueryBudgetTest.author}),
+            reverse('posts:post_detail', kwargs={'post_id': post_id}),
+            reverse('posts:post_create'),
+            reverse('posts:post_edit', kwargs={'post_id': post_id}),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?' + urlencode({'q': 'текст'}),
+            reverse('posts:comments', kwargs={'post_id': post_id}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = QueryBudgetTest.authorized_client.get(url)
+                self.assertEqual(response.status_code, 200)
+
+    def test_mutations_within_query_budget(self):
+        """Пост, комментарий и подписка укладываются в бюджет запросов."""
+        client = QueryBudgetTest.authorized_client
+        Follow.objects.create(user=QueryBudgetTest.author,
+                              author=QueryBudgetTest.user)
+        response = client.post(
+            reverse('posts:post_create'),
+            {'text': 'Новый пост', 'group': QueryBudgetTest.group.pk},
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        client.post(
+            reverse('posts:add_comment',
+                    kwargs={'post_id': QueryBudgetTest.post.id}),
+            {'text': 'Комментарий'},
+        )
+        other = User.objects.create_user(username='Other')
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name):
+                client.get(reverse(name, kwargs={'username': other}))
+        another = User.objects.create_user(username='Another')
+        for name in ('posts:profile_follow', 'posts:profile_unfollow'):
+            with self.subTest(name=name, ajax=True):
+                client.get(reverse(name, kwargs={'username': another}),
+                           HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_exceeded_budget_raises(self):
+        """Превышение бюджета в тестах приводит к ошибке."""
+        @query_budget(0)
+        def view(request):
+            return list(Post.objects.all())
+
+        with self.assertRaises(QueryBudgetExceeded):
+            view(RequestFactory().get('/'))
+
+
+@override_settings(PAGE_CACHE=True)
+class CachedPageViewersTest(TestCase):
+    """Страницы из кэша не показывают зрителю чужие шапку и кнопки."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.stranger = User.objects.create_user(username='stranger')
+        cls.group = Group.objects.create(title='Группа', slug='group')
+        cls.post = Post.objects.create(author=cls.author, text='Текст',
+                                       group=cls.group)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.clients = {'anonymous': Client()}
+        for user in ('author', 'reader', 'stranger'):
+            self.clients[user] = Client()
+            self.clients[user].force_login(getattr(CachedPageViewersTest,
+                                                   user))
+
+    def get(self, viewer, url):
+        response = self.clients[viewer].get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_header_is_per_viewer(self):
+        """Шапка своя у каждого зрителя, в каком бы порядке ни смотрели."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=['group']),
+            reverse('posts:profile', args=['author']),
+            reverse('posts:post_detail', args=[CachedPageViewersTest.post.pk]),
+        ]
+        for url in urls:
+            for viewer in ('anonymous', 'reader', 'author', 'anonymous',
+                           'stranger', 'reader'):
+                with self.subTest(url=url, viewer=viewer):
+                    html = self.get(viewer, url)
+                    self.assertIn('Текст', html)
+                    if viewer == 'anonymous':
+                        self.assertIn('Войти', html)
+                        self.assertNotIn('Пользователь:', html)
+                    else:
+                        self.assertIn(f'Пользователь: {viewer}', html)
+                        self.assertEqual(html.count('Пользователь:'), 1)
+
+    def test_follow_button_is_per_viewer(self):
+        """Кнопка подписки в профиле — по зрителю и его подпискам."""
+        url = reverse('posts:profile', args=['author'])
+        follow = reverse('posts:profile_follow', args=['author'])
+        unfollow = reverse('posts:profile_unfollow', args=['author'])
+        html = self.get('reader', url)
+        self.assertIn(unfollow, html)
+        self.assertNotIn(follow, html)
+        html = self.get('stranger', url)
+        self.assertIn(follow, html)
+        self.assertNotIn(unfollow, html)
+        html = self.get('author', url)
+        self.assertNotIn(follow, html)
+        self.assertNotIn(unfollow, html)
+        self.assertNotIn(unfollow, self.get('anonymous', url))
+
+        self.clients['stranger'].get(follow)
+        self.assertIn(unfollow, self.get('stranger', url))
+        self.clients['reader'].get(unfollow)
+        self.assertIn(follow, self.get('reader', url))
+
+    def test_post_buttons_are_per_viewer(self):
+        """Правка — только автору, форма комментария — только вошедшим."""
+        post_id = CachedPageViewersTest.post.pk
+        url = reverse('posts:post_detail', args=[post_id])
+        edit = reverse('posts:post_edit', args=[post_id])
+        self.assertIn(edit, self.get('author', url))
+        html = self.get('reader', url)
+        self.assertNotIn(edit, html)
+        self.assertIn('csrfmiddlewaretoken', html)
+        html = self.get('anonymous', url)
+        self.assertNotIn(edit, html)
+        self.assertNotIn('csrfmiddlewaretoken', html)
+
+
+class FragmentResponseTest(TestCase):
+    """Запросы из comments.js и follow.js получают JSON вместо редиректа."""
+
+    AJAX = {'HTTP_X_REQUESTED_WITH': 'XMLHttpRequest'}
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+
+    def setUp(self):
+        self.client.force_login(FragmentResponseTest.user)
+
+    def test_comment_fragment(self):
+        """Новый комментарий приходит готовой разметкой."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[FragmentResponseTest.post.pk]),
+            {'text': 'Новый комментарий'}, **self.AJAX,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        comment = Comment.objects.get()
+        data = response.json()
+        self.assertEqual(data['id'], comment.pk)
+        self.assertIn('Новый комментарий', data['html'])
+        self.assertIn(f'data-comment-id="{comment.pk}"', data['html'])
+
+    def test_invalid_comment(self):
+        """Пустой комментарий — ошибки формы и 400, без записи."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[FragmentResponseTest.post.pk]),
+            {'text': ''}, **self.AJAX,
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertIn('text', response.json()['errors'])
+        self.assertFalse(Comment.objects.exists())
+
+    def test_follow_state(self):
+        """Подписка и отписка возвращают новое состояние и счётчики."""
+        author = FragmentResponseTest.author
+        data = self.client.get(
+            reverse('posts:profile_follow', args=[author.username]),
+            **self.AJAX,
+        ).json()
+        self.assertTrue(data['following'])
+        self.assertEqual(data['followers_count'], 1)
+        self.assertIn(
+            reverse('posts:profile_unfollow', args=[author.username]),
+            data['html'],
+        )
+        data = self.client.get(
+            reverse('posts:profile_unfollow', args=[author.username]),
+            **self.AJAX,
+        ).json()
+        self.assertFalse(data['following'])
+        self.assertEqual(data['followers_count'], 0)
+        self.assertIn(
+            reverse('posts:profile_follow', args=[author.username]),
+            data['html'],
+        )
+
+    def test_accept_json_without_requested_with(self):
+        """Хватает Accept: application/json, если X-Requested-With срезан."""
+        response = self.client.post(
+            reverse('posts:add_comment', args=[FragmentResponseTest.post.pk]),
+            {'text': 'Новый комментарий'},
+            HTTP_ACCEPT='application/json',
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIn('Новый комментарий', response.json()['html'])
+
+    def test_plain_requests_redirect(self):
+        """Без заголовка поведение прежнее — редирект."""
+        author = FragmentResponseTest.author
+        response = self.client.get(
+            reverse('posts:profile_follow', args=[author.username])
+        )
+        self.assertRedirects(
+            response, reverse('posts:profile', args=[author.username])
+        )
+
+
 class CacheTest(TestCase):
     @classmethod
     def setUpClass(cls):
@@ -375,20 +729,306 @@ class CacheTest(TestCase):
         cls.user = User.objects.create_user(username='HasNoName')
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+
+    def setUp(self):
+        cache.clear()
 
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Лента берётся из кэша, пока её не сбросит новый пост."""
+        Post.objects.create(text='Старый пост', author=CacheTest.user)
         response = CacheTest.authorized_client.get(reverse('posts:index'))
-        posts_cashe = response.content
-        Post.objects.create(
-            text='Новый пост',
-            author=CacheTest.user,
-        )
+        posts_cache = response.content
+
+        Post.objects.update(text='Изменён в обход сигналов')
         response = CacheTest.authorized_client.get(reverse('posts:index'))
-        posts_old = response.content
-        self.assertEqual(posts_old, posts_cashe)
-        cache.clear()
+        self.assertEqual(response.content, posts_cache)
 
+        Post.objects.create(text='Новый пост', author=CacheTest.user)
         response = CacheTest.authorized_client.get(reverse('posts:index'))
-        posts_new = response.content
-        self.assertNotEqual(posts_old, posts_new)
+        self.assertIn('Новый пост', response.content.decode())
+
+    def test_feeds_invalidated_on_write(self):
+        """Пост и комментарий сразу сбрасывают кэш всех своих лент."""
+        reverse_names = [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': CacheTest.group.slug}),
+            reverse('posts:profile', kwargs={'username': CacheTest.user}),
+        ]
+        client = CacheTest.authorized_client
+        for reverse_name in reverse_names:
+            client.get(reverse_name)
+        post = Post.objects.create(text='Новый пост', author=CacheTest.user,
+                                   group=CacheTest.group)
+        for reverse_name in reverse_names:
+            with self.subTest(reverse_name=reverse_name):
+                response = client.get(reverse_name)
+                self.assertIn('Новый пост', response.content.decode())
+                self.assertIn('комментариев: 0', response.content.decode())
+
+        Comment.objects.create(post=post, author=CacheTest.user, text='Ок')
+        for reverse_name in reverse_names:
+            with self.subTest(reverse_name=reverse_name):
+                response = client.get(reverse_name)
+                self.assertIn('комментариев: 1', response.content.decode())
+
+    def test_cache_varies_by_page(self):
+        """Разные страницы ленты кэшируются под разными ключами."""
+        Post.objects.bulk_create(
+            Post(text=f'Текст поста №{i}', author=CacheTest.user)
+            for i in range(settings.NUMBER_OF_POSTS + 1)
+        )
+        client = CacheTest.authorized_client
+        first = client.get(reverse('posts:index'))
+        second = client.get(
+            reverse('posts:index'),
+            {'cursor': first.context['page_obj'].next_cursor},
+        )
+        self.assertNotEqual(first.content, second.content)
+        self.assertEqual(len(second.context['page_obj']), 1)
+
+    def test_only_renames_reset_author_feeds(self):
+        """Сохранение пользователя без смены имени не сбрасывает ленты."""
+        post = Post.objects.create(text='Пост', author=CacheTest.user,
+                                   group=CacheTest.group)
+        group_url = reverse('posts:group_list',
+                            kwargs={'slug': CacheTest.group.slug})
+        self.client.get(group_url)
+        updated = Post.objects.get(pk=post.pk).updated
+        generation = feed_cache.generation(feed_cache.INDEX)
+        user = User.objects.get(pk=CacheTest.user.pk)
+        user.email = 'new@example.com'
+        user.save()
+        user.save(update_fields=['first_name'])
+        self.assertEqual(Post.objects.get(pk=post.pk).updated, updated)
+        self.assertEqual(feed_cache.generation(feed_cache.INDEX), generation)
+
+        user.first_name = 'Фёдор'
+        user.username = 'fedor'
+        user.save()
+        self.assertGreater(Post.objects.get(pk=post.pk).updated, updated)
+        self.assertNotEqual(feed_cache.generation(feed_cache.INDEX),
+                            generation)
+        content = self.client.get(group_url).content.decode()
+        self.assertIn('Фёдор', content)
+        self.assertIn(reverse('posts:profile', args=['fedor']), content)
+        self.assertNotIn(reverse('posts:profile', args=['HasNoName']),
+                         content)
+
+    def test_page_wins_over_cursor_in_key(self):
+        """?page=1&cursor=X не занимает ключ страницы ?cursor=X."""
+        Post.objects.bulk_create(
+            Post(text=f'Текст поста №{i}', author=CacheTest.user)
+            for i in range(settings.NUMBER_OF_POSTS + 1)
+        )
+        client = CacheTest.authorized_client
+        cursor = client.get(
+            reverse('posts:index')
+        ).context['page_obj'].next_cursor
+        mixed = client.get(reverse('posts:index'),
+                           {'page': 1, 'cursor': cursor})
+        self.assertEqual(len(mixed.context['page_obj']),
+                         settings.NUMBER_OF_POSTS)
+        by_cursor = client.get(reverse('posts:index'), {'cursor': cursor})
+        self.assertEqual(len(by_cursor.context['page_obj']), 1)
+        self.assertNotEqual(mixed.content, by_cursor.content)
+        self.assertNotEqual(mixed['ETag'], by_cursor['ETag'])
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-group',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            text='Тестовый пост', author=cls.user, group=cls.group,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(ConditionalGetTest.reader)
+
+    def revalidate(self, client, url, response):
+        return client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_pages_not_modified(self):
+        """Неизменившиеся страницы отвечают 304 без рендера."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list',
+                    kwargs={'slug': ConditionalGetTest.group.slug}),
+            reverse('posts:profile',
+                    kwargs={'username': ConditionalGetTest.user}),
+            reverse('posts:post_detail',
+                    kwargs={'post_id': ConditionalGetTest.post.pk}),
+        ]
+        # Лентам и группе хватает кэша, профилю и посту — одного запроса.
+        queries = [0, 0, 1, 1]
+        for url, expected in zip(urls, queries):
+            with self.subTest(url=url):
+                response = self.guest_client.get(url)
+                self.assertTrue(response.has_header('ETag'))
+                with self.assertNumQueries(expected):
+                    response = self.revalidate(
+                        self.guest_client, url, response
+                    )
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+
+    def test_feed_changes_on_write(self):
+        """Новый пост меняет ETag лент."""
+        url = reverse('posts:index')
+        response = self.guest_client.get(url)
+        Post.objects.create(text='Новый пост', author=ConditionalGetTest.user)
+        response = self.revalidate(self.guest_client, url, response)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Новый пост')
+
+    def test_post_detail_changes_on_comment(self):
+        """Новый комментарий меняет ETag и Last-Modified поста."""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': ConditionalGetTest.post.pk})
+        response = self.guest_client.get(url)
+        self.assertTrue(response.has_header('Last-Modified'))
+        Comment.objects.create(post=ConditionalGetTest.post,
+                               author=ConditionalGetTest.reader,
+                               text='Свежий комментарий')
+        response = self.revalidate(self.guest_client, url, response)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertContains(response, 'Свежий комментарий')
+
+    def test_etag_depends_on_viewer(self):
+        """ETag разный для разных зрителей и меняется при подписке."""
+        url = reverse('posts:profile',
+                      kwargs={'username': ConditionalGetTest.user})
+        guest = self.guest_client.get(url)
+        reader = self.reader_client.get(url)
+        self.assertNotEqual(guest['ETag'], reader['ETag'])
+
+        Follow.objects.create(user=ConditionalGetTest.reader,
+                              author=ConditionalGetTest.user)
+        response = self.revalidate(self.reader_client, url, reader)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(text='Тестовый пост', author=cls.user)
+        for i in range(7):
+            author = User.objects.create_user(username=f'Reader{i}')
+            Comment.objects.create(
+                post=cls.post, author=author, text=f'Комментарий №{i}'
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_shows_first_page(self):
+        """На странице поста первые комментарии и ссылка на остальные."""
+        response = self.guest_client.get(reverse(
+            'posts:post_detail',
+            kwargs={'post_id': CommentPaginationTest.post.pk},
+        ))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.text for comment in comments],
+            [f'Комментарий №{i}' for i in range(5)],
+        )
+        self.assertContains(response, comments.next_cursor)
+
+    def test_fragment_returns_next_page(self):
+        """Фрагмент отдаёт следующую страницу одним запросом."""
+        post_id = CommentPaginationTest.post.pk
+        first = self.guest_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post_id})
+        )
+        url = reverse('posts:comments', kwargs={'post_id': post_id})
+        with self.assertNumQueries(1):
+            response = self.guest_client.get(
+                url, {'cursor': first.context['comments'].next_cursor}
+            )
+        self.assertTemplateUsed(response, 'posts/includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Комментарий №5', 'Комментарий №6'],
+        )
+        self.assertNotContains(response, 'Показать ещё')
+
+    def test_post_detail_continues_from_cursor(self):
+        """Без JS ссылка «ещё» открывает страницу поста с продолжением."""
+        url = reverse('posts:post_detail',
+                      kwargs={'post_id': CommentPaginationTest.post.pk})
+        first = self.guest_client.get(url)
+        response = self.guest_client.get(
+            url, {'comments': first.context['comments'].next_cursor}
+        )
+        self.assertEqual(len(response.context['comments']), 2)
+        self.assertContains(response, 'К первым комментариям')
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='HasNoName')
+        cls.post = Post.objects.create(text='Старый текст', author=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def index_text(self):
+        # Сдвиг поколения ленты: страница пересобирается из карточек.
+        feed_cache.bump(feed_cache.INDEX)
+        return self.guest_client.get(reverse('posts:index')).content.decode()
+
+    def test_card_reused_until_post_changes(self):
+        """Карточка берётся из кэша, пока пост не изменён."""
+        self.index_text()
+        Post.objects.update(text='Изменён в обход сигналов')
+        self.assertIn('Старый текст', self.index_text())
+
+        post = Post.objects.get(pk=PostCardCacheTest.post.pk)
+        post.text = 'Новый текст'
+        post.save()
+        self.assertIn('Новый текст', self.index_text())
+
+    def test_card_changes_with_comments(self):
+        """Новый комментарий меняет карточку."""
+        self.index_text()
+        Comment.objects.create(post=PostCardCacheTest.post,
+                               author=PostCardCacheTest.user, text='Ок')
+        self.assertIn('комментариев: 1', self.index_text())
+
+    def test_page_cards_fetched_with_one_get_many(self):
+        """Карточки страницы читаются из кэша одним get_many."""
+        self.index_text()
+        with mock.patch.object(cache, 'get_many',
+                               wraps=cache.get_many) as get_many, \
+                mock.patch('posts.templatetags.post_cards.render_to_string',
+                           ) as render:
+            self.index_text()
+        card_reads = [
+            call for call in get_many.call_args_list
+            if call[0][0][0].startswith('post-card:')
+        ]
+        self.assertEqual(len(card_reads), 1)
+        render.assert_not_called()
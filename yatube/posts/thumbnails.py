@@ -0,0 +1,156 @@
+import logging
+import threading
+from concurrent import futures
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connections, transaction
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(image_name):
+    """Создаёт все миниатюры из THUMBNAIL_PRESETS для одной картинки."""
+    for geometry, options in settings.THUMBNAIL_PRESETS:
+        get_thumbnail(image_name, geometry, **options)
+
+
+def preset_width(geometry):
+    return int(geometry.split('x')[0])
+
+
+def responsive(image, source_width=None):
+    """Миниатюры картинки по THUMBNAIL_PRESETS, от узкой к широкой.
+
+    Пресеты шире оригинала (source_width) пропускаются, кроме самого
+    узкого: растянутая картинка весит больше, а чётче не становится.
+    """
+    presets = sorted(settings.THUMBNAIL_PRESETS,
+                     key=lambda preset: preset_width(preset[0]))
+    if source_width:
+        presets = [
+            preset for preset in presets
+            if preset_width(preset[0]) <= source_width
+        ] or presets[:1]
+    return [
+        get_thumbnail(image, geometry, **options)
+        for geometry, options in presets
+    ]
+
+
+def thumbnail_file(image, geometry, options):
+    """ImageFile миниатюры без обращения к хранилищу.
+
+    Имя считается так же, как в ThumbnailBackend.get_thumbnail sorl: те же
+    умолчания опций и тот же _get_thumbnail_filename.
+    """
+    backend = default.backend
+    options = dict(options)
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(ImageFile(image), geometry,
+                                           options)
+    return ImageFile(name, default.storage)
+
+
+@contextmanager
+def prefetched(posts):
+    """Метаданные всех миниатюр постов — одной выборкой из хранилища.
+
+    Внутри блока {% post_image %} не ходит в кэш и базу за каждой
+    миниатюрой отдельно (posts.kvstore).
+    """
+    kvstore = default.kvstore
+    if not hasattr(kvstore, 'batch'):
+        yield
+        return
+    with kvstore.batch():
+        kvstore.prefetch([
+            add_prefix(thumbnail_file(post.image, geometry, options).key)
+            for post in posts if post.image
+            for geometry, options in settings.THUMBNAIL_PRESETS
+        ])
+        yield
+
+
+def discard(image_name):
+    """Убирает картинку, на которую больше не ссылается ни один пост.
+
+    Удаляются записи хранилища sorl, файлы миниатюр и сам оригинал.
+    """
+    if Post.objects.filter(image=image_name).exists():
+        return
+    try:
+        default.kvstore.delete(ImageFile(image_name, default.storage))
+        default.storage.delete(image_name)
+    except (OSError, SuspiciousFileOperation):
+        # Уборка не должна ронять запрос, который удалил или изменил пост.
+        logger.exception('Не удалось удалить картинку %s', image_name)
+
+
+def _generate_in_worker(image_name):
+    try:
+        generate(image_name)
+    except Exception:
+        logger.exception('Не удалось создать миниатюры для %s', image_name)
+    finally:
+        # У потока пула своё подключение к базе (хранилище sorl), его
+        # нужно закрыть, иначе оно повиснет до конца жизни потока.
+        connections.close_all()
+
+
+def schedule(post):
+    """Ставит миниатюры картинки поста в очередь после коммита.
+
+    Миниатюры делает пул потоков, а не запрос: первый зритель страницы
+    получает готовые файлы вместо синхронных преобразований Pillow.
+    """
+    if not post.image:
+        return
+    image_name = post.image.name
+
+    def submit():
+        if settings.THUMBNAIL_PREGENERATE_ASYNC:
+            future = _get_executor().submit(_generate_in_worker, image_name)
+            _pending.add(future)
+            future.add_done_callback(_pending.discard)
+        else:
+            generate(image_name)
+
+    transaction.on_commit(submit)
+
+
+def wait(timeout=None):
+    """Дожидается миниатюр, уже поставленных в пул.
+
+    Нужна тестам с настоящими коммитами: поток пула пишет в базу, которую
+    тест сразу после себя очищает.
+    """
+    futures.wait(list(_pending), timeout)
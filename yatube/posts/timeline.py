@@ -0,0 +1,187 @@
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core.paginator import CursorPaginator
+from posts.models import Follow, Post, Timeline, UserStats
+
+TIMELINE_KEY = ('-pub_date', '-post_id')
+
+
+def _celebrities(prefix=''):
+    return (
+        Q(**{f'{prefix}followers_count__gte': settings.TIMELINE_FANOUT_LIMIT})
+        | Q(**{f'{prefix}fanout_skipped': True})
+    )
+
+
+def celebrity_ids(authors):
+    """Авторы, чьи посты не раскладываются по лентам, а читаются напрямую.
+
+    Кроме авторов с TIMELINE_FANOUT_LIMIT подписчиков сюда входят те, кому
+    раскладку уже пропускали (UserStats.fanout_skipped): их постов нет
+    в лентах, и после отписок ниже порога они всё равно читаются
+    напрямую. Отметку снимает полная пересборка — rebuild().
+    """
+    return set(
+        UserStats.objects.filter(_celebrities(), user__in=authors)
+        .values_list('user', flat=True)
+    )
+
+
+def pulled_authors(user):
+    """Авторы из подписок user, чьи посты лента читает из Post напрямую.
+
+    Это «знаменитости» (celebrity_ids) и авторы, у которых постов больше
+    TIMELINE_BACKFILL_LIMIT: подписка раскладывает в ленту только
+    последние из них (add_author), остальные подмешиваются при чтении.
+    Запрос идёт от подписок пользователя к счётчикам по ключу: с OR
+    по счётчикам SQLite иначе сканирует всю таблицу UserStats.
+    """
+    prolific = Q(
+        author__stats__posts_count__gt=settings.TIMELINE_BACKFILL_LIMIT
+    )
+    return set(
+        Follow.objects.filter(_celebrities('author__stats__') | prolific,
+                              user=user)
+        .values_list('author', flat=True)
+    )
+
+
+def is_celebrity(author):
+    return bool(celebrity_ids([author]))
+
+
+def _skip_fan_out(author_id):
+    """Отмечает «знаменитость», посты которой не будут разложены."""
+    if not is_celebrity(author_id):
+        return False
+    UserStats.objects.filter(
+        user_id=author_id, fanout_skipped=False
+    ).update(fanout_skipped=True)
+    return True
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if _skip_fan_out(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def add_author(user_id, author_id):
+    """Добавляет в ленту недавние посты автора после подписки.
+
+    Раскладываются последние TIMELINE_BACKFILL_LIMIT постов; более
+    старые лента подписок читает напрямую (pulled_authors).
+    """
+    if _skip_fan_out(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_BACKFILL_LIMIT]
+    Timeline.objects.bulk_create(
+        (Timeline(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=settings.TIMELINE_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def remove_author(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    Timeline.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild(users=None):
+    """Пересобирает ленты целиком одним INSERT ... SELECT.
+
+    Возвращает число вставленных строк. Посты «знаменитостей» не
+    раскладываются: они подмешиваются при чтении. Полная пересборка
+    раскладывает и авторов, опустившихся ниже порога, и снимает с них
+    отметку fanout_skipped; частичная оставляет её — в чужих лентах
+    их постов по-прежнему нет.
+    """
+    entries = Timeline.objects.all()
+    follows = Follow.objects.all()
+    if users is not None:
+        entries = entries.filter(user__in=users)
+        follows = follows.filter(user__in=users)
+    else:
+        UserStats.objects.filter(
+            fanout_skipped=True,
+            followers_count__lt=settings.TIMELINE_FANOUT_LIMIT,
+        ).update(fanout_skipped=False)
+    entries.delete()
+    follows = follows.exclude(
+        author__in=celebrity_ids(follows.values('author'))
+    )
+    follow_sql, params = (
+        follows.values('user_id', 'author_id').query.sql_with_params()
+    )
+    sql = (
+        f'INSERT INTO {Timeline._meta.db_table} (user_id, post_id, pub_date) '
+        f'SELECT follow.user_id, post.id, post.pub_date '
+        f'FROM ({follow_sql}) follow '
+        f'INNER JOIN {Post._meta.db_table} post '
+        f'ON post.author_id = follow.author_id'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
+class TimelinePaginator(CursorPaginator):
+    """Курсорный пагинатор ленты подписок.
+
+    Читает один индексный диапазон Timeline пользователя и подмешивает
+    тем же ключом посты авторов из pulled_authors() (pull при чтении).
+    object_list — эквивалентный запрос через JOIN, он задаёт модель и
+    служит номерным страницам.
+    """
+
+    def __init__(self, object_list, per_page, user):
+        super().__init__(object_list, per_page)
+        self.user = user
+
+    def _fetch(self, values, backwards):
+        limit = self.per_page + 1
+        entries = Timeline.objects.filter(user=self.user)
+        if values is not None:
+            entries = entries.filter(
+                self.keyset_filter(TIMELINE_KEY, values, backwards)
+            )
+        post_ids = list(
+            entries.order_by(*self.ordering(TIMELINE_KEY, backwards))
+            .values_list('post_id', flat=True)[:limit]
+        )
+        posts = list(Post.objects.feed().filter(pk__in=post_ids))
+
+        authors = pulled_authors(self.user)
+        if authors:
+            pulled = Post.objects.feed().filter(author__in=authors)
+            if values is not None:
+                pulled = pulled.filter(
+                    self.keyset_filter(self.key_fields, values, backwards)
+                )
+            posts.extend(pulled.order_by(
+                *self.ordering(self.key_fields, backwards)
+            )[:limit])
+
+        unique = {post.pk: post for post in posts}.values()
+        return sorted(
+            unique,
+            key=lambda post: (post.pub_date, post.pk),
+            reverse=not backwards,
+        )[:limit]
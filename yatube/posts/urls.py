@@ -1,7 +1,8 @@
 from django.urls import path
 from posts.views import (index, group_posts, profile, post_detail,
                          post_create, post_edit, add_comment, profile_follow,
-                         follow_index, profile_unfollow,)
+                         follow_index, profile_unfollow, search,
+                         comments,)
 
 
 app_name = 'posts'
@@ -12,9 +13,11 @@ urlpatterns = [
     path('group/<slug:slug>/', group_posts, name='group_list'),
     path('profile/<str:username>/', profile, name='profile'),
     path('posts/<int:post_id>/', post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/', comments, name='comments'),
     path('create/', post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/', add_comment, name='add_comment'),
+    path('search/', search, name='search'),
     path('follow/', follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/', profile_follow,
@@ -0,0 +1,56 @@
+from django.conf import settings
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject
+
+from core.paginator import CursorPaginator, NumberedPaginator
+from posts.models import Comment
+
+
+def get_page(request, queryset, paginator_class=CursorPaginator, count=None,
+             lazy=False):
+    """Возвращает страницу ленты.
+
+    По умолчанию лента листается курсором (?cursor=...). Номерные ссылки
+    (?page=N) поддерживаются для совместимости, но не глубже
+    MAX_PAGE_NUMBER: дальние страницы стоят OFFSET по всей таблице.
+    Известное заранее число записей (count) избавляет их от COUNT(*).
+    С lazy=True выборка откладывается до первого обращения к странице:
+    если шаблон отдал ленту из кэша, запроса не будет вовсе.
+    """
+    page_number = request.GET.get('page')
+    if page_number is None:
+        def build():
+            paginator = paginator_class(queryset, settings.NUMBER_OF_POSTS)
+            return paginator.get_cursor_page(request.GET.get('cursor'))
+    else:
+        if (page_number.isdigit()
+                and int(page_number) > settings.MAX_PAGE_NUMBER):
+            raise Http404('Слишком далёкая страница, используйте курсор.')
+
+        def build():
+            paginator = NumberedPaginator(queryset, settings.NUMBER_OF_POSTS)
+            if count is not None:
+                paginator.count = count
+            return paginator.get_page(page_number)
+    return SimpleLazyObject(build) if lazy else build()
+
+
+def page_key(request):
+    """Какую страницу отдаст get_page() — для ключей кэша и ETag.
+
+    Порядок тот же, что в get_page(): при ?page= курсор не учитывается.
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None:
+        return f'page={page_number}'
+    return f'cursor={request.GET.get("cursor", "")}'
+
+
+def get_comments_page(post_id, cursor=None):
+    """Страница комментариев поста от старых к новым, с авторами."""
+    paginator = CursorPaginator(
+        Comment.objects.filter(post_id=post_id).select_related('author'),
+        settings.COMMENTS_PER_PAGE,
+        key_fields=('created', 'pk'),
+    )
+    return paginator.get_cursor_page(cursor)
@@ -1,77 +1,113 @@
-from django.core.paginator import Paginator
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+from django.http import Http404, JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
+from django.views.decorators.http import condition
 
-from posts.models import Post, Group, Follow, User
+from core import page_cache, writer
+from core.paginator import NumberedPaginator
+from core.query_budget import query_budget
+from posts import conditional, feed_cache, object_cache, thumbnails
+from posts.counters import user_stats
+from posts.models import Post, Follow
 from posts.forms import PostForm, CommentForm
+from posts.search import search_posts
+from posts.timeline import TimelinePaginator
+from posts.utils import get_comments_page, get_page
 
 
+@condition(etag_func=conditional.index_etag)
+@page_cache.cache_page(conditional.index_state)
+@query_budget(4)
 def index(request):
     title = 'Последние обновления на сайте'
-    post_list = Post.objects.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page_obj = get_page(request, post_list, lazy=True)
     context = {
         'page_obj': page_obj,
         'title': title,
+        **feed_cache.feed_context(request, feed_cache.INDEX),
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=conditional.group_etag)
+@page_cache.cache_page(conditional.group_state)
+@query_budget(5)
 def group_posts(request, slug):
-    group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    group = object_cache.get_group_or_404(slug)
+    post_list = Post.objects.by_group(group)
+    page_obj = get_page(request, post_list, count=group.post_count,
+                        lazy=True)
     context = {
         'group': group,
         'page_obj': page_obj,
+        **feed_cache.feed_context(request, feed_cache.group_feed(group.pk)),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=conditional.profile_etag)
+@page_cache.cache_page(conditional.profile_state)
+@query_budget(7)
 def profile(request, username):
-    user = get_object_or_404(User, username=username)
-    post_list = user.posts.all()
-    post_quantity = post_list.count()
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-
-    following = False
-    if (request.user.is_authenticated
-       and Follow.objects.filter(user=request.user, author=user)):
-        following = True
+    user = object_cache.get_user_or_404(username)
+    stats = user_stats(user)
+    post_list = Post.objects.by_author(user)
+    page_obj = get_page(request, post_list, count=stats.posts_count,
+                        lazy=True)
 
     context = {
         'author': user,
         'page_obj': page_obj,
-        'post_quantity': post_quantity,
-        'following': following,
+        'post_quantity': stats.posts_count,
+        'stats': stats,
+        **feed_cache.feed_context(request, feed_cache.profile_feed(user.pk)),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=conditional.post_etag,
+           last_modified_func=conditional.post_last_modified)
+@page_cache.cache_page(conditional.post_state)
+@query_budget(6)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(Post.objects.detail(), pk=post_id)
     form = CommentForm()
-    comments = post.comments.all()
-    post_quantity = post.author.posts.all().count()
+    comments = get_comments_page(post.pk, request.GET.get('comments'))
     context = {
         'post': post,
-        'post_quantity': post_quantity,
+        'post_quantity': user_stats(post.author).posts_count,
         'form': form,
         'comments': comments,
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(2)
+def comments(request, post_id):
+    """Следующая страница комментариев — фрагмент для подгрузки."""
+    context = {
+        'comments': get_comments_page(post_id, request.GET.get('cursor')),
+        'post_id': post_id,
+    }
+    return render(request, 'posts/includes/comment_list.html', context)
+
+
+def _save_post(post):
+    """Запись нового поста: выполняется потоком записи (core.writer)."""
+    post.save()
+    thumbnails.schedule(post)
+
+
 @login_required
+@query_budget(15)
 def post_create(request):
-    get_object_or_404(User, username=request.user)
     if request.method != 'POST':
         form = PostForm()
         return render(request, 'posts/create_post.html', {'form': form})
@@ -83,15 +119,16 @@ def post_create(request):
         return render(request, 'posts/create_post.html', {'form': form})
     post = form.save(commit=False)
     post.author_id = request.user.id
-    post.save()
+    writer.run(_save_post, post)
     return redirect('posts:profile', request.user)
 
 
 @login_required
+@query_budget(5)
 def post_edit(request, post_id):
     is_edit = True
-    post = get_object_or_404(Post, pk=post_id)
-    if post.author != request.user:
+    post = get_object_or_404(Post.objects.with_relations(), pk=post_id)
+    if post.author_id != request.user.id:
         return redirect('posts:post_detail', post_id)
     if request.method != 'POST':
         form = PostForm(
@@ -109,30 +146,78 @@ def post_edit(request, post_id):
     if not form.is_valid():
         return render(request, 'posts/create_post.html',
                       {'form': form, 'is_edit': is_edit})
-    form.save()
+    with transaction.atomic():
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
     return redirect('posts:post_detail', post_id)
 
 
+def _wants_json(request):
+    """Запрос из comments.js или follow.js, а не переход по ссылке.
+
+    Скрипты шлют и X-Requested-With, и Accept: application/json: первый
+    заголовок прокси иногда срезают.
+    """
+    return (request.is_ajax()
+            or 'application/json' in request.META.get('HTTP_ACCEPT', ''))
+
+
 @login_required
+@query_budget(5)
 def add_comment(request, post_id):
+    """Добавляет комментарий.
+
+    Запрос из comments.js получает JSON с разметкой нового комментария
+    вместо перехода на страницу поста, остальные — прежний редирект.
+    """
     form = CommentForm(request.POST or None)
     post = get_object_or_404(Post, pk=post_id)
-    if form.is_valid():
-        comment = form.save(commit=False)
-        comment.author = request.user
-        comment.post = post
-        comment.save()
+    if not form.is_valid():
+        if _wants_json(request):
+            return JsonResponse({'errors': form.errors.get_json_data()},
+                                status=400)
+        return redirect('posts:post_detail', post_id=post_id)
+    comment = form.save(commit=False)
+    comment.author = request.user
+    comment.post = post
+    writer.run(comment.save)
+    if _wants_json(request):
+        return JsonResponse({
+            'id': comment.pk,
+            'html': render_to_string(
+                'posts/includes/comment_list.html',
+                {'comments': [comment]}, request,
+            ),
+        })
     return redirect('posts:post_detail', post_id=post_id)
 
 
+@query_budget(5)
+def search(request):
+    query = request.GET.get('q', '').strip()
+    page_number = request.GET.get('page')
+    if (page_number and page_number.isdigit()
+            and int(page_number) > settings.MAX_PAGE_NUMBER):
+        raise Http404('Слишком далёкая страница, уточните запрос.')
+    paginator = NumberedPaginator(search_posts(query),
+                                  settings.NUMBER_OF_POSTS)
+    context = {
+        'query': query,
+        'page_obj': paginator.get_page(page_number),
+        'page_query': urlencode({'q': query}) + '&' if query else '',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@query_budget(6)
 def follow_index(request):
     title = 'Последние посты избранных авторов'
-    post_list = Post.objects.filter(author__following__user=request.user)
-
-    paginator = Paginator(post_list, settings.NUMBER_OF_POSTS)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    post_list = Post.objects.followed_by(request.user)
+    page_obj = get_page(
+        request, post_list, partial(TimelinePaginator, user=request.user)
+    )
     context = {
         'page_obj': page_obj,
         'title': title,
@@ -140,23 +225,43 @@ def follow_index(request):
     return render(request, 'posts/follow.html', context)
 
 
+def _follow_response(request, author, following):
+    """Редирект на профиль или, для follow.js, новое состояние подписки."""
+    if not _wants_json(request):
+        return redirect('posts:profile', username=author)
+    stats = user_stats(author)
+    return JsonResponse({
+        'following': following,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+        'html': render_to_string(
+            'posts/includes/follow_button.html',
+            {'username': author.username, 'following': following},
+            request,
+        ),
+    })
+
+
 @login_required
+@query_budget(14)
 def profile_follow(request, username):
-    username = get_object_or_404(User, username=username)
-    if request.user != username:
-        Follow.objects.get_or_create(
-            user=request.user, author=username
-        )
+    author = object_cache.get_user_or_404(username)
+    if request.user == author:
+        return _follow_response(request, author, following=False)
+    writer.run(
+        Follow.objects.get_or_create, user=request.user, author=author
+    )
+    return _follow_response(request, author, following=True)
+
 
-    return redirect('posts:profile', username=username)
+def _unfollow(user, author):
+    """Отписка: выполняется потоком записи (core.writer)."""
+    Follow.objects.filter(user=user, author=author).delete()
 
 
 @login_required
+@query_budget(10)
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
-
-    follower = Follow.objects.filter(user=request.user, author=author)
-    if follower.exists():
-        follower.delete()
-
-    return redirect('posts:profile', username=username)
+    author = object_cache.get_user_or_404(username)
+    writer.run(_unfollow, request.user, author)
+    return _follow_response(request, author, following=False)
@@ -0,0 +1,94 @@
+// Свой комментарий, добавленный до конца списка, стоит перед кнопкой
+// «ещё»; когда подгрузка доходит до него, раннюю копию убираем.
+function removeDuplicates() {
+  var seen = {};
+  document.querySelectorAll('.comments [data-comment-id]').forEach(
+    function (comment) {
+      var id = comment.dataset.commentId;
+      if (seen[id]) {
+        seen[id].remove();
+      }
+      seen[id] = comment;
+    }
+  );
+}
+
+// Подгружает следующие страницы комментариев вместо перехода по ссылке.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('.comments-more');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.dataset.fragmentUrl, {credentials: 'same-origin'})
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.text();
+    })
+    .then(function (html) {
+      link.outerHTML = html;
+      removeDuplicates();
+    })
+    .catch(function () {
+      window.location.href = link.href;
+    });
+});
+
+// Отправляет комментарий без перезагрузки и дописывает его в список.
+// Обычной отправкой формы запрос повторяется, только если fetch его не
+// отправил. Если сервер ответил, комментарий мог уже записаться: повтор
+// его бы продублировал, поэтому страница просто перезагружается.
+function showComment(form, data) {
+  var field = form.querySelector('[name=text]');
+  form.querySelector('[type=submit]').disabled = false;
+  if (data.errors) {
+    field.classList.add('is-invalid');
+    return;
+  }
+  field.classList.remove('is-invalid');
+  form.reset();
+  var list = document.querySelector('.comments');
+  var more = list.querySelector('.comments-more');
+  if (more) {
+    more.insertAdjacentHTML('beforebegin', data.html);
+  } else {
+    list.insertAdjacentHTML('beforeend', data.html);
+  }
+}
+
+document.addEventListener('submit', function (event) {
+  var form = event.target.closest('.comment-form');
+  if (!form) {
+    return;
+  }
+  event.preventDefault();
+  form.querySelector('[type=submit]').disabled = true;
+  fetch(form.action, {
+    method: 'POST',
+    body: new FormData(form),
+    credentials: 'same-origin',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'Accept': 'application/json',
+    },
+  })
+    .then(
+      function (response) {
+        if (!response.ok && response.status !== 400) {
+          throw new Error(response.status);
+        }
+        return response.json().then(function (data) {
+          showComment(form, data);
+        });
+      },
+      function () {
+        form.submit();
+      }
+    )
+    .catch(function () {
+      window.location.reload();
+    });
+});
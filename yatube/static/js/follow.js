@@ -0,0 +1,32 @@
+// Подписка и отписка без перехода: кнопка и счётчики обновляются на месте.
+document.addEventListener('click', function (event) {
+  var link = event.target.closest('.follow-toggle');
+  if (!link) {
+    return;
+  }
+  event.preventDefault();
+  link.classList.add('disabled');
+  fetch(link.href, {
+    credentials: 'same-origin',
+    headers: {
+      'X-Requested-With': 'XMLHttpRequest',
+      'Accept': 'application/json',
+    },
+  })
+    .then(function (response) {
+      if (!response.ok) {
+        throw new Error(response.status);
+      }
+      return response.json();
+    })
+    .then(function (data) {
+      link.outerHTML = data.html;
+      document.querySelector('.followers-count').textContent =
+        data.followers_count;
+      document.querySelector('.following-count').textContent =
+        data.following_count;
+    })
+    .catch(function () {
+      window.location.href = link.href;
+    });
+});
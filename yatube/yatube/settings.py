@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
+import atexit
 import os
+import shutil
+import sys
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -48,20 +52,29 @@ INSTALLED_APPS = [
     'core.apps.CoreConfig',
     'about.apps.AboutConfig',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# Разбивка времени запросов в Server-Timing и логе core.timing
+# (core.middleware.ServerTimingMiddleware). Под DEBUG к ней добавляется
+# debug_toolbar.
+SERVER_TIMING = True
+
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
@@ -95,9 +108,56 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Копия основной базы, её обновляет команда sync_replica. В тестах —
+    # отдельная пустая база: так видно, что отставание реплики не прячет
+    # от пользователя его же записи.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db_replica.sqlite3'),
+    },
 }
 
+# Прагмы каждого нового подключения SQLite (core.sqlite). WAL не даёт
+# читателям ждать пишущего; busy_timeout (мс) заставляет пишущих
+# дождаться блокировки, а не падать с «database is locked». При WAL
+# synchronous=NORMAL не теряет целостность, только последние транзакции
+# при сбое питания. cache_size < 0 — размер в КиБ на подключение.
+# auto_vacuum действует только на новых базах и должен идти до
+# journal_mode, который записывает заголовок файла; существующую базу
+# переводит sqlite_maintenance --enable-incremental-vacuum.
+SQLITE_PRAGMAS = {
+    'auto_vacuum': 'incremental',
+    'busy_timeout': 5000,
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -32 * 1024,
+}
+
+# Сколько строк индекса просматривает ANALYZE в sqlite_maintenance:
+# статистика приблизительная, зато на больших таблицах это доли секунды.
+SQLITE_ANALYSIS_LIMIT = 1000
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+
+# Комментарии, подписки и новые посты может записывать один поток
+# (core.writer) пачками по WRITE_QUEUE_BATCH_SIZE, а не каждый поток
+# запроса сам. Включается явно, когда запросы упираются в блокировку
+# записи SQLite (замер: benchmark_writes). Запись, до которой поток не
+# дошёл за WRITE_QUEUE_TIMEOUT секунд, отменяется; начатую запрос ждёт.
+WRITE_QUEUE = False
+WRITE_QUEUE_BATCH_SIZE = 50
+WRITE_QUEUE_TIMEOUT = 30
+
+# Реплики для чтения лент (core.routers). Пусто — всё читается с
+# основной базы; ['replica'] — после запуска sync_replica по расписанию.
+DATABASE_REPLICAS = []
+
+# Сколько секунд после записи запросы пользователя идут в основную базу.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'primary_pin'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -151,12 +211,103 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 
 NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
+
+# Номерные страницы (?page=N) глубже этой отдают 404, дальше — курсор.
+MAX_PAGE_NUMBER = 100
+
+# Лента подписок: авторам с большим числом подписчиков посты не
+# раскладываются по лентам при записи, а подмешиваются при чтении.
+# Подписка раскладывает последние TIMELINE_BACKFILL_LIMIT постов автора,
+# более старые тоже подмешиваются при чтении.
+TIMELINE_FANOUT_LIMIT = 10000
+TIMELINE_BACKFILL_LIMIT = 1000
+TIMELINE_BATCH_SIZE = 500
+
+# Превышение бюджета запросов (core.query_budget): True — исключение
+# (включается в тестах), False — предупреждение в лог.
+QUERY_BUDGET_RAISE = False
+
+# Миниатюры картинок постов создаются после сохранения поста в пуле
+# потоков (posts.thumbnails), а не при первом показе страницы. Тег
+# {% post_image %} собирает из этих же размеров srcset, пропорции у всех
+# одинаковые. Тесты, которым миниатюры нужны сразу после коммита,
+# выключают пул: THUMBNAIL_PREGENERATE_ASYNC=False в override_settings.
+THUMBNAIL_PRESETS = [
+    ('320x113', {'crop': 'center', 'upscale': True}),
+    ('640x226', {'crop': 'center', 'upscale': True}),
+    ('960x339', {'crop': 'center', 'upscale': True}),
+    ('1440x508', {'crop': 'center', 'upscale': True}),
+]
+THUMBNAIL_PREGENERATE_ASYNC = True
+# Метаданные миниатюр страницы подгружаются одной выборкой (posts.kvstore).
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_WORKERS = 2
+
+# Приём картинок (posts.images): длинная сторона уменьшается до
+# IMAGE_MAX_SIZE, картинки больше IMAGE_MAX_PIXELS по заголовку
+# отклоняются. GIF в пределах размера хранится как есть ради анимации.
+IMAGE_MAX_SIZE = 1920
+IMAGE_MAX_PIXELS = 40_000_000
+IMAGE_JPEG_QUALITY = 85
+IMAGE_PASSTHROUGH_FORMATS = ('GIF',)
 
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Страницы лент кэшируются надолго: их сбрасывает смена поколения
+# (posts.feed_cache) при записи постов и комментариев.
+FEED_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Карточки постов (posts/templatetags/post_cards.py) кэшируются по id,
+# времени правки и числу комментариев, поэтому живут долго.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+# Кэш целых страниц лент и постов (core.page_cache). Ключ меняется вместе
+# с содержимым страницы, время жизни лишь ограничивает память. Ответ из
+# кэша не несёт контекста шаблона: тесты, которые его проверяют,
+# выключают кэш через override_settings.
+PAGE_CACHE = True
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Группы по slug и пользователи по username (posts.object_cache). Записи
+# сбрасываются сигналами; отсутствие кэшируется коротко, чтобы созданный
+# в другом воркере объект не ждал долго.
+OBJECT_CACHE_TIMEOUT = 60 * 60 * 24
+OBJECT_CACHE_MISS_TIMEOUT = 60
+
+# default — LRU в памяти воркера перед общим кэшем в файле SQLite, который
+# видят все воркеры (core.cache.TwoTierCache и SQLiteCache). Счётчики
+# поколений лент живут только в общем уровне, фрагменты лент пересчитывает
+# один воркер: блокировка и incr() в SQLiteCache атомарны между процессами.
+SHARED_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'yatube_cache.sqlite3')
+# Прогон тестов, как и с базой, получает свой файл: его cache.clear() не
+# стирает кэш запущенного сервера, а записи с тестовыми id удаляются
+# вместе с файлом по завершении прогона.
+if 'test' in sys.argv[1:2] or 'pytest' in sys.modules:
+    _test_cache_dir = tempfile.mkdtemp(prefix='yatube-test-cache-')
+    atexit.register(shutil.rmtree, _test_cache_dir, ignore_errors=True)
+    SHARED_CACHE_PATH = os.path.join(_test_cache_dir, 'cache.sqlite3')
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 5,
+            'LOCK_TIMEOUT': 30,
+            'LOCK_WAIT': 5,
+            'SHARED_ONLY_PREFIXES': ('feed-generation:',),
+            'SINGLE_FLIGHT_PREFIXES': ('template.cache.feed.',),
+        },
+    },
+    'shared': {
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': SHARED_CACHE_PATH,
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'CULL_EVERY': 1000,
+        },
+    },
 }